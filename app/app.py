@@ -1,17 +1,44 @@
+# 最先导入，启动计时从这里开始
+from lib.startup import profiler
+import argparse
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from ttkbootstrap.dialogs import Messagebox
 import threading
 import time
 import os
-from typing import Dict, List, Optional, Any
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Union
 from urllib.parse import urlparse
 from components.connection_panel import ConnectionPanel
 from components.download_panel import DownloadPanel
 from components.task_list import TaskList
-from components.config_window import ConfigWindow
-from components.log_window import LogWindow
-from lib.aria2 import Aria2
+from components.throughput_graph import ThroughputGraph
+from lib.metrics import metrics
+from lib.scheduler import AdaptiveScheduler
+from lib.columns import TaskColumns, UNKNOWN_ETA
+from lib.task_record import STOPPED_STATUSES, TaskRecord, format_size, format_speed, format_time
+from lib.timeseries import ThroughputStore
+from lib.history import DownloadHistory
+from lib.archiver import ResultArchiver
+from lib.session import format_report
+from lib.path_manager import path_manager
+
+# 服务层（aria2p、requests、asyncio）和次要窗口在主窗口显示后按需导入
+if TYPE_CHECKING:
+    from components.config_window import ConfigWindow
+    from components.diagnostics_window import DiagnosticsWindow
+    from components.history_window import HistoryWindow
+    from components.log_window import LogWindow
+    from lib.aria2 import Aria2
+    from lib.aria2_pool import Aria2Pool
+    from lib.async_aria2 import AsyncAria2, TkAsyncBridge
+
+
+# 吞吐量历史的定期保存间隔（秒）
+THROUGHPUT_SAVE_INTERVAL = 60
+
+# 从aria2已停止列表导入下载历史的间隔（秒）
+HISTORY_SYNC_INTERVAL = 30
 
 
 class Aria2GUI:
@@ -32,25 +59,85 @@ class Aria2GUI:
             self.root.iconbitmap("icon.ico")
         except:
             pass
+        profiler.mark("创建主窗口")
         
-        # 创建Aria2服务管理器
-        self.aria2_service: Aria2 = Aria2()
-        self.aria2_service.set_callbacks(
-            on_status_change=self.on_service_status_change,
-            on_connection_change=self.on_connection_change
-        )
+        config: Dict[str, Any] = ConnectionPanel.load_config()
+        # RPC统计（可在诊断窗口中开关）
+        metrics.enabled = bool(config.get('metrics', False))
+        # 配置了远程节点或守护进程数大于1时使用实例池，服务本身在主窗口显示后创建
+        self.pool_mode: bool = self.is_pool_config(config)
+        self.aria2_service: Union["Aria2", "Aria2Pool"]
+        self.async_bridge: "TkAsyncBridge"
+        self.async_aria2: "AsyncAria2"
+        
+        # 待刷新的任务GID（由WebSocket通知线程写入）
+        self._pending_gids: set = set()
+        self._pending_lock: threading.Lock = threading.Lock()
+        # 连接后需要先做一次全量刷新
+        self.full_refresh_pending: bool = True
+        # RPC在后台线程中执行：周期刷新进行中时不重复提交，期间被唤醒则完成后立即再刷新一次
+        self._refresh_inflight: bool = False
+        self._refresh_again: bool = False
+        # 分页请求序号，只应用最新一次请求的结果（翻页后旧页的结果丢弃）
+        self._page_request: int = 0
+        # 已在状态栏显示过的会话恢复报告
+        self._recovery_shown: Optional[Dict] = None
+        
+        # 全局吞吐量历史（主窗口显示后加载，定期和退出时保存）
+        self.throughput: ThroughputStore = ThroughputStore()
+        self._throughput_saved: float = time.monotonic()
+        
+        # 已结束任务的本地历史（数据库在首次使用时打开）
+        self.history: DownloadHistory = DownloadHistory(path_manager.get_history_path())
+        self._history_syncing: bool = False
+        # 收到通知的已结束任务排队后在后台线程写入历史，不在主线程中执行数据库写入
+        self._history_rows: List[tuple] = []
+        self._history_writing: bool = False
+        # 超过保留数量或时长的已停止结果归档到历史后从aria2移除
+        self.archiver: ResultArchiver = ResultArchiver(self.history, path_manager.get_archive_journal_path())
+        self.archiver.configure(config)
+        profiler.mark("加载配置")
         
         # 创建界面组件
         self.connection_panel: ConnectionPanel
         self.download_panel: DownloadPanel
         self.task_list: TaskList
+        self.throughput_graph: ThroughputGraph
         self.status_bar: ttk.Label
+        # 次要窗口在首次打开时创建
+        self.config_window: Optional["ConfigWindow"] = None
+        self.log_window: Optional["LogWindow"] = None
+        self.diagnostics_window: Optional["DiagnosticsWindow"] = None
+        self.history_window: Optional["HistoryWindow"] = None
         
         # 创建界面
         self.create_widgets()
+        profiler.mark("创建界面")
+        
+        # 先显示主窗口，再加载服务层
+        self.root.update()
+        profiler.mark("首次绘制")
         
         # 初始化
-        self.initialize()
+        self.initialize(config)
+    
+    @staticmethod
+    def is_pool_config(config: Dict[str, Any]) -> bool:
+        """配置是否需要实例池（远程节点或多个本地守护进程）"""
+        return bool(config.get('endpoints')) or int(config.get('instances', 1)) > 1
+    
+    def create_service(self, config: Dict[str, Any]) -> Union["Aria2", "Aria2Pool"]:
+        """根据配置创建服务管理器"""
+        from lib.aria2 import Aria2
+        from lib.aria2_pool import Aria2Pool
+        
+        endpoints = config.get('endpoints') or []
+        instances = int(config.get('instances', 1))
+        if endpoints:
+            return Aria2Pool.remote(endpoints)
+        if instances > 1:
+            return Aria2Pool.local(instances)
+        return Aria2()
     
     def center_window(self, window: ttk.Window, width: int, height: int, parent: Optional[ttk.Window] = None) -> None:
         """将窗口居中显示"""
@@ -103,15 +190,12 @@ class Aria2GUI:
             on_resume_callback=self.resume_selected,
             on_remove_callback=self.remove_selected,
             on_refresh_callback=self.refresh_tasks,
-            on_open_folder_callback=self.open_task_folder
+            on_open_folder_callback=self.open_task_folder,
+            show_instance=self.pool_mode
         )
         
-        # 初始化配置和日志窗口
-        self.config_window = ConfigWindow(
-            self.root, 
-            on_config_save=self.on_config_save
-        )
-        self.log_window = LogWindow(self.root)
+        # 全局吞吐量曲线
+        self.throughput_graph = ThroughputGraph(main_frame, self.throughput)
         
         # 创建状态栏
         self.status_bar = ttk.Label(
@@ -132,8 +216,32 @@ class Aria2GUI:
         )
         self.refresh_time_label.pack(anchor="e", pady=(2, 0))
     
-    def initialize(self) -> None:
-        """初始化应用程序"""
+    def initialize(self, config: Dict[str, Any]) -> None:
+        """初始化应用程序（主窗口显示之后）"""
+        from lib.async_aria2 import AsyncAria2, TkAsyncBridge
+        
+        # 读取吞吐量历史文件后重绘曲线
+        if self.throughput.load(path_manager.get_throughput_path()):
+            self.throughput_graph.redraw()
+        profiler.mark("加载吞吐量历史")
+        
+        # 创建Aria2服务管理器
+        self.aria2_service = self.create_service(config)
+        self.aria2_service.set_callbacks(
+            on_status_change=self.on_service_status_change,
+            # 连接状态也会在健康监测线程中变化，统一投递到主线程处理
+            on_connection_change=lambda connected, message: self.root.after(0, self.on_connection_change, connected, message),
+            on_task_event=self.on_task_event
+        )
+        
+        # 任务列表只应用快照增量
+        self.aria2_service.snapshot.subscribe(self.task_list.apply_delta)
+        
+        # 异步客户端：批量操作和刷新的RPC在后台事件循环中执行，结果投递回主线程
+        self.async_bridge = TkAsyncBridge(self.root)
+        self.async_aria2 = AsyncAria2(self.aria2_service)
+        profiler.mark("创建服务")
+        
         # 初始检查服务状态
         self.update_service_status()
         
@@ -145,28 +253,33 @@ class Aria2GUI:
         
         # 开始定期检查服务状态
         self.start_service_status_check()
+        
+        # 定期导入下载历史
+        self.root.after(HISTORY_SYNC_INTERVAL * 1000, self.history_sync_tick)
+        
+        # 关闭窗口时保存吞吐量历史
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        profiler.mark("启动后台任务")
+        
+        if profiler.enabled:
+            print(profiler.report())
     
     def auto_connect(self) -> None:
         """自动连接（在后台线程中执行）"""
         def connect_thread():
-            import time
-            time.sleep(1)  # 等待界面完全加载
-            
-            # 检查服务状态
+            # 检查服务状态（start_service会等待进程出现）
             if not self.aria2_service.is_running():
                 print("服务未运行，尝试自动启动...")
-                if self.start_aria2c():
-                    time.sleep(3)  # 等待服务启动
-                else:
+                if not self.start_aria2c():
                     print("自动启动服务失败")
                     return
             
-            # 尝试连接
+            # 尝试连接，RPC端口尚未就绪时由健康监测按退避间隔自动重连
             config = self.connection_panel.get_connection_config()
             if self.aria2_service.connect(config['host'], config['port'], config['secret']):
                 self.root.after(0, lambda: self.status_bar.config(text="已自动连接到Aria2服务器"))
             else:
-                self.root.after(0, lambda: self.status_bar.config(text="自动连接失败，请点击'自动连接'按钮"))
+                self.root.after(0, lambda: self.status_bar.config(text="正在等待Aria2服务就绪，将自动重连"))
         
         # 在后台线程中执行自动连接
         import threading
@@ -191,6 +304,9 @@ class Aria2GUI:
         menubar.add_cascade(label="工具", menu=tools_menu)
         tools_menu.add_command(label="刷新任务", command=self.refresh_tasks)
         tools_menu.add_command(label="清空任务", command=self.clear_tasks)
+        tools_menu.add_command(label="下载历史", command=self.show_history_window)
+        tools_menu.add_separator()
+        tools_menu.add_command(label="诊断", command=self.show_diagnostics_window)
         
         # 帮助菜单
         help_menu = ttk.Menu(menubar, tearoff=0)
@@ -199,12 +315,35 @@ class Aria2GUI:
         
     def show_config_window(self) -> None:
         """显示配置窗口"""
+        if self.config_window is None:
+            from components.config_window import ConfigWindow
+            self.config_window = ConfigWindow(self.root, on_config_save=self.on_config_save)
         self.config_window.show()
         
     def show_log_window(self) -> None:
         """显示日志窗口"""
+        if self.log_window is None:
+            from components.log_window import LogWindow
+            self.log_window = LogWindow(self.root)
         self.log_window.show()
         
+    def show_diagnostics_window(self) -> None:
+        """显示诊断窗口"""
+        if self.diagnostics_window is None:
+            from components.diagnostics_window import DiagnosticsWindow
+            self.diagnostics_window = DiagnosticsWindow(
+                self.root,
+                get_endpoint_status=self.aria2_service.get_endpoint_status if self.pool_mode else None
+            )
+        self.diagnostics_window.show()
+        
+    def show_history_window(self) -> None:
+        """显示下载历史窗口"""
+        if self.history_window is None:
+            from components.history_window import HistoryWindow
+            self.history_window = HistoryWindow(self.root, self.history, on_sync=self.sync_history)
+        self.history_window.show()
+        
     def show_about(self) -> None:
         """显示关于对话框"""
         Messagebox.show_info(
@@ -223,6 +362,7 @@ class Aria2GUI:
             parent=self.root
         ) == "是":
             self.task_list.clear_tasks()
+            self.aria2_service.snapshot.clear()
     
     def on_config_save(self, config: Dict[str, Any]) -> None:
         """配置保存回调"""
@@ -230,6 +370,8 @@ class Aria2GUI:
         self.connection_panel.config = config
         self.connection_panel.update_config_info()
         
+        self.archiver.configure(config)
+        
         # 如果代理配置发生变化，重新设置代理
         if 'all_proxy' in config and config['all_proxy']:
             if self.aria2_service.connected:
@@ -244,39 +386,74 @@ class Aria2GUI:
     
     def on_connection_change(self, connected: bool, message: str) -> None:
         """连接状态变化回调"""
+        if connected:
+            self.full_refresh_pending = True
+            self.root.after(0, self.wake_refresh)
+            if not self.pool_mode:
+                config = self.connection_panel.get_connection_config()
+                self.async_bridge.submit(self.async_aria2.connect(config['host'], config['port'], config['secret']))
+            # 启动时从会话恢复了任务则在状态栏说明一次
+            recovery = self.aria2_service.recovery
+            if recovery is not None and recovery is not self._recovery_shown:
+                self._recovery_shown = recovery
+                if format_report(recovery):
+                    message = f"{message}，{format_report(recovery)}"
         self.connection_panel.update_connection_status(connected, message)
         self.status_bar.config(text=message)
     
-    def update_service_status(self) -> None:
-        """更新服务状态"""
+    def update_service_status(self) -> bool:
+        """更新服务状态，返回状态是否发生变化"""
         running = self.aria2_service.is_running()
         status_text = "运行中" if running else "未运行"
         color = "green" if running else "red"
+        changed = running != self.connection_panel.service_running
         
         # 直接调用状态更新方法
         self.on_service_status_change(running, status_text, color)
+        return changed
     
     def connect_aria2(self) -> None:
-        """自动连接到aria2"""
-        # 首先尝试启动服务
-        if not self.aria2_service.is_running():
-            print("服务未运行，正在启动...")
-            if not self.start_aria2c():
-                print("启动服务失败")
-                return
+        """自动连接到aria2（启动服务和连接在后台线程中执行，结果在主线程中显示）"""
+        config: Dict[str, Any] = self.connection_panel.get_connection_config()
+        self.status_bar.config(text="正在连接Aria2服务器...")
         
-        # 等待服务启动
-        import time
-        time.sleep(2)
+        def connect() -> Optional[bool]:
+            # 首先尝试启动服务，启动失败返回None
+            if not self.aria2_service.is_running():
+                print("服务未运行，正在启动...")
+                if not self.aria2_service.start_service():
+                    return None
+            
+            # 尝试连接，失败时由健康监测自动重连
+            return self.aria2_service.connect(config['host'], config['port'], config['secret'])
         
-        # 尝试连接
-        config: Dict[str, Any] = self.connection_panel.get_connection_config()
-        if self.aria2_service.connect(config['host'], config['port'], config['secret']):
+        self.submit_rpc(connect, on_done=self.on_connect_done)
+    
+    def on_connect_done(self, connected: Optional[bool]) -> None:
+        """自动连接完成回调（在主线程中调用）"""
+        self.update_service_status()
+        if connected is None:
+            print("启动服务失败")
+            self.status_bar.config(text="Aria2c服务启动失败")
+            Messagebox.show_error("失败", "Aria2c服务启动失败，请检查aria2c是否已安装", self.root)
+        elif connected:
             print("自动连接成功")
             self.status_bar.config(text="已自动连接到Aria2服务器")
         else:
-            print("自动连接失败")
-            self.status_bar.config(text="自动连接失败，请检查配置")
+            print("自动连接失败，将自动重试")
+            self.status_bar.config(text="连接失败，正在自动重试，请检查配置")
+    
+    def submit_rpc(
+        self,
+        call: Callable[..., Any],
+        *args: Any,
+        on_done: Optional[Callable[[Any], None]] = None,
+        on_error: Optional[Callable[[BaseException], None]] = None
+    ) -> None:
+        """在事件循环的线程池中执行同步服务调用，不阻塞Tk主线程；回调在主线程中执行"""
+        import asyncio
+        
+        self.async_bridge.submit(asyncio.to_thread(call, *args), on_done=on_done, on_error=on_error)
     
     def handle_service_action(self, action: str) -> None:
         """处理服务操作"""
@@ -294,8 +471,6 @@ class Aria2GUI:
     def start_aria2c(self) -> bool:
         """启动aria2c服务"""
         if self.aria2_service.start_service():
-            # 等待服务启动
-            time.sleep(1)
             # 立即更新服务状态
             self.update_service_status()
             return True
@@ -308,8 +483,6 @@ class Aria2GUI:
     def stop_aria2c(self) -> None:
         """停止aria2c服务"""
         if self.aria2_service.stop_service():
-            # 等待服务停止
-            time.sleep(1)
             # 立即更新服务状态
             self.update_service_status()
         else:
@@ -486,6 +659,23 @@ class Aria2GUI:
                     ttk.Label(status_frame, text="启动时间:", bootstyle="info").grid(row=5, column=0, sticky=W, pady=2)
                     ttk.Label(status_frame, text=start_time, bootstyle="success").grid(row=5, column=1, sticky=W, padx=(10, 0), pady=2)
             
+            # 会话恢复信息
+            recovery = status.get('recovery')
+            if recovery:
+                recovery_frame = ttk.LabelFrame(main_frame, text="会话恢复", bootstyle="info", padding="10")
+                recovery_frame.pack(fill=X, pady=(0, 15))
+                
+                recovery_items = [
+                    ("会话文件", recovery['session']),
+                    ("恢复任务", f"{recovery['entries']} 个（{recovery['paused']} 个暂停），解析耗时 {recovery['parse_ms']} ms"),
+                ]
+                if recovery['names']:
+                    more = "…" if recovery['entries'] > len(recovery['names']) else ""
+                    recovery_items.append(("任务", "、".join(recovery['names']) + more))
+                for row, (label, value) in enumerate(recovery_items):
+                    ttk.Label(recovery_frame, text=f"{label}:", bootstyle="info").grid(row=row, column=0, sticky=W, pady=2)
+                    ttk.Label(recovery_frame, text=value, bootstyle="secondary", wraplength=450).grid(row=row, column=1, sticky=W, padx=(10, 0), pady=2)
+            
             # 配置信息框架
             config_frame = ttk.LabelFrame(main_frame, text="当前配置", bootstyle="info", padding="10")
             config_frame.pack(fill=X, pady=(0, 15))
@@ -554,6 +744,12 @@ class Aria2GUI:
             Messagebox.show_error("错误", "请输入下载链接", self.root)
             return
         
+        # 多个链接走批量提交
+        urls: List[str] = url.split()
+        if len(urls) > 1:
+            self.add_downloads_bulk(urls)
+            return
+        
         # 验证URL
         try:
             parsed = urlparse(url)
@@ -581,51 +777,154 @@ class Aria2GUI:
         else:
             Messagebox.show_error("错误", "添加下载任务失败", self.root)
     
+    def add_downloads_bulk(self, urls: List[str]) -> None:
+        """在后台线程中批量添加下载任务"""
+        config = self.aria2_service.load_config()
+        path = config.get('download_dir', '~/Downloads')
+        if path:
+            os.makedirs(path, exist_ok=True)
+        
+        def on_progress(done: int, total: int) -> None:
+            self.root.after(0, lambda: self.status_bar.config(text=f"正在添加下载任务: {done}/{total}"))
+        
+        def bulk_thread() -> None:
+            results = self.aria2_service.add_downloads_bulk(urls, path, on_progress=on_progress)
+            self.root.after(0, self.on_bulk_add_done, results)
+        
+        threading.Thread(target=bulk_thread, daemon=True).start()
+    
+    def on_bulk_add_done(self, results: Dict[str, Any]) -> None:
+        """批量添加完成回调（在主线程中调用）"""
+        added = sum(1 for gid, error in results.values() if gid)
+        failed = len(results) - added
+        
+        if added:
+            self.download_panel.clear_url()
+            self.refresh_tasks()
+        self.status_bar.config(text=f"已添加 {added} 个下载任务，{failed} 个失败")
+        
+        if failed:
+            Messagebox.show_warning("部分失败", f"已添加 {added} 个下载任务，{failed} 个失败", self.root)
+        else:
+            Messagebox.show_info("成功", f"已添加 {added} 个下载任务", self.root)
     
-    def refresh_tasks(self) -> None:
-        """刷新任务列表"""
+    
+    def refresh_tasks(self, on_done: Optional[Callable[[], None]] = None) -> None:
+        """刷新任务列表：在后台线程中获取当前页，在主线程中应用；on_done在应用结果或失败后调用"""
         if not self.aria2_service.connected:
+            if on_done:
+                on_done()
             return
         
-        try:
-            downloads: List[Dict[str, Any]] = self.aria2_service.get_downloads()
-            
-            # 获取当前任务列表中的GID
-            current_gids = set(self.task_list.get_selected_gids())
-            new_gids = set(download['gid'] for download in downloads)
-            
-            # 删除不存在的任务
-            for item in self.task_list.task_tree.get_children():
-                tags = self.task_list.task_tree.item(item, "tags")
-                if tags and tags[0] not in new_gids:
-                    self.task_list.task_tree.delete(item)
-            
-            # 更新或添加任务
-            for download in downloads:
-                gid = download['gid']
-                # 查找是否已存在
-                existing_item = None
-                for item in self.task_list.task_tree.get_children():
-                    tags = self.task_list.task_tree.item(item, "tags")
-                    if tags and tags[0] == gid:
-                        existing_item = item
-                        break
-                
-                if existing_item:
-                    # 更新现有任务
-                    self.task_list.update_task(gid, download)
-                else:
-                    # 添加新任务
-                    self.task_list.add_task(download)
-            
-            # 更新刷新时间显示
-            import time
-            current_time = time.strftime("%H:%M:%S")
-            self.refresh_time_label.config(text=f"最后刷新: {current_time} | 任务数: {len(downloads)}")
+        self._page_request += 1
+        request = self._page_request
         
-        except Exception as e:
+        def apply(page: Dict[str, Any]) -> None:
+            # 期间又发起了分页请求（如翻页）时丢弃这一页
+            if request == self._page_request:
+                self.apply_page(page)
+            if on_done:
+                on_done()
+        
+        def fail(e: BaseException) -> None:
             print(f"刷新任务失败: {e}")
             self.refresh_time_label.config(text=f"刷新失败: {e}")
+            if on_done:
+                on_done()
+        
+        # 只获取当前页显示的任务
+        self.submit_rpc(
+            self.aria2_service.get_downloads_page,
+            self.task_list.page * self.task_list.page_size,
+            self.task_list.page_size,
+            on_done=apply,
+            on_error=fail
+        )
+    
+    def apply_page(self, page: Dict[str, Any]) -> None:
+        """应用一页任务（在主线程中调用）"""
+        downloads: List[TaskRecord] = page["downloads"]
+        self.task_list.update_pager(page["num_waiting"] + page["num_stopped"], page.get("num_pages"))
+        
+        # 以当前页替换快照，增量由订阅者（任务列表）应用
+        self.aria2_service.snapshot.replace(downloads)
+        
+        # 更新刷新时间显示
+        self.update_refresh_label(page["num_active"] + page["num_waiting"] + page["num_stopped"])
+    
+    def refresh_active_tasks(self, on_done: Optional[Callable[[], None]] = None) -> None:
+        """只刷新活动任务的速度和进度：在后台线程中获取，在主线程中合并到快照"""
+        if not self.aria2_service.connected:
+            if on_done:
+                on_done()
+            return
+        
+        def apply(downloads: List[TaskRecord]) -> None:
+            self.aria2_service.snapshot.merge(downloads)
+            stat = self.aria2_service.global_stat
+            self.update_refresh_label(sum(int(stat.get(key, 0)) for key in ("numActive", "numWaiting", "numStopped")))
+            if on_done:
+                on_done()
+        
+        def fail(e: BaseException) -> None:
+            print(f"刷新活动任务失败: {e}")
+            if on_done:
+                on_done()
+        
+        self.submit_rpc(self.aria2_service.get_active_downloads, on_done=apply, on_error=fail)
+    
+    def update_refresh_label(self, total: int) -> None:
+        """更新刷新时间、任务数以及活动任务的总速度和剩余量"""
+        text = f"最后刷新: {time.strftime('%H:%M:%S')} | 任务数: {total}"
+        
+        # 活动任务的汇总按列一次计算
+        active = [task for task in self.aria2_service.snapshot.tasks.values() if task.status == "active"]
+        if active:
+            with metrics.stage("columns"):
+                summary = TaskColumns(active).summary()
+            text += f" | 总速度: {format_speed(summary['speed'])} | 剩余: {format_size(summary['remaining'])}"
+            if summary["eta"] != UNKNOWN_ETA:
+                text += f"（约{format_time(summary['eta'])}）"
+        
+        self.refresh_time_label.config(text=text)
+    
+    def on_task_event(self, event: str, gid: str) -> None:
+        """任务通知回调（在通知线程中调用）"""
+        with self._pending_lock:
+            schedule = not self._pending_gids
+            self._pending_gids.add(gid)
+        
+        # 合并短时间内的多个通知，只调度一次界面更新
+        if schedule:
+            self.root.after(0, self.apply_task_events)
+    
+    def apply_task_events(self) -> None:
+        """在后台线程中获取收到通知的任务，结果在主线程中应用"""
+        with self._pending_lock:
+            gids = list(self._pending_gids)
+            self._pending_gids.clear()
+        
+        self.submit_rpc(
+            self.aria2_service.get_downloads_by_gids, gids,
+            on_done=self.on_task_events_fetched,
+            on_error=lambda e: print(f"获取通知任务失败: {e}")
+        )
+    
+    def on_task_events_fetched(self, downloads: Dict[str, Optional[TaskRecord]]) -> None:
+        """应用收到通知的任务（在主线程中调用）"""
+        snapshot = self.aria2_service.snapshot
+        snapshot.remove(gid for gid, download in downloads.items() if download is None)
+        snapshot.merge(download for gid, download in downloads.items() if download and gid in snapshot.tasks)
+        
+        # 收到完成/错误/停止通知的任务交给后台线程写入历史
+        self.queue_history(download for download in downloads.values() if download)
+        
+        # 新任务是否在当前页由下一次分页刷新决定
+        if any(download and gid not in snapshot.tasks for gid, download in downloads.items()):
+            self.full_refresh_pending = True
+        
+        # 任务状态变化后恢复快速刷新
+        self.wake_refresh()
     
     def pause_selected(self) -> None:
         """暂停选中的任务"""
@@ -638,11 +937,7 @@ class Aria2GUI:
             Messagebox.show_warning("警告", "请先选择要操作的任务", self.root)
             return
         
-        if self.aria2_service.pause_downloads(gids):
-            self.status_bar.config(text=f"已暂停 {len(gids)} 个任务")
-            self.refresh_tasks()
-        else:
-            Messagebox.show_error("错误", "暂停任务失败", self.root)
+        self.submit_bulk_action("pause", gids, "暂停")
     
     def resume_selected(self) -> None:
         """继续选中的任务"""
@@ -655,11 +950,7 @@ class Aria2GUI:
             Messagebox.show_warning("警告", "请先选择要操作的任务", self.root)
             return
         
-        if self.aria2_service.resume_downloads(gids):
-            self.status_bar.config(text=f"已继续 {len(gids)} 个任务")
-            self.refresh_tasks()
-        else:
-            Messagebox.show_error("错误", "继续任务失败", self.root)
+        self.submit_bulk_action("unpause", gids, "继续")
     
     def remove_selected(self) -> None:
         """删除选中的任务"""
@@ -673,29 +964,50 @@ class Aria2GUI:
             return
         
         if Messagebox.yesno("确认", f"确定要删除选中的 {len(gids)} 个任务吗？", self.root):
-            if self.aria2_service.remove_downloads(gids):
-                self.status_bar.config(text=f"已删除 {len(gids)} 个任务")
-                self.refresh_tasks()
+            self.submit_bulk_action("remove", gids, "删除")
+    
+    def submit_bulk_action(self, action: str, gids: List[str], label: str) -> None:
+        """在后台执行批量操作，多实例模式下由实例池按GID路由
+        
+        异步客户端在同步服务之后单独连接，尚未连上或连接失败时同样在线程中走同步服务。
+        """
+        import asyncio
+        
+        if self.pool_mode or not self.async_aria2.connected:
+            if action == "remove":
+                coro = asyncio.to_thread(self.aria2_service.remove_downloads_detailed, gids)
             else:
-                Messagebox.show_error("错误", "删除任务失败", self.root)
+                coro = asyncio.to_thread(self.aria2_service.bulk_action, action, gids)
+        elif action == "remove":
+            coro = self.async_aria2.remove_downloads(gids)
+        else:
+            coro = self.async_aria2.bulk_action(action, gids)
+        
+        self.async_bridge.submit(coro, on_done=lambda results: self.on_bulk_action_done(label, results))
+    
+    def on_bulk_action_done(self, action: str, results: Dict[str, Optional[str]]) -> None:
+        """批量操作完成回调（在主线程中调用）"""
+        succeeded = sum(1 for error in results.values() if error is None)
+        if succeeded:
+            failed = len(results) - succeeded
+            suffix = f"，{failed} 个失败" if failed else ""
+            self.status_bar.config(text=f"已{action} {succeeded} 个任务{suffix}")
+            self.refresh_tasks()
+        else:
+            Messagebox.show_error("错误", f"{action}任务失败", self.root)
     
     def open_task_folder(self, gid: str) -> None:
         """打开任务文件夹"""
         try:
             # 获取任务信息
-            downloads = self.aria2_service.get_downloads()
-            task_info = None
-            for download in downloads:
-                if download.get('gid') == gid:
-                    task_info = download
-                    break
+            task_info = self.aria2_service.get_downloads_by_gids([gid]).get(gid)
             
             if not task_info:
                 Messagebox.show_error("错误", "找不到任务信息", self.root)
                 return
             
             # 获取文件路径
-            filename = task_info.get('filename', '')
+            filename = task_info.filename
             if not filename or filename == '未知文件':
                 Messagebox.show_error("错误", "无法获取文件路径", self.root)
                 return
@@ -704,8 +1016,9 @@ class Aria2GUI:
             import os
             from pathlib import Path
             
-            # 从aria2配置获取下载目录
-            config = self.aria2_service.load_config()
+            # 从任务所属实例的配置获取下载目录
+            service = self.aria2_service.get_service(gid) if self.pool_mode else self.aria2_service
+            config = (service or self.aria2_service).get_config()
             download_dir = os.path.expanduser(config.get('download_dir', '~/Downloads'))
             file_path = os.path.join(download_dir, filename)
             
@@ -727,25 +1040,168 @@ class Aria2GUI:
     
     def start_auto_refresh(self) -> None:
         """开始自动刷新任务列表"""
-        def refresh_loop() -> None:
-            while True:
-                if self.aria2_service.connected:
-                    self.root.after(0, self.refresh_tasks)
-                time.sleep(1)  # 每1秒刷新一次，提高刷新频率
+        # 有活动任务时每秒刷新，空闲时退避到30秒，窗口不可见时60秒心跳
+        self.refresh_scheduler = AdaptiveScheduler(min_interval=1, max_interval=30, heartbeat_interval=60)
+        self._refresh_job: Optional[str] = None
+        self._window_visible: bool = True
         
-        refresh_thread: threading.Thread = threading.Thread(target=refresh_loop, daemon=True)
-        refresh_thread.start()
+        # 用户操作时立即恢复快速刷新
+        self.root.bind_all("<Any-KeyPress>", self.on_user_activity, add="+")
+        self.root.bind_all("<Any-ButtonPress>", self.on_user_activity, add="+")
+        self.root.bind("<Map>", self.on_user_activity, add="+")
+        self.root.bind("<FocusIn>", self.on_user_activity, add="+")
+        
+        self.schedule_refresh(0)
+    
+    def schedule_refresh(self, delay_ms: int) -> None:
+        """安排下一次自动刷新"""
+        if self._refresh_job:
+            self.root.after_cancel(self._refresh_job)
+        self._refresh_job = self.root.after(delay_ms, self.auto_refresh_tick)
+    
+    def auto_refresh_tick(self) -> None:
+        """自动刷新一次，请求在后台线程中执行，完成后按活动情况安排下一次"""
+        self._refresh_job = None
+        self._window_visible = self.is_window_visible()
+        
+        if self._refresh_inflight:
+            # 上一次刷新尚未返回，完成后立即再刷新
+            self._refresh_again = True
+            return
+        if not self.aria2_service.connected:
+            self.schedule_refresh(self.refresh_scheduler.interval_ms(False, self._window_visible))
+            return
+        
+        self._refresh_inflight = True
+        if self.full_refresh_pending or not self.aria2_service.notifications_active:
+            # 首次连接或通知通道不可用时刷新当前页
+            self.full_refresh_pending = False
+            self.refresh_tasks(on_done=self.finish_refresh_tick)
+        else:
+            # 状态变化由通知推送，这里只刷新活动任务的速度和进度
+            self.refresh_active_tasks(on_done=self.finish_refresh_tick)
+    
+    def finish_refresh_tick(self) -> None:
+        """自动刷新的结果应用后记录吞吐量并安排下一次（在主线程中调用）"""
+        self._refresh_inflight = False
+        busy = int(self.aria2_service.global_stat.get("numActive", 0)) > 0
+        self.record_throughput()
+        
+        if self._refresh_again:
+            self._refresh_again = False
+            self.schedule_refresh(0)
+        else:
+            self.schedule_refresh(self.refresh_scheduler.interval_ms(busy, self._window_visible))
+    
+    def record_throughput(self) -> None:
+        """记录本次刷新得到的全局速度并增量更新曲线"""
+        if not self.aria2_service.global_stat:
+            return
+        self.throughput.add(time.time(), self.aria2_service.global_stat)
+        self.throughput_graph.update()
+        
+        # 定期落盘，避免异常退出时丢失太多历史
+        if time.monotonic() - self._throughput_saved >= THROUGHPUT_SAVE_INTERVAL:
+            self._throughput_saved = time.monotonic()
+            self.throughput.save(path_manager.get_throughput_path())
+    
+    def is_window_visible(self) -> bool:
+        """主窗口是否可见且有焦点"""
+        try:
+            return self.root.state() not in ("iconic", "withdrawn") and self.root.focus_displayof() is not None
+        except Exception:
+            return True
+    
+    def on_user_activity(self, event: Optional[Any] = None) -> None:
+        """用户操作时恢复快速刷新"""
+        backed_off = self.refresh_scheduler.reset()
+        self.service_status_scheduler.reset()
+        if backed_off or not self._window_visible:
+            self._window_visible = True
+            self.schedule_refresh(0)
+    
+    def wake_refresh(self) -> None:
+        """立即刷新（用于连接变化和新任务）"""
+        self.refresh_scheduler.reset()
+        self.schedule_refresh(0)
     
     def start_service_status_check(self) -> None:
         """开始定期检查服务状态"""
-        def status_check_loop() -> None:
-            while True:
-                # 在后台线程中检查状态，然后在主线程中更新UI
-                self.root.after(0, self.update_service_status)
-                time.sleep(3)  # 每3秒检查一次服务状态
+        # 状态变化时每3秒检查，稳定后退避到60秒
+        self.service_status_scheduler = AdaptiveScheduler(min_interval=3, max_interval=60, heartbeat_interval=60)
+        self.root.after(3000, self.service_status_tick)
+    
+    def service_status_tick(self) -> None:
+        """检查一次服务状态并安排下一次"""
+        changed = self.update_service_status()
+        self.root.after(
+            self.service_status_scheduler.interval_ms(changed, self.is_window_visible()),
+            self.service_status_tick
+        )
+    
+    def queue_history(self, tasks: Iterable[TaskRecord]) -> None:
+        """把已结束的任务排队写入下载历史（结束时间取收到通知的时间）"""
+        now = time.time()
+        rows = [self.history.to_row(task, now) for task in tasks if task.status in STOPPED_STATUSES]
+        if not rows:
+            return
+        with self._pending_lock:
+            self._history_rows.extend(rows)
+            if self._history_writing:
+                return
+            self._history_writing = True
+        threading.Thread(target=self.write_history_rows, daemon=True).start()
+    
+    def write_history_rows(self) -> None:
+        """后台线程：写入排队的历史记录直到队列为空"""
+        while True:
+            with self._pending_lock:
+                rows, self._history_rows = self._history_rows, []
+                if not rows:
+                    self._history_writing = False
+                    return
+            self.history.record_rows(rows)
+    
+    def history_sync_tick(self) -> None:
+        """定期导入下载历史"""
+        self.sync_history()
+        self.root.after(HISTORY_SYNC_INTERVAL * 1000, self.history_sync_tick)
+    
+    def sync_history(self) -> None:
+        """在后台线程中从aria2的已停止列表导入新结束的任务，并归档超出保留条件的结果"""
+        if self._history_syncing or not self.aria2_service.connected:
+            return
+        self._history_syncing = True
         
-        status_thread: threading.Thread = threading.Thread(target=status_check_loop, daemon=True)
-        status_thread.start()
+        def sync_thread() -> None:
+            try:
+                recorded = self.history.sync(self.aria2_service)
+            except Exception as e:
+                print(f"导入下载历史失败: {e}")
+                recorded = 0
+            archived = self.archiver.run(self.aria2_service)
+            self.root.after(0, self.on_history_synced, recorded, archived)
+        
+        threading.Thread(target=sync_thread, daemon=True).start()
+    
+    def on_history_synced(self, recorded: int, archived: int) -> None:
+        """导入完成后刷新历史窗口，有结果被归档时刷新任务列表"""
+        self._history_syncing = False
+        if (recorded or archived) and self.history_window:
+            self.history_window.refresh()
+        if archived:
+            self.full_refresh_pending = True
+            self.status_bar.config(text=f"已归档 {archived} 个已结束任务到下载历史")
+    
+    def on_close(self) -> None:
+        """关闭主窗口"""
+        self.throughput.save(path_manager.get_throughput_path())
+        # 写入尚在排队的历史记录
+        with self._pending_lock:
+            rows, self._history_rows = self._history_rows, []
+        self.history.record_rows(rows)
+        self.history.close()
+        self.root.destroy()
     
     def run(self) -> None:
         """运行应用程序"""
@@ -753,6 +1209,15 @@ class Aria2GUI:
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Aria2 GUI 下载器")
+    parser.add_argument("--profile-startup", action="store_true", help="打印模块导入和各初始化阶段的耗时")
+    parser.add_argument("--root-dir", help="数据根目录（配置、数据和下载分别位于其下的config、data、downloads），也可用环境变量ARIA2GUI_HOME设置")
+    args = parser.parse_args()
+    if args.root_dir:
+        path_manager.set_root_dir(args.root_dir)
+    profiler.enabled = args.profile_startup
+    profiler.mark("导入模块")
+    
     app = Aria2GUI()
     app.run()
 
@@ -100,17 +100,26 @@ class ConfigWindow:
                 ("host", "RPC主机", "Aria2 RPC服务器地址"),
                 ("port", "RPC端口", "Aria2 RPC服务器端口"),
                 ("secret", "RPC密钥", "Aria2 RPC密钥（可选）"),
+                ("transport", "RPC传输", "http 或 websocket（WebSocket不可用时回退到http）"),
+                ("pool_size", "连接池大小", "保持的RPC长连接数"),
+                ("timeout", "RPC超时", "单次RPC调用超时时间（秒）"),
+                ("instances", "守护进程数", "本地aria2c实例数，大于1时端口和下载子目录按实例递增（重启后生效）"),
             ],
             "下载配置": [
                 ("download_dir", "下载目录", "默认下载目录"),
                 ("max_connections", "最大连接数", "每个任务的最大连接数"),
                 ("max_downloads", "最大下载数", "同时下载的最大任务数"),
+                ("save_session_interval", "会话保存间隔", "未完成任务的会话保存间隔（秒），启动时自动恢复（0为不保存，重启后生效）"),
             ],
             "代理配置": [
                 ("all_proxy", "全局代理", "格式: http://proxy:port 或 socks5://proxy:port"),
             ],
             "日志配置": [
                 ("log_level", "日志级别", "日志级别: debug, info, notice, warn, error"),
+            ],
+            "归档配置": [
+                ("archive_max_results", "保留结果数", "每个aria2实例中最多保留的已结束任务数，更早的移入下载历史（0为不限制）"),
+                ("archive_max_age_hours", "保留时长", "已结束任务在aria2中保留的小时数，超过后移入下载历史（0为不限制）"),
             ]
         }
         
@@ -218,21 +227,49 @@ class ConfigWindow:
             from lib.path_manager import path_manager
             config = path_manager.create_default_config()
             
+            # 保留窗口中不可编辑的配置项（如endpoints节点列表）
+            if os.path.exists(self.config_path):
+                with open(self.config_path, 'r', encoding='utf-8') as f:
+                    config.update(json.load(f))
+            
             # 只更新在配置窗口中定义的配置项
             for key, var in self.config_vars.items():
                 if key in config:  # 只保存path_manager中定义的配置项
                     value = var.get().strip()
                     
+                    # 连接池大小至少为1；超时为正数，可以是小数
+                    if key == "pool_size":
+                        try:
+                            config[key] = int(value)
+                        except ValueError:
+                            config[key] = 0
+                        if config[key] < 1:
+                            messagebox.showerror("错误", "连接池大小必须是不小于1的整数")
+                            return
+                    elif key == "timeout":
+                        try:
+                            config[key] = float(value)
+                        except ValueError:
+                            config[key] = 0
+                        if not config[key] > 0:
+                            messagebox.showerror("错误", "RPC超时必须是大于0的秒数")
+                            return
                     # 处理数字值
-                    if key in ["port", "max_connections", "max_downloads"]:
+                    elif key in ["port", "instances", "max_connections", "max_downloads", "save_session_interval", "archive_max_results"]:
                         try:
                             config[key] = int(value) if value else 0
                         except ValueError:
                             config[key] = 0
+                    elif key == "archive_max_age_hours":
+                        try:
+                            config[key] = float(value) if value else 0
+                        except ValueError:
+                            config[key] = 0
                     else:
                         config[key] = value
                     
             # 保存到文件
+            path_manager.ensure_parent(self.config_path)
             with open(self.config_path, 'w', encoding='utf-8') as f:
                 json.dump(config, f, indent=2, ensure_ascii=False)
                 
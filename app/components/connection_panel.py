@@ -76,7 +76,8 @@ class ConnectionPanel:
         )
         self.config_info_label.pack(side=LEFT, padx=(20, 0))
     
-    def load_config(self):
+    @staticmethod
+    def load_config():
         """加载配置文件"""
         try:
             from lib.path_manager import path_manager
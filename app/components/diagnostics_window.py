@@ -0,0 +1,154 @@
+import tkinter as tk
+from tkinter.constants import *
+import ttkbootstrap as ttk
+from typing import Callable, Dict, List, Optional
+from lib.metrics import metrics
+
+
+class DiagnosticsWindow:
+    """诊断窗口：显示各RPC方法和处理阶段的调用统计"""
+    
+    # 统计字段到列的映射
+    COLUMNS = (
+        ("name", "方法/阶段", 320, W),
+        ("count", "次数", 70, E),
+        ("errors", "错误", 60, E),
+        ("p50_ms", "p50(ms)", 80, E),
+        ("p95_ms", "p95(ms)", 80, E),
+        ("p99_ms", "p99(ms)", 80, E),
+        ("max_ms", "最大(ms)", 80, E),
+        ("avg_ms", "平均(ms)", 80, E),
+        ("decode_ms", "解码(ms)", 80, E),
+        ("bytes_sent", "发送", 90, E),
+        ("bytes_received", "接收", 90, E),
+    )
+    
+    def __init__(self, parent: tk.Tk, get_endpoint_status: Optional[Callable[[], List[Dict]]] = None):
+        self.parent = parent
+        # 多实例模式下获取各实例状态的回调
+        self.get_endpoint_status = get_endpoint_status
+        self.window: Optional[tk.Toplevel] = None
+        self.tree: Optional[ttk.Treeview] = None
+        self.endpoint_label: Optional[ttk.Label] = None
+        self._refresh_job: Optional[str] = None
+    
+    def show(self) -> None:
+        """显示诊断窗口"""
+        if self.window and self.window.winfo_exists():
+            self.window.lift()
+            return
+        
+        self.create_window()
+        self.refresh()
+    
+    def create_window(self) -> None:
+        """创建诊断窗口"""
+        self.window = ttk.Toplevel(self.parent)
+        self.window.title("诊断")
+        self.window.geometry("1200x500")
+        self.window.resizable(True, True)
+        
+        main_frame = ttk.Frame(self.window, padding="10")
+        main_frame.pack(fill=BOTH, expand=True)
+        
+        # 工具栏
+        toolbar = ttk.Frame(main_frame)
+        toolbar.pack(fill=X, pady=(0, 10))
+        
+        self.enabled_var = ttk.BooleanVar(value=metrics.enabled)
+        ttk.Checkbutton(
+            toolbar,
+            text="启用统计",
+            variable=self.enabled_var,
+            command=self.toggle_enabled,
+            bootstyle="success-round-toggle"
+        ).pack(side=LEFT, padx=(0, 10))
+        
+        ttk.Button(toolbar, text="刷新", command=self.refresh_now, bootstyle="primary", width=10).pack(side=LEFT, padx=(0, 10))
+        ttk.Button(toolbar, text="重置", command=self.reset, bootstyle="warning", width=10).pack(side=LEFT, padx=(0, 10))
+        
+        # 统计表格
+        tree_frame = ttk.Frame(main_frame)
+        tree_frame.pack(fill=BOTH, expand=True)
+        tree_frame.columnconfigure(0, weight=1)
+        tree_frame.rowconfigure(0, weight=1)
+        
+        self.tree = ttk.Treeview(tree_frame, columns=[key for key, _, _, _ in self.COLUMNS], show="headings")
+        for key, text, width, anchor in self.COLUMNS:
+            self.tree.heading(key, text=text)
+            self.tree.column(key, width=width, anchor=anchor)
+        
+        scrollbar = ttk.Scrollbar(tree_frame, orient=VERTICAL, command=self.tree.yview, bootstyle="secondary")
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.grid(row=0, column=0, sticky=(W, E, N, S))
+        scrollbar.grid(row=0, column=1, sticky=(N, S))
+        
+        # 实例状态
+        self.endpoint_label = ttk.Label(main_frame, text="", bootstyle="secondary", justify=LEFT)
+        self.endpoint_label.pack(fill=X, pady=(10, 0))
+        
+        self.window.protocol("WM_DELETE_WINDOW", self.on_close)
+    
+    def refresh(self) -> None:
+        """刷新统计，窗口打开期间每2秒自动刷新"""
+        if not self.window or not self.window.winfo_exists():
+            return
+        
+        self.tree.delete(*self.tree.get_children())
+        for name, stats in metrics.snapshot().items():
+            values = [name]
+            for key, _, _, _ in self.COLUMNS[1:]:
+                value = stats[key]
+                if key.startswith("bytes_"):
+                    values.append(self._format_bytes(value))
+                elif isinstance(value, float):
+                    values.append(f"{value:.1f}")
+                else:
+                    values.append(str(value))
+            self.tree.insert("", END, values=values)
+        
+        lines = [] if metrics.enabled else ["统计未启用"]
+        if self.get_endpoint_status:
+            for status in self.get_endpoint_status():
+                state = "已连接" if status["connected"] else "未连接"
+                latency = f"{status['latency_ms']} ms" if status["latency_ms"] is not None else "-"
+                error = f"，错误: {status['error']}" if status["error"] else ""
+                lines.append(f"实例 {status['label']}: {state}，最近轮询 {latency}{error}")
+        self.endpoint_label.config(text="\n".join(lines))
+        
+        self._refresh_job = self.window.after(2000, self.refresh)
+    
+    @staticmethod
+    def _format_bytes(size: int) -> str:
+        """格式化字节数"""
+        for unit in ("B", "KB", "MB"):
+            if size < 1024:
+                return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+            size /= 1024
+        return f"{size:.1f} GB"
+    
+    def toggle_enabled(self) -> None:
+        """开启或关闭统计"""
+        metrics.enabled = self.enabled_var.get()
+        self.refresh_now()
+    
+    def reset(self) -> None:
+        """清空统计"""
+        metrics.reset()
+        self.refresh_now()
+    
+    def refresh_now(self) -> None:
+        """取消已安排的刷新并立即刷新"""
+        if self._refresh_job and self.window:
+            self.window.after_cancel(self._refresh_job)
+            self._refresh_job = None
+        self.refresh()
+    
+    def on_close(self) -> None:
+        """关闭窗口"""
+        if self._refresh_job and self.window:
+            self.window.after_cancel(self._refresh_job)
+            self._refresh_job = None
+        if self.window:
+            self.window.destroy()
+            self.window = None
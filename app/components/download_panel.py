@@ -39,7 +39,7 @@ class DownloadPanel:
         # URL标签
         url_label = ttk.Label(
             self.frame, 
-            text="下载链接:", 
+            text="下载链接（多个链接用空格分隔）:", 
             bootstyle="primary"
         )
         url_label.pack(anchor=W, pady=(0, 5))
@@ -0,0 +1,196 @@
+import time
+import tkinter as tk
+from tkinter.constants import *
+import ttkbootstrap as ttk
+from ttkbootstrap.dialogs import Messagebox
+from typing import Callable, Dict, Optional
+from lib.history import DownloadHistory, HISTORY_PAGE_SIZE
+from lib.task_record import STATUS_LABELS, STOPPED_STATUSES, format_size
+
+
+class HistoryWindow:
+    """下载历史窗口：按关键字和状态搜索已结束的任务，分页显示"""
+    
+    # 列: (键, 标题, 宽度, 对齐)
+    COLUMNS = (
+        ("finished_at", "结束时间", 150, W),
+        ("status", "状态", 80, CENTER),
+        ("filename", "文件名", 320, W),
+        ("size", "大小", 100, E),
+        ("host", "主机", 160, W),
+        ("url", "URL", 360, W),
+    )
+    
+    # 状态筛选选项
+    STATUS_FILTERS = {"全部": None, **{STATUS_LABELS[status]: status for status in STOPPED_STATUSES}}
+    
+    # 输入关键字后延迟搜索的时间（毫秒）
+    SEARCH_DELAY_MS = 300
+    
+    def __init__(self, parent: tk.Tk, history: DownloadHistory, on_sync: Optional[Callable[[], None]] = None):
+        self.parent = parent
+        self.history = history
+        # 立即从aria2导入的回调
+        self.on_sync = on_sync
+        self.window: Optional[tk.Toplevel] = None
+        self.tree: Optional[ttk.Treeview] = None
+        self.page = 0
+        self.total_count = 0
+        self._search_job: Optional[str] = None
+    
+    def show(self) -> None:
+        """显示历史窗口"""
+        if self.window and self.window.winfo_exists():
+            self.window.lift()
+            return
+        
+        self.create_window()
+        self.refresh()
+    
+    def create_window(self) -> None:
+        """创建历史窗口"""
+        self.window = ttk.Toplevel(self.parent)
+        self.window.title("下载历史")
+        self.window.geometry("1200x600")
+        self.window.resizable(True, True)
+        
+        main_frame = ttk.Frame(self.window, padding="10")
+        main_frame.pack(fill=BOTH, expand=True)
+        
+        # 搜索栏
+        toolbar = ttk.Frame(main_frame)
+        toolbar.pack(fill=X, pady=(0, 10))
+        
+        ttk.Label(toolbar, text="搜索:").pack(side=LEFT, padx=(0, 5))
+        self.search_var = ttk.StringVar()
+        search_entry = ttk.Entry(toolbar, textvariable=self.search_var, width=40)
+        search_entry.pack(side=LEFT, padx=(0, 10))
+        search_entry.bind("<Return>", lambda event: self.search())
+        self.search_var.trace_add("write", lambda *args: self.schedule_search())
+        
+        ttk.Label(toolbar, text="状态:").pack(side=LEFT, padx=(0, 5))
+        self.status_var = ttk.StringVar(value="全部")
+        status_combo = ttk.Combobox(
+            toolbar,
+            textvariable=self.status_var,
+            values=list(self.STATUS_FILTERS),
+            state="readonly",
+            width=8
+        )
+        status_combo.pack(side=LEFT, padx=(0, 10))
+        status_combo.bind("<<ComboboxSelected>>", lambda event: self.search())
+        
+        ttk.Button(toolbar, text="清空历史", command=self.clear, bootstyle="danger-outline", width=10).pack(side=RIGHT)
+        ttk.Button(toolbar, text="删除记录", command=self.delete_selected, bootstyle="warning-outline", width=10).pack(side=RIGHT, padx=(0, 10))
+        if self.on_sync:
+            ttk.Button(toolbar, text="立即导入", command=self.on_sync, bootstyle="primary", width=10).pack(side=RIGHT, padx=(0, 10))
+        
+        # 历史表格
+        tree_frame = ttk.Frame(main_frame)
+        tree_frame.pack(fill=BOTH, expand=True)
+        tree_frame.columnconfigure(0, weight=1)
+        tree_frame.rowconfigure(0, weight=1)
+        
+        self.tree = ttk.Treeview(tree_frame, columns=[key for key, _, _, _ in self.COLUMNS], show="headings")
+        for key, text, width, anchor in self.COLUMNS:
+            self.tree.heading(key, text=text)
+            self.tree.column(key, width=width, anchor=anchor)
+        
+        scrollbar = ttk.Scrollbar(tree_frame, orient=VERTICAL, command=self.tree.yview, bootstyle="secondary")
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.grid(row=0, column=0, sticky=(W, E, N, S))
+        scrollbar.grid(row=0, column=1, sticky=(N, S))
+        
+        # 分页
+        pager_frame = ttk.Frame(main_frame)
+        pager_frame.pack(fill=X, pady=(10, 0))
+        
+        self.prev_page_btn = ttk.Button(pager_frame, text="上一页", command=self.prev_page, bootstyle="secondary-outline", width=8)
+        self.prev_page_btn.pack(side=LEFT, padx=(0, 5))
+        self.next_page_btn = ttk.Button(pager_frame, text="下一页", command=self.next_page, bootstyle="secondary-outline", width=8)
+        self.next_page_btn.pack(side=LEFT, padx=(0, 10))
+        self.page_label = ttk.Label(pager_frame, text="", bootstyle="secondary")
+        self.page_label.pack(side=LEFT)
+        
+        self.window.protocol("WM_DELETE_WINDOW", self.on_close)
+    
+    @staticmethod
+    def _format_row(row: Dict) -> tuple:
+        """历史记录转换为表格中的一行"""
+        return (
+            time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row["finished_at"])),
+            STATUS_LABELS.get(row["status"], row["status"]),
+            row["filename"],
+            format_size(row["total"]),
+            row["host"],
+            row["url"],
+        )
+    
+    def refresh(self) -> None:
+        """按当前条件查询并显示当前页"""
+        if not self.window or not self.window.winfo_exists():
+            return
+        
+        rows, self.total_count = self.history.search(
+            self.search_var.get(),
+            self.STATUS_FILTERS.get(self.status_var.get()),
+            offset=self.page * HISTORY_PAGE_SIZE,
+            limit=HISTORY_PAGE_SIZE
+        )
+        self.tree.delete(*self.tree.get_children())
+        for row in rows:
+            self.tree.insert("", END, iid=row["gid"], values=self._format_row(row))
+        
+        page_count = max(1, -(-self.total_count // HISTORY_PAGE_SIZE))
+        self.page_label.config(text=f"第 {self.page + 1}/{page_count} 页（共 {self.total_count} 条记录）")
+        self.prev_page_btn.config(state="normal" if self.page > 0 else "disabled")
+        self.next_page_btn.config(state="normal" if self.page < page_count - 1 else "disabled")
+    
+    def schedule_search(self) -> None:
+        """输入停顿后再搜索"""
+        if self._search_job and self.window:
+            self.window.after_cancel(self._search_job)
+        if self.window:
+            self._search_job = self.window.after(self.SEARCH_DELAY_MS, self.search)
+    
+    def search(self) -> None:
+        """从第一页开始搜索"""
+        self._search_job = None
+        self.page = 0
+        self.refresh()
+    
+    def prev_page(self) -> None:
+        """上一页"""
+        if self.page > 0:
+            self.page -= 1
+            self.refresh()
+    
+    def next_page(self) -> None:
+        """下一页"""
+        if (self.page + 1) * HISTORY_PAGE_SIZE < self.total_count:
+            self.page += 1
+            self.refresh()
+    
+    def delete_selected(self) -> None:
+        """删除选中的历史记录"""
+        gids = list(self.tree.selection())
+        if not gids:
+            Messagebox.show_warning("警告", "请先选择要删除的记录", parent=self.window)
+            return
+        self.history.delete(gids)
+        self.refresh()
+    
+    def clear(self) -> None:
+        """清空所有历史记录"""
+        if Messagebox.show_question("确认清空", "确定要清空所有下载历史吗？", parent=self.window) == "是":
+            self.history.clear()
+            self.search()
+    
+    def on_close(self) -> None:
+        """关闭窗口"""
+        if self._search_job and self.window:
+            self.window.after_cancel(self._search_job)
+            self._search_job = None
+        if self.window:
+            self.window.destroy()
+            self.window = None
@@ -3,11 +3,34 @@ from ttkbootstrap.constants import *
 from ttkbootstrap.dialogs import Messagebox
 import tkinter as tk
 from typing import Dict, List, Optional, Callable, Any
+from lib.metrics import metrics
+from lib.columns import TaskColumns
+from lib.task_record import DISPLAY_DEPENDENCIES, TaskRecord
 
 
 class TaskList:
     """下载任务列表组件"""
     
+    # 显示字段到列的映射
+    FIELD_COLUMNS = {
+        "status": "状态",
+        "filename": "文件名",
+        "size": "大小",
+        "progress": "进度",
+        "speed": "速度",
+        "time": "剩余时间",
+        "trend": "速度曲线",
+        "instance": "实例",
+    }
+    
+    # aria2状态到颜色标签和状态图标的映射
+    STATUS_TAGS = {
+        "active": ("downloading", "🔄"),
+        "complete": ("completed", "✅"),
+        "waiting": ("waiting", "⏳"),
+        "paused": ("paused", "⏸️"),
+    }
+    
     def __init__(
         self, 
         parent: tk.Widget, 
@@ -15,7 +38,9 @@ class TaskList:
         on_resume_callback: Optional[Callable[[], None]] = None, 
         on_remove_callback: Optional[Callable[[], None]] = None, 
         on_refresh_callback: Optional[Callable[[], None]] = None, 
-        on_open_folder_callback: Optional[Callable[[str], None]] = None
+        on_open_folder_callback: Optional[Callable[[str], None]] = None,
+        page_size: int = 200,
+        show_instance: bool = False
     ) -> None:
 
         self.parent: tk.Widget = parent
@@ -25,6 +50,20 @@ class TaskList:
         self.on_refresh_callback: Optional[Callable[[], None]] = on_refresh_callback
         self.on_open_folder_callback: Optional[Callable[[str], None]] = on_open_folder_callback
         
+        # 分页状态（活动任务之外的等待/已停止任务）
+        self.page: int = 0
+        self.page_size: int = page_size
+        self.total_count: int = 0
+        # 数据源给出的页数（多实例分页时页数不等于总数按页大小折算）
+        self.page_count: Optional[int] = None
+        
+        # 多实例模式下显示任务所属实例列
+        self.show_instance: bool = show_instance
+        
+        # GID到任务项和任务记录的索引（记录由快照原地更新）
+        self._items: Dict[str, str] = {}
+        self._records: Dict[str, TaskRecord] = {}
+        
         self.create_widgets()
     
     def create_widgets(self) -> None:
@@ -45,10 +84,11 @@ class TaskList:
         tree_frame.rowconfigure(0, weight=1)
         
         # 创建Treeview - 添加文件大小列
-        columns = ("状态", "文件名", "大小", "进度", "速度")
+        columns = ("状态", "文件名", "大小", "进度", "速度", "剩余时间", "速度曲线", "实例")
         self.task_tree = ttk.Treeview(
             tree_frame, 
             columns=columns, 
+            displaycolumns=columns if self.show_instance else columns[:-1],
             show="headings", 
             height=15,
         )
@@ -69,12 +109,18 @@ class TaskList:
         self.task_tree.heading("大小", text="大小")
         self.task_tree.heading("进度", text="进度")
         self.task_tree.heading("速度", text="速度")
+        self.task_tree.heading("剩余时间", text="剩余时间")
+        self.task_tree.heading("速度曲线", text="速度曲线")
+        self.task_tree.heading("实例", text="实例")
         
         self.task_tree.column("状态", width=80, anchor=CENTER)
         self.task_tree.column("文件名", width=300, anchor=W)
         self.task_tree.column("大小", width=120, anchor=E)
         self.task_tree.column("进度", width=100, anchor=CENTER)
         self.task_tree.column("速度", width=120, anchor=E)
+        self.task_tree.column("剩余时间", width=110, anchor=E)
+        self.task_tree.column("速度曲线", width=130, anchor=W)
+        self.task_tree.column("实例", width=60, anchor=CENTER)
         
         # 添加滚动条
         scrollbar = ttk.Scrollbar(
@@ -89,6 +135,9 @@ class TaskList:
         self.task_tree.grid(row=0, column=0, sticky=(W, E, N, S))
         scrollbar.grid(row=0, column=1, sticky=(N, S))
         
+        # 分页控制
+        self.create_pager()
+        
         # 绑定双击事件
         self.task_tree.bind("<Double-1>", self.on_double_click)
         
@@ -100,6 +149,63 @@ class TaskList:
         # 创建右键菜单
         self.create_context_menu()
     
+    def create_pager(self) -> None:
+        """创建分页控制"""
+        pager_frame = ttk.Frame(self.frame)
+        pager_frame.pack(fill=X)
+        
+        self.prev_page_btn = ttk.Button(
+            pager_frame,
+            text="上一页",
+            command=self.prev_page,
+            bootstyle="secondary-outline",
+            width=8
+        )
+        self.prev_page_btn.pack(side=LEFT, padx=(0, 5))
+        
+        self.next_page_btn = ttk.Button(
+            pager_frame,
+            text="下一页",
+            command=self.next_page,
+            bootstyle="secondary-outline",
+            width=8
+        )
+        self.next_page_btn.pack(side=LEFT, padx=(0, 10))
+        
+        self.page_label = ttk.Label(pager_frame, text="", bootstyle="secondary")
+        self.page_label.pack(side=LEFT)
+        
+        self.update_pager(0)
+    
+    def get_page_count(self) -> int:
+        """获取总页数"""
+        if self.page_count is not None:
+            return max(1, self.page_count)
+        return max(1, -(-self.total_count // self.page_size))
+    
+    def update_pager(self, total_count: int, page_count: Optional[int] = None) -> None:
+        """根据等待+已停止任务总数更新分页控制，page_count未给出时按页大小折算"""
+        self.total_count = total_count
+        self.page_count = page_count
+        page_count = self.get_page_count()
+        self.page = min(self.page, page_count - 1)
+        
+        self.page_label.config(text=f"第 {self.page + 1}/{page_count} 页（共 {total_count} 个非活动任务）")
+        self.prev_page_btn.config(state="normal" if self.page > 0 else "disabled")
+        self.next_page_btn.config(state="normal" if self.page < page_count - 1 else "disabled")
+    
+    def prev_page(self) -> None:
+        """上一页"""
+        if self.page > 0:
+            self.page -= 1
+            self.refresh_tasks()
+    
+    def next_page(self) -> None:
+        """下一页"""
+        if self.page < self.get_page_count() - 1:
+            self.page += 1
+            self.refresh_tasks()
+    
     def create_context_menu(self) -> None:
         """创建右键菜单"""
         self.context_menu = tk.Menu(self.parent, tearoff=0)
@@ -237,96 +343,89 @@ class TaskList:
         """清空任务列表"""
         for item in self.task_tree.get_children():
             self.task_tree.delete(item)
+        self._items.clear()
+        self._records.clear()
     
-    def add_task(self, task_info: Dict[str, Any]) -> None:
-        """添加任务到列表"""
-        gid = task_info.get("gid", "")
-        status = task_info.get("status", "未知")
-        filename = task_info.get("filename", "未知文件")
-        size_str = task_info.get("size", "未知")
-        progress = task_info.get("progress", "0%")
-        speed_str = task_info.get("speed", "0 B/s")
-        
-        # 根据状态设置标签颜色
-        tags = [gid]
-        if status == "下载中":
-            tags.append("downloading")
-        elif status == "已完成":
-            tags.append("completed")
-        elif status == "等待中":
-            tags.append("waiting")
-        elif status == "已暂停":
-            tags.append("paused")
-        else:
-            tags.append("unknown")
-        
-        # 插入到树形控件 - 包含文件大小
-        item = self.task_tree.insert("", END, values=(
-            status, filename, size_str, progress, speed_str
-        ), tags=tags)
-        
-        # 设置行颜色
-        self.set_row_color(item, status)
-    
-    def set_row_color(self, item: str, status: str) -> None:
-        """设置行颜色"""
-        if status == "下载中":
-            self.task_tree.set(item, "状态", "🔄 下载中")
-        elif status == "已完成":
-            self.task_tree.set(item, "状态", "✅ 已完成")
-        elif status == "等待中":
-            self.task_tree.set(item, "状态", "⏳ 等待中")
-        elif status == "暂停":
-            self.task_tree.set(item, "状态", "⏸️ 暂停")
-        else:
-            self.task_tree.set(item, "状态", "❓ 未知")
+    def add_task(self, task: TaskRecord, computed: Optional[Dict[str, int]] = None) -> None:
+        """添加任务到列表，computed为按列计算的进度和剩余时间"""
+        tag, _ = self.STATUS_TAGS.get(task.status, ("unknown", "❓"))
+        
+        # 插入到树形控件，显示文本只为列表中的任务生成
+        item = self.task_tree.insert("", END, values=task.display_values(computed), tags=[task.gid, tag])
+        self._items[task.gid] = item
+        self._records[task.gid] = task
+        
+        # 设置状态列
+        self.set_row_color(item, task)
     
-    def update_task(self, gid: str, task_info: Dict[str, Any]) -> None:
-        """更新任务信息"""
-        # 查找对应的任务项
-        for item in self.task_tree.get_children():
-            tags = self.task_tree.item(item, "tags")
-            if tags and tags[0] == gid:
-                # 更新任务信息 - 包含文件大小
-                status = task_info.get("status", "未知")
-                filename = task_info.get("filename", "未知文件")
-                size_str = task_info.get("size", "未知")
-                progress = task_info.get("progress", "0%")
-                speed_str = task_info.get("speed", "0 B/s")
-                
-                self.task_tree.item(item, values=(
-                    status, filename, size_str, progress, speed_str
-                ))
-                
-                # 更新颜色标签
-                current_tags = list(tags)
-                # 移除旧的状态标签
-                for tag in ["downloading", "completed", "waiting", "paused", "unknown"]:
-                    if tag in current_tags:
-                        current_tags.remove(tag)
-                
-                # 添加新的状态标签
-                if status == "下载中":
-                    current_tags.append("downloading")
-                elif status == "已完成":
-                    current_tags.append("completed")
-                elif status == "等待中":
-                    current_tags.append("waiting")
-                elif status == "已暂停":
-                    current_tags.append("paused")
-                else:
-                    current_tags.append("unknown")
-                
-                # 如果该项目当前被选中，添加选中标签
-                if item in self.task_tree.selection():
-                    if "selected" not in current_tags:
-                        current_tags.append("selected")
-                
-                self.task_tree.item(item, tags=current_tags)
-                
-                # 更新行颜色
-                self.set_row_color(item, status)
-                break
+    def set_row_color(self, item: str, task: TaskRecord) -> None:
+        """设置状态列的图标和文本"""
+        _, icon = self.STATUS_TAGS.get(task.status, ("unknown", "❓"))
+        self.task_tree.set(item, "状态", f"{icon} {task.status_label}")
+    
+    def update_status_tags(self, item: str, task: TaskRecord) -> None:
+        """更新任务项的状态颜色标签和状态列"""
+        current_tags = list(self.task_tree.item(item, "tags"))
+        # 移除旧的状态标签
+        for tag in ["downloading", "completed", "waiting", "paused", "unknown"]:
+            if tag in current_tags:
+                current_tags.remove(tag)
+        
+        # 添加新的状态标签
+        tag, _ = self.STATUS_TAGS.get(task.status, ("unknown", "❓"))
+        current_tags.append(tag)
+        
+        # 如果该项目当前被选中，添加选中标签
+        if item in self.task_tree.selection():
+            if "selected" not in current_tags:
+                current_tags.append("selected")
+        
+        self.task_tree.item(item, tags=current_tags)
+        
+        # 更新行颜色
+        self.set_row_color(item, task)
+    
+    def apply_delta(self, delta: Dict[str, Any]) -> None:
+        """应用任务增量，只重新格式化发生变化的行和列"""
+        with metrics.stage("ui.apply_delta"):
+            for gid in delta["removed"]:
+                self.remove_task(gid)
+            
+            # 需要重新显示进度或剩余时间的行按列一次计算
+            rows = list(delta["added"].values())
+            updates = {}
+            for gid, changed in delta["changed"].items():
+                item = self.find_item(gid)
+                task = self._records.get(gid)
+                if not item or not task:
+                    continue
+                fields = {field for key in changed for field in DISPLAY_DEPENDENCIES.get(key, ())}
+                updates[gid] = (item, task, fields)
+                if "progress" in fields or "time" in fields:
+                    rows.append(task)
+            with metrics.stage("columns"):
+                computed = TaskColumns(rows).computed() if rows else {}
+            
+            for gid, task in delta["added"].items():
+                self.add_task(task, computed.get(gid))
+            
+            for gid, (item, task, fields) in updates.items():
+                for field in fields:
+                    if field != "status":
+                        self.task_tree.set(item, self.FIELD_COLUMNS[field], task.display(field, computed.get(gid)))
+                if "status" in fields:
+                    self.update_status_tags(item, task)
+    
+    def find_item(self, gid: str) -> Optional[str]:
+        """根据GID查找任务项"""
+        return self._items.get(gid)
+    
+    def remove_task(self, gid: str) -> None:
+        """从列表中移除任务"""
+        item = self._items.pop(gid, None)
+        self._records.pop(gid, None)
+        if item:
+            self.task_tree.delete(item)
     
     def get_task_count(self) -> int:
         """获取任务总数"""
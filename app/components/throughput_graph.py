@@ -0,0 +1,172 @@
+import tkinter as tk
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+import ttkbootstrap as ttk
+from ttkbootstrap.constants import *
+from lib.task_record import format_speed
+from lib.timeseries import ThroughputStore
+
+
+class ThroughputGraph:
+    """全局下载/上传速度曲线
+    
+    每个点对应Canvas上的一段线段，新数据到达时整体平移已有线段、只绘制新增的线段，
+    并删除移出时间范围的线段；只有刻度、范围或窗口大小变化时才完整重绘。
+    """
+    
+    # 时间范围: 名称 -> (存储层, 跨度秒)
+    RANGES = {
+        "5分钟": (0, 300),
+        "1小时": (0, 3600),
+        "1天": (1, 86400),
+    }
+    
+    # 各曲线的颜色（与ThroughputStore的字段顺序一致：下载、上传）
+    COLORS = ("#28a745", "#007bff")
+    
+    # 相邻点间隔超过分辨率的这个倍数时断开曲线
+    MAX_GAP = 5
+    
+    # 可见范围内的峰值低于刻度的这个比例时缩小刻度
+    SHRINK_RATIO = 0.25
+    
+    def __init__(self, parent: tk.Widget, store: ThroughputStore, height: int = 120):
+        self.store = store
+        
+        # 已绘制的点和对应的线段: (时间戳, 值, [线段])
+        self._drawn: Deque[Tuple[int, Tuple[int, ...], List[int]]] = deque()
+        # 右边界对应的时间戳和当前刻度（字节/秒）
+        self._right: Optional[int] = None
+        self._scale = 0
+        
+        self.frame = ttk.LabelFrame(parent, text="吞吐量", bootstyle="secondary", padding="5")
+        self.frame.pack(fill=X, pady=(0, 10))
+        
+        toolbar = ttk.Frame(self.frame)
+        toolbar.pack(fill=X)
+        
+        self.range_var = ttk.StringVar(value="5分钟")
+        ttk.Combobox(
+            toolbar,
+            textvariable=self.range_var,
+            values=list(self.RANGES),
+            state="readonly",
+            width=8
+        ).pack(side=LEFT)
+        self.range_var.trace_add("write", lambda *args: self.redraw())
+        
+        self.value_label = ttk.Label(toolbar, text="", bootstyle="secondary")
+        self.value_label.pack(side=RIGHT)
+        ttk.Label(toolbar, text="■ 上传", foreground=self.COLORS[1]).pack(side=RIGHT, padx=(0, 10))
+        ttk.Label(toolbar, text="■ 下载", foreground=self.COLORS[0]).pack(side=RIGHT, padx=(0, 5))
+        
+        self.canvas = tk.Canvas(self.frame, height=height, highlightthickness=0, background="#ffffff")
+        self.canvas.pack(fill=X, pady=(5, 0))
+        self.canvas.bind("<Configure>", lambda event: self.redraw())
+    
+    def _range(self) -> Tuple[int, int]:
+        """当前范围的 (存储层, 跨度秒)"""
+        return self.RANGES.get(self.range_var.get(), self.RANGES["5分钟"])
+    
+    @staticmethod
+    def _nice_scale(peak: int) -> int:
+        """不小于峰值的1/2/5×10^n刻度，最小1 KB/s"""
+        scale = 1024
+        while scale < peak:
+            for factor in (2, 2.5, 2):
+                scale = int(scale * factor)
+                if scale >= peak:
+                    break
+        return scale
+    
+    def _x(self, timestamp: int) -> float:
+        _, span = self._range()
+        width = self.canvas.winfo_width()
+        return width - (self._right - timestamp) * width / span
+    
+    def _y(self, value: int) -> float:
+        height = self.canvas.winfo_height()
+        return height - 2 - value * (height - 4) / self._scale
+    
+    def _draw_segment(self, previous: Optional[Tuple[int, Tuple[int, ...]]], timestamp: int, values: Tuple[int, ...]) -> List[int]:
+        """绘制从上一个点到当前点的线段"""
+        tier, _ = self._range()
+        resolution = self.store.tiers[tier].resolution
+        if previous is None or timestamp - previous[0] > resolution * self.MAX_GAP:
+            return []
+        
+        x0, x1 = self._x(previous[0]), self._x(timestamp)
+        return [
+            self.canvas.create_line(x0, self._y(previous[1][i]), x1, self._y(values[i]), fill=color, width=1.5, tags="series")
+            for i, color in enumerate(self.COLORS)
+        ]
+    
+    def redraw(self) -> None:
+        """完整重绘"""
+        self.canvas.delete("all")
+        self._drawn.clear()
+        self._right = None
+        
+        tier, span = self._range()
+        latest = self.store.tiers[tier].latest_time
+        if latest is None or self.canvas.winfo_width() <= 1:
+            return
+        
+        points = self.store.points(tier, since=latest - span)
+        self._right = latest
+        self._scale = self._nice_scale(max(max(values[0], values[1]) for _, values in points))
+        self.canvas.create_text(4, 2, text=format_speed(self._scale), anchor=NW, fill="#6c757d", tags="axis")
+        
+        previous = None
+        for timestamp, values in points:
+            self._drawn.append((timestamp, values, self._draw_segment(previous, timestamp, values)))
+            previous = (timestamp, values)
+        self.update_label()
+    
+    def update(self) -> None:
+        """增量绘制新增的点"""
+        if self._right is None:
+            self.redraw()
+            return
+        
+        tier, span = self._range()
+        last_time = self._drawn[-1][0] if self._drawn else self._right
+        points = self.store.points(tier, since=last_time)
+        if not points:
+            return
+        if max(max(values[0], values[1]) for _, values in points) > self._scale:
+            self.redraw()
+            return
+        
+        for timestamp, values in points:
+            if self._drawn and self._drawn[-1][0] == timestamp:
+                # 最新的桶被原地更新，重画最后一段
+                _, _, items = self._drawn.pop()
+                if items:
+                    self.canvas.delete(*items)
+            elif timestamp > self._right:
+                # 新的点：已有线段整体左移
+                dx = (timestamp - self._right) * self.canvas.winfo_width() / span
+                self.canvas.move("series", -dx, 0)
+                self._right = timestamp
+            previous = self._drawn[-1][:2] if self._drawn else None
+            self._drawn.append((timestamp, values, self._draw_segment(previous, timestamp, values)))
+        
+        # 删除移出范围的线段
+        while self._drawn and self._drawn[0][0] < self._right - span:
+            _, _, items = self._drawn.popleft()
+            if items:
+                self.canvas.delete(*items)
+        
+        # 峰值移出范围后缩小刻度
+        peak = max((max(values[0], values[1]) for _, values, _ in self._drawn), default=0)
+        if self._scale > 1024 and peak < self._scale * self.SHRINK_RATIO:
+            self.redraw()
+            return
+        self.update_label()
+    
+    def update_label(self) -> None:
+        """显示最新的速度"""
+        if self._drawn:
+            _, values, _ = self._drawn[-1]
+            self.value_label.config(text=f"下载 {format_speed(values[0])}  上传 {format_speed(values[1])}")
@@ -0,0 +1,147 @@
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .history import DownloadHistory, HISTORY_COLUMNS
+from .path_manager import path_manager
+from .task_record import STOPPED_STATUSES
+
+
+# 默认在aria2中最多保留的已停止结果数（0表示不按数量归档）
+DEFAULT_MAX_RESULTS = 1000
+
+# 默认的已停止结果最长保留时间（小时，0表示不按时间归档）
+DEFAULT_MAX_AGE_HOURS = 24
+
+# 每批归档的结果数
+ARCHIVE_BATCH_SIZE = 500
+
+
+class ResultArchiver:
+    """把aria2的已停止结果归档到下载历史并从守护进程中移除
+    
+    各实例超过保留数量的最旧结果和结束时间超过保留时长的结果按批处理，每批依次：
+    1. 把整批记录写入日志文件（临时文件 + fsync + 原子替换）；
+    2. 写入下载历史数据库并确认全部已记录；
+    3. 通过removeDownloadResult从aria2移除；
+    4. 删除日志。
+    任意一步中断时日志仍在，下次运行先重放日志（写入历史是幂等的，重复移除只会返回错误），
+    因此结果在离开aria2之前一定已经落盘。不使用purgeDownloadResult，
+    它会同时清除尚未导入历史的新结果。
+    按时长归档使用历史中的结束时间，即最早观察到任务停止的时间（aria2不提供结束时间），
+    程序未运行期间结束的结果从导入时开始计时。
+    """
+    
+    def __init__(
+        self,
+        history: DownloadHistory,
+        journal_path: str,
+        max_results: int = DEFAULT_MAX_RESULTS,
+        max_age_hours: float = DEFAULT_MAX_AGE_HOURS,
+        batch_size: int = ARCHIVE_BATCH_SIZE
+    ):
+        self.history = history
+        self.journal_path = journal_path
+        self.max_results = max_results
+        self.max_age_hours = max_age_hours
+        self.batch_size = batch_size
+    
+    def configure(self, config: Dict) -> None:
+        """从配置中读取保留数量和时长"""
+        self.max_results = int(config.get("archive_max_results", DEFAULT_MAX_RESULTS) or 0)
+        self.max_age_hours = float(config.get("archive_max_age_hours", DEFAULT_MAX_AGE_HOURS) or 0)
+    
+    @property
+    def enabled(self) -> bool:
+        """是否启用了任一归档条件"""
+        return self.max_results > 0 or self.max_age_hours > 0
+    
+    def _write_journal(self, rows: List[Tuple]) -> None:
+        """把一批记录写入日志"""
+        temp_path = f"{self.journal_path}.tmp"
+        path_manager.ensure_parent(self.journal_path)
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(dict(zip(HISTORY_COLUMNS, row)), ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.journal_path)
+    
+    def _read_journal(self) -> List[Tuple]:
+        """读取日志中未完成的批次"""
+        if not os.path.exists(self.journal_path):
+            return []
+        rows = []
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    rows.append(tuple(entry[column] for column in HISTORY_COLUMNS))
+        return rows
+    
+    def _clear_journal(self) -> None:
+        """批次完成后删除日志"""
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+    
+    def _commit(self, service, rows: List[Tuple]) -> int:
+        """写入历史、确认后从aria2移除并删除日志，返回移除的条数"""
+        gids = [row[0] for row in rows]
+        self.history.record_rows(rows)
+        if len(self.history.known(gids)) < len(set(gids)):
+            raise RuntimeError("写入下载历史未完成，保留归档日志")
+        
+        results = service.bulk_action("remove_result", gids)
+        self._clear_journal()
+        return sum(1 for error in results.values() if error is None)
+    
+    def recover(self, service) -> int:
+        """重放上次中断的批次"""
+        rows = self._read_journal()
+        if not rows:
+            return 0
+        print(f"恢复未完成的归档批次: {len(rows)} 条")
+        return self._commit(service, rows)
+    
+    def select(self, groups: List[List[str]], now: Optional[float] = None) -> List[str]:
+        """从按实例分组、组内按时间从旧到新排列的已停止GID中选出需要归档的部分
+        
+        保留数量按实例计算（与aria2自身的max-download-result一致）：
+        各实例的结果只在组内有先后顺序，拼接后的列表没有全局顺序，不能整体截取。
+        """
+        gids = [gid for group in groups for gid in group]
+        selected = set()
+        if self.max_results > 0:
+            for group in groups:
+                if len(group) > self.max_results:
+                    selected.update(group[:len(group) - self.max_results])
+        if self.max_age_hours > 0:
+            deadline = (time.time() if now is None else now) - self.max_age_hours * 3600
+            selected.update(gid for gid, finished_at in self.history.finished_times(gids).items() if finished_at <= deadline)
+        return [gid for gid in gids if gid in selected]
+    
+    def run(self, service) -> int:
+        """执行一次归档，返回从aria2移除的结果数；service为Aria2或Aria2Pool"""
+        if not self.enabled:
+            return 0
+        
+        archived = 0
+        try:
+            archived += self.recover(service)
+            candidates = self.select(service.get_stopped_gid_groups())
+            for start in range(0, len(candidates), self.batch_size):
+                downloads = service.get_downloads_by_gids(candidates[start:start + self.batch_size])
+                now = time.time()
+                rows = [
+                    self.history.to_row(task, now)
+                    for task in downloads.values() if task and task.status in STOPPED_STATUSES
+                ]
+                if not rows:
+                    continue
+                self._write_journal(rows)
+                archived += self._commit(service, rows)
+            return archived
+        except Exception as e:
+            print(f"归档已停止结果失败: {e}")
+            return archived
@@ -1,18 +1,68 @@
 import os
 import time
 import subprocess
-import psutil
+import threading
 import json
-from typing import Dict, Optional, Callable, List
+from functools import partial
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, Optional, Callable, List, Tuple
 from pathlib import Path
-from aria2p import API, Client, Download
+from urllib.parse import urlparse, unquote, parse_qs
+from aria2p import API, Client, ClientException
+from .cache import LRUCache
 from .path_manager import path_manager
+from .health import ConnectionHealth, CONNECTED, DEGRADED, DOWN
+from .metrics import metrics
+from .session import prepare_session, DEFAULT_SESSION_INTERVAL
+from .snapshot import TaskSnapshot
+from .task_record import TaskRecord, STOPPED_STATUSES
+from .transport import create_client, DEFAULT_POOL_SIZE, DEFAULT_TIMEOUT
+
+# psutil导入时会读取/proc等系统信息，在查找进程时才导入
+if TYPE_CHECKING:
+    import psutil
+
+
+# 任务列表渲染所需的字段（aria2只支持顶层键投影，files[0]的path/uris随files返回，BT任务名随bittorrent返回）
+TASK_KEYS = ["gid", "status", "totalLength", "completedLength", "downloadSpeed", "files", "bittorrent"]
+
+# tellWaiting/tellStopped 单次获取的最大条数（与aria2p保持一致）
+QUEUE_FETCH_LIMIT = 1000
+
+# 分页获取时每页的等待/已停止任务数
+PAGE_SIZE = 200
+
+# system.multicall 单次请求包含的最大调用数
+MULTICALL_CHUNK_SIZE = 500
+
+# 批量操作名到aria2方法的映射
+BULK_ACTIONS = {
+    "pause": Client.PAUSE,
+    "unpause": Client.UNPAUSE,
+    "remove": Client.REMOVE,
+    "force_remove": Client.FORCE_REMOVE,
+    "remove_result": Client.REMOVE_DOWNLOAD_RESULT,
+}
+
+# 文件名缓存的容量（按GID和按URL各一份）
+FILENAME_CACHE_SIZE = 20000
+
+# aria2 WebSocket通知事件（aria2.onDownloadStart/Pause/Stop/Complete/Error/BtDownloadComplete）
+NOTIFICATION_EVENTS = ("start", "pause", "stop", "complete", "error", "bt_complete")
+
+# 订阅通知的超时（秒），以及停止时等待旧监听线程退出的时间
+NOTIFICATION_LISTEN_TIMEOUT = 1
+NOTIFICATION_STOP_TIMEOUT = 2.0
+
+# 通知通道意外断开（HTTP仍正常）后重新订阅的退避间隔（秒）：从初始值起每次翻倍，不超过上限；
+# 监听持续超过上限后再断开时重新从初始值开始
+NOTIFICATION_RETRY_DELAY = 1.0
+NOTIFICATION_RETRY_MAX_DELAY = 60.0
 
 
 class Aria2:
     """Aria2服务管理器"""
     
-    def __init__(self, config_file: Optional[str] = None):
+    def __init__(self, config_file: Optional[str] = None, instance: Optional[int] = None, endpoint: Optional[Dict] = None):
         # 使用路径管理器获取标准路径
         self.config_path = Path(path_manager.get_config_path())
         self.pid_path = Path(path_manager.get_pid_path())
@@ -22,22 +72,68 @@ class Aria2:
         if config_file:
             self.config_path = Path(config_file)
         
+        # 多实例模式下的实例序号（None表示单实例）
+        self.instance = instance
+        # 远程节点配置（host/port/secret等，覆盖配置文件中的同名项）
+        self.endpoint = endpoint
+        
         # 状态
         self.connected = False
         self.api = None
         
+        # 轮询模式：True时使用system.multicall并只请求TASK_KEYS
+        self.multicall_polling = True
+        # 最近一次轮询得到的全局状态（getGlobalStat）
+        self.global_stat: Dict = {}
+        # 按GID保存的任务快照，轮询结果经由它发布增量
+        self.snapshot = TaskSnapshot()
+        
+        # 已解析的文件名：GID -> (files[0].path, 文件名, URL)，URL -> 文件名
+        self._filename_cache = LRUCache(FILENAME_CACHE_SIZE)
+        self._url_filename_cache = LRUCache(FILENAME_CACHE_SIZE)
+        
+        # 连接健康状态和后台探测线程
+        self.health = ConnectionHealth()
+        self._health_thread: Optional[threading.Thread] = None
+        self._health_stop = threading.Event()
+        self._health_wakeup = threading.Event()
+        # 连接标志的读写与连接/断开的处理串行执行（探测线程和调用方线程都会触发）
+        self._connection_lock = threading.RLock()
+        
+        # WebSocket通知
+        self.notifications_active = False
+        self._notification_thread: Optional[threading.Thread] = None
+        # 是否应保持订阅（start_notifications后为True，stop_notifications后为False）
+        self._notifications_wanted = False
+        # 通知通道连续意外断开的次数，以及允许重新订阅的时间（time.monotonic）
+        self._notification_failures = 0
+        self._notification_retry_at = 0.0
+        
         # 回调函数
         self.on_status_change: Optional[Callable] = None
         self.on_connection_change: Optional[Callable] = None
+        self.on_task_event: Optional[Callable[[str, str], None]] = None
+        
+        # 最近一次启动时的会话恢复报告（见session.prepare_session）
+        self.recovery: Optional[Dict] = None
         
         # 默认配置
         # 使用路径管理器创建默认配置
         self.default_config = path_manager.create_default_config()
     
-    def set_callbacks(self, on_status_change: Optional[Callable] = None, on_connection_change: Optional[Callable] = None) -> None:
-        """设置回调函数"""
+    def set_callbacks(
+        self,
+        on_status_change: Optional[Callable] = None,
+        on_connection_change: Optional[Callable] = None,
+        on_task_event: Optional[Callable[[str, str], None]] = None
+    ) -> None:
+        """设置回调函数
+        
+        on_task_event(event, gid) 在WebSocket通知线程中调用，event取值见NOTIFICATION_EVENTS
+        """
         self.on_status_change = on_status_change
         self.on_connection_change = on_connection_change
+        self.on_task_event = on_task_event
     
     def load_config(self) -> Dict:
         """加载配置文件"""
@@ -54,13 +150,14 @@ class Aria2:
     def save_config(self, config: Dict) -> None:
         """保存配置文件"""
         try:
+            path_manager.ensure_parent(self.config_path)
             with open(self.config_path, 'w', encoding='utf-8') as f:
                 json.dump(config, f, indent=2, ensure_ascii=False)
         except Exception as e:
             print(f"保存配置失败: {e}")
     
-    def _build_command(self, config: Dict) -> List[str]:
-        """构建aria2c启动命令"""
+    def _build_command(self, config: Dict, input_file: Optional[str] = None) -> List[str]:
+        """构建aria2c启动命令，input_file为要恢复的会话文件"""
         cmd = ["aria2c", "--enable-rpc=true", "--rpc-listen-all=true", "--rpc-allow-origin-all=true"]
         
         # 基本配置
@@ -91,23 +188,76 @@ class Aria2:
             # 直接使用完整的代理URL
             cmd.append(f"--all-proxy={proxy}")
         
+        # 会话：按间隔保存未完成的任务，启动时从上次的会话恢复
+        session_interval = int(config.get('save_session_interval', DEFAULT_SESSION_INTERVAL) or 0)
+        if session_interval > 0:
+            cmd.extend([
+                f"--save-session={config.get('session_path', path_manager.get_session_path())}",
+                f"--save-session-interval={session_interval}",
+            ])
+            if input_file:
+                cmd.append(f"--input-file={input_file}")
+        
         return cmd
     
-    def is_running(self) -> bool:
-        """检查aria2c服务是否运行"""
+    def get_config(self) -> Dict:
+        """获取本实例的有效配置
+        
+        多实例模式下端口按实例序号递增，下载目录和日志按实例区分；
+        远程节点使用节点配置中的地址、端口和密钥。
+        """
+        config = dict(self.load_config())
+        if self.instance is not None:
+            config['port'] = int(config.get('port', 6800)) + self.instance
+            config['download_dir'] = str(
+                Path(config.get('download_dir', path_manager.get_downloads_path())) / f"aria2-{self.instance}"
+            )
+            config['log_path'] = str(
+                Path(config.get('log_path', path_manager.get_log_path())).with_name(f"aria2-{self.instance}.log")
+            )
+            config['session_path'] = str(
+                Path(config.get('session_path', path_manager.get_session_path())).with_name(f"aria2-{self.instance}.session")
+            )
+        if self.endpoint:
+            # 远程节点的下载目录在节点上，未指定时使用节点自己的默认目录
+            config.pop('download_dir', None)
+            config.update(self.endpoint)
+        return config
+    
+    @staticmethod
+    def _listen_port(cmdline: List[str]) -> int:
+        """从aria2c命令行中解析RPC端口"""
+        for index, arg in enumerate(cmdline):
+            try:
+                if arg.startswith("--rpc-listen-port="):
+                    return int(arg.split("=", 1)[1])
+                if arg == "--rpc-listen-port" and index + 1 < len(cmdline):
+                    return int(cmdline[index + 1])
+            except ValueError:
+                continue
+        return 6800
+    
+    def _find_process(self) -> Optional["psutil.Process"]:
+        """查找本实例对应的aria2c进程（按RPC端口匹配）"""
+        import psutil
+        
+        port = int(self.get_config().get('port', 6800))
         try:
-            # 检查进程
-            for proc in psutil.process_iter(['name', 'cmdline']):
+            for proc in psutil.process_iter(['pid', 'name', 'cmdline', 'create_time']):
                 try:
-                    if proc.info['name'] == 'aria2c' and proc.info['cmdline']:
-                        if '--enable-rpc' in ' '.join(proc.info['cmdline']):
-                            return True
+                    cmdline = proc.info['cmdline']
+                    if proc.info['name'] == 'aria2c' and cmdline:
+                        if '--enable-rpc' in ' '.join(cmdline) and self._listen_port(cmdline) == port:
+                            return proc
                 except (psutil.NoSuchProcess, psutil.AccessDenied):
                     continue
-            
-            return False
         except Exception:
-            return False
+            pass
+        return None
+    
+    def is_running(self) -> bool:
+        """检查aria2c服务是否运行"""
+        return self._find_process() is not None
     
     def start_service(self) -> bool:
         """启动aria2c服务"""
@@ -115,11 +265,21 @@ class Aria2:
             return True
         
         try:
-            config = self.load_config()
-            cmd = self._build_command(config)
+            config = self.get_config()
             
-            # 创建日志目录
-            Path(path_manager.get_log_path()).parent.mkdir(parents=True, exist_ok=True)
+            # 从上次保存的会话恢复任务队列
+            input_file = None
+            if int(config.get('save_session_interval', DEFAULT_SESSION_INTERVAL) or 0) > 0:
+                input_file, self.recovery = prepare_session(config.get('session_path', path_manager.get_session_path()))
+                if self.recovery["entries"]:
+                    print(f"从会话恢复 {self.recovery['entries']} 个任务: {self.recovery['session']}")
+            cmd = self._build_command(config, input_file)
+            
+            # 创建日志、PID和会话文件所在的目录
+            path_manager.ensure_parent(config.get('log_path', path_manager.get_log_path()))
+            path_manager.ensure_parent(str(self.pid_path))
+            if input_file is not None or int(config.get('save_session_interval', DEFAULT_SESSION_INTERVAL) or 0) > 0:
+                path_manager.ensure_parent(config.get('session_path', path_manager.get_session_path()))
             
             # 启动进程（后台运行）
             process = subprocess.Popen(
@@ -129,11 +289,13 @@ class Aria2:
                 preexec_fn=os.setsid if os.name != 'nt' else None
             )
             
-            # 等待aria2c进程启动
-            time.sleep(2)
-            
-            # 检查服务是否启动成功
-            return self.is_running()
+            # 等待aria2c进程出现（--daemon=true时前台进程会立即退出）
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline:
+                if self.is_running():
+                    return True
+                time.sleep(0.1)
+            return False
                 
         except FileNotFoundError:
             print("错误: 未找到aria2c命令")
@@ -144,56 +306,52 @@ class Aria2:
     
     def stop_service(self) -> bool:
         """停止aria2c服务"""
-        if not self.is_running():
+        import psutil
+        
+        proc = self._find_process()
+        if proc is None:
             return True
         
+        # 先保存一次会话（aria2c正常退出时也会保存）
+        if self.connected and self.api:
+            try:
+                self.api.client.save_session()
+            except Exception as e:
+                print(f"保存会话失败: {e}")
+        
         try:
-            # 通过进程名停止
-            for proc in psutil.process_iter(['name', 'cmdline']):
-                try:
-                    if proc.info['name'] == 'aria2c' and proc.info['cmdline']:
-                        if '--enable-rpc' in ' '.join(proc.info['cmdline']):
-                            proc.terminate()
-                            return True
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    continue
-            
-            return False
-        except Exception:
+            proc.terminate()
+            proc.wait(timeout=5)
+            return True
+        except psutil.NoSuchProcess:
+            return True
+        except (psutil.AccessDenied, psutil.TimeoutExpired):
             return False
     
     def get_status(self) -> Dict:
         """获取服务状态"""
-        config = self.load_config()
-        running = self.is_running()
+        config = self.get_config()
+        proc = self._find_process()
         
         status = {
-            "running": running,
+            "running": proc is not None,
             "config_file": str(self.config_path),
-            "log_file": path_manager.get_log_path(),
+            "log_file": config.get('log_path', path_manager.get_log_path()),
+            "session_file": config.get('session_path', path_manager.get_session_path()),
+            "recovery": self.recovery,
             "config": config
         }
         
         # 获取运行中的进程信息
-        if running:
-            try:
-                for proc in psutil.process_iter(['pid', 'name', 'cmdline', 'create_time']):
-                    try:
-                        if proc.info['name'] == 'aria2c' and proc.info['cmdline']:
-                            if '--enable-rpc' in ' '.join(proc.info['cmdline']):
-                                status["pid"] = proc.info['pid']
-                                status["start_time"] = proc.info['create_time']
-                                break
-                    except (psutil.NoSuchProcess, psutil.AccessDenied):
-                        continue
-            except Exception:
-                pass
+        if proc is not None:
+            status["pid"] = proc.info['pid']
+            status["start_time"] = proc.info['create_time']
         
         return status
     
     def get_logs(self, lines: int = 50) -> List[str]:
         """获取日志"""
-        log_path = Path(path_manager.get_log_path())
+        log_path = Path(self.get_config().get('log_path', path_manager.get_log_path()))
         if not log_path.exists():
             return ["日志文件不存在"]
         
@@ -206,39 +364,216 @@ class Aria2:
     def connect(self, host: Optional[str] = None, port: Optional[int] = None, secret: Optional[str] = None) -> bool:
         """连接到aria2服务"""
         try:
-            config = self.load_config()
-            host = host or config.get('host', 'localhost')
+            config = self.get_config()
+            host = self._normalize_host(host or config.get('host', 'localhost'))
             port = port or config.get('port', 6800)
             secret = secret or config.get('secret', '')
             
-            # 创建客户端和API - 使用默认参数
-            if secret:
-                client = Client(host=host, port=port, secret=secret)
-            else:
-                client = Client()  # 使用默认参数
-            self.api = API(client)
+            # 关闭之前的连接
+            self._close_client()
             
-            # 测试连接 - 使用get_stats方法
-            self.api.get_stats()
-            self.connected = True
-            
-            if self.on_connection_change:
-                self.on_connection_change(True, "已连接")
-            return True
+            # 创建带连接池和超时的客户端
+            client = create_client(
+                host, port, secret,
+                transport=config.get('transport', 'http'),
+                timeout=config.get('timeout', DEFAULT_TIMEOUT),
+                pool_size=config.get('pool_size', DEFAULT_POOL_SIZE)
+            )
+            self.api = API(client)
             
         except Exception as e:
-            self.connected = False
+            with self._connection_lock:
+                self.connected = False
             if self.on_connection_change:
                 self.on_connection_change(False, f"连接失败: {e}")
             return False
+        
+        # 首次探测，失败时由后台线程按退避间隔继续重试
+        self.health.start()
+        if not self.ping() and self.on_connection_change:
+            self.on_connection_change(False, f"连接失败: {self.health.last_error}，正在自动重试")
+        self.start_health_monitor()
+        return self.connected
     
     def disconnect(self) -> None:
         """断开连接"""
-        self.connected = False
-        self.api = None
+        self.stop_health_monitor()
+        self.health.stop()
+        with self._connection_lock:
+            self.connected = False
+        self._close_client()
         if self.on_connection_change:
             self.on_connection_change(False, "已断开")
     
+    def ping(self) -> bool:
+        """用aria2.getVersion探测连接，并更新健康状态"""
+        if not self.api:
+            return False
+        try:
+            self.api.client.call(Client.GET_VERSION)
+        except Exception as e:
+            self._record_failure(e)
+            return False
+        self._record_success()
+        return True
+    
+    def _record_success(self) -> None:
+        """记录请求成功"""
+        if self.health.record_success():
+            self._on_health_change()
+    
+    def _record_failure(self, error: Exception) -> None:
+        """记录请求失败"""
+        if self.health.record_failure(error):
+            self._on_health_change()
+    
+    def _on_health_change(self) -> None:
+        """健康状态变化时更新连接标志、通知订阅和回调"""
+        with self._connection_lock:
+            was_connected = self.connected
+            self.connected = self.health.state in (CONNECTED, DEGRADED)
+            # 让探测线程按新状态重新计算间隔
+            self._health_wakeup.set()
+            
+            if self.connected and not was_connected:
+                if self.on_task_event:
+                    self.start_notifications()
+                if self.on_connection_change:
+                    self.on_connection_change(True, "已连接")
+            elif was_connected and not self.connected:
+                self.stop_notifications()
+                if self.on_connection_change:
+                    self.on_connection_change(False, f"连接中断: {self.health.last_error}，正在自动重试")
+            elif self.health.state == DEGRADED:
+                print(f"连接不稳定: {self.health.last_error}")
+            elif self.health.state == DOWN:
+                print(f"连接中断: {self.health.last_error}")
+    
+    def start_health_monitor(self) -> None:
+        """启动后台探测线程：断开时按退避间隔重连，连接时定期心跳，并在通知通道断开时按退避重新订阅"""
+        if self._health_thread and self._health_thread.is_alive():
+            return
+        
+        # 每个线程使用自己的事件，旧线程退出前不会影响新线程
+        stop = self._health_stop = threading.Event()
+        wakeup = self._health_wakeup = threading.Event()
+        
+        def monitor() -> None:
+            while not stop.is_set():
+                delay = self.health.retry_delay()
+                restart = self._notification_restart_delay()
+                woken = wakeup.wait(delay if restart is None else min(delay, restart))
+                wakeup.clear()
+                if woken:
+                    continue
+                if self._notification_restart_delay() == 0:
+                    with self._connection_lock:
+                        if self.connected:
+                            self.start_notifications()
+                else:
+                    self.ping()
+        
+        self._health_thread = threading.Thread(target=monitor, daemon=True)
+        self._health_thread.start()
+    
+    def stop_health_monitor(self) -> None:
+        """停止后台探测线程"""
+        self._health_stop.set()
+        self._health_wakeup.set()
+        self._health_thread = None
+    
+    def _close_client(self) -> None:
+        """关闭当前客户端的底层连接"""
+        if self.api:
+            self.stop_notifications()
+            close = getattr(self.api.client, "close", None)
+            if close:
+                close()
+        self.api = None
+    
+    @staticmethod
+    def _normalize_host(host: str) -> str:
+        """补全主机地址的协议前缀（aria2p需要 http:// 或 https://）"""
+        if not host.startswith(("http://", "https://")):
+            host = f"http://{host}"
+        return host
+    
+    def start_notifications(self) -> None:
+        """在后台线程中订阅aria2的WebSocket任务通知"""
+        if not self.api:
+            return
+        self._notifications_wanted = True
+        if self._notification_thread and self._notification_thread.is_alive():
+            return
+        
+        client = self.api.client
+        callbacks = {
+            "on_download_start": partial(self._dispatch_task_event, "start"),
+            "on_download_pause": partial(self._dispatch_task_event, "pause"),
+            "on_download_stop": partial(self._dispatch_task_event, "stop"),
+            "on_download_complete": partial(self._dispatch_task_event, "complete"),
+            "on_download_error": partial(self._dispatch_task_event, "error"),
+            "on_bt_download_complete": partial(self._dispatch_task_event, "bt_complete"),
+        }
+        
+        def listen() -> None:
+            self.notifications_active = True
+            started = time.monotonic()
+            try:
+                # 信号处理只能在主线程注册；较短的超时保证能及时停止
+                client.listen_to_notifications(timeout=NOTIFICATION_LISTEN_TIMEOUT, handle_signals=False, **callbacks)
+            except Exception as e:
+                print(f"任务通知订阅失败: {e}")
+            finally:
+                # 通知通道断开后由调用方回退到轮询
+                self.notifications_active = False
+                # 未调用stop_listening就退出说明WebSocket被断开或连接失败，由探测线程按退避重新订阅
+                if client.listening:
+                    self._schedule_notification_restart(time.monotonic() - started)
+        
+        self._notification_thread = threading.Thread(target=listen, daemon=True)
+        self._notification_thread.start()
+    
+    def _schedule_notification_restart(self, lifetime: float) -> None:
+        """记录一次通知通道意外断开，计算下一次重新订阅的时间并唤醒探测线程"""
+        if lifetime >= NOTIFICATION_RETRY_MAX_DELAY:
+            self._notification_failures = 0
+        delay = min(NOTIFICATION_RETRY_MAX_DELAY, NOTIFICATION_RETRY_DELAY * 2 ** self._notification_failures)
+        self._notification_failures += 1
+        self._notification_retry_at = time.monotonic() + delay
+        print(f"任务通知通道已断开，{delay:g} 秒后重新订阅")
+        self._health_wakeup.set()
+    
+    def _notification_restart_delay(self) -> Optional[float]:
+        """距离重新订阅通知的时间（秒）；已连接、应保持订阅但监听线程已退出时才需要重新订阅，否则返回None"""
+        if not self._notifications_wanted or not self.connected or not self.api:
+            return None
+        if self._notification_thread and self._notification_thread.is_alive():
+            return None
+        return max(0.0, self._notification_retry_at - time.monotonic())
+    
+    def stop_notifications(self) -> None:
+        """停止订阅WebSocket任务通知，并等待监听线程退出以便之后重新订阅"""
+        self._notifications_wanted = False
+        self._notification_failures = 0
+        self._notification_retry_at = 0.0
+        if self.api:
+            self.api.client.stop_listening()
+        thread = self._notification_thread
+        if thread and thread is not threading.current_thread():
+            thread.join(NOTIFICATION_STOP_TIMEOUT)
+            if not thread.is_alive():
+                self._notification_thread = None
+        self.notifications_active = False
+    
+    def _dispatch_task_event(self, event: str, gid: str) -> None:
+        """转发任务通知到回调"""
+        if self.on_task_event:
+            try:
+                self.on_task_event(event, gid)
+            except Exception as e:
+                print(f"处理任务通知失败: {e}")
+    
     def add_download(self, url: str, download_dir: Optional[str] = None, **options) -> Optional[str]:
         """添加下载任务"""
         if not self.connected or not self.api:
@@ -246,249 +581,427 @@ class Aria2:
         
         try:
             # 验证URL
-            from urllib.parse import urlparse
-            parsed = urlparse(url)
-            if not parsed.scheme or not parsed.netloc:
+            if not self._is_valid_url(url):
                 return None
             
-            # 设置选项
-            download_options = {"max-connection-per-server": "16", "split": "16"}
-            if download_dir:
-                download_options["dir"] = download_dir
-            download_options.update(options)
-            
             # 添加下载
-            download = self.api.add_uris([url], options=download_options)
+            download = self.api.add_uris([url], options=self._build_download_options(download_dir, **options))
             return download.gid
             
         except Exception:
             return None
     
+    @staticmethod
+    def _is_valid_url(url: str) -> bool:
+        """检查URL是否包含协议和主机"""
+        parsed = urlparse(url)
+        return bool(parsed.scheme and parsed.netloc)
+    
+    @staticmethod
+    def _build_download_options(download_dir: Optional[str] = None, **options) -> Dict[str, str]:
+        """构建addUri的下载选项"""
+        download_options = {"max-connection-per-server": "16", "split": "16"}
+        if download_dir:
+            download_options["dir"] = download_dir
+        download_options.update(options)
+        return download_options
+    
     def add_batch_downloads(self, urls: List[str], download_dir: Optional[str] = None, **options) -> List[str]:
         """批量添加下载任务"""
         if not self.connected or not self.api:
             return []
         
-        return [gid for url in urls if (gid := self.add_download(url, download_dir, **options))]
+        results = self.add_downloads_bulk(urls, download_dir, **options)
+        return [gid for gid, error in results.values() if gid]
+    
+    def add_downloads_bulk(
+        self,
+        urls: List[str],
+        download_dir: Optional[str] = None,
+        chunk_size: int = MULTICALL_CHUNK_SIZE,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        **options
+    ) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        """批量添加下载任务
+        
+        返回 {url: (gid, 错误信息)}，每块提交后调用 on_progress(已处理数, 总数)。
+        """
+        results: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+        for done, total, chunk_results in self.iter_add_downloads(urls, download_dir, chunk_size, **options):
+            results.update(chunk_results)
+            if on_progress:
+                on_progress(done, total)
+        return results
     
-    def get_downloads(self) -> List[Dict]:
+    def iter_add_downloads(
+        self,
+        urls: List[str],
+        download_dir: Optional[str] = None,
+        chunk_size: int = MULTICALL_CHUNK_SIZE,
+        **options
+    ) -> Iterator[Tuple[int, int, Dict[str, Tuple[Optional[str], Optional[str]]]]]:
+        """分块提交下载任务的生成器
+        
+        先一次性校验URL（无效URL在第一次产出中报告），再按chunk_size
+        通过system.multicall发送aria2.addUri，每块产出 (已处理数, 总数, 本块结果)。
+        """
+        valid_urls, invalid_urls = self._prepare_urls(urls)
+        total = len(valid_urls) + len(invalid_urls)
+        done = len(invalid_urls)
+        
+        if invalid_urls:
+            yield done, total, {url: (None, "无效的URL") for url in invalid_urls}
+        
+        if not self.connected or not self.api:
+            yield total, total, {url: (None, "未连接") for url in valid_urls}
+            return
+        
+        download_options = self._build_download_options(download_dir, **options)
+        
+        for start in range(0, len(valid_urls), chunk_size):
+            chunk = valid_urls[start:start + chunk_size]
+            try:
+                responses = self.api.client.multicall2([
+                    (Client.ADD_URI, [[url], download_options]) for url in chunk
+                ])
+                chunk_results = {
+                    url: (None, response.get("faultString", "未知错误")) if isinstance(response, dict) else (response[0], None)
+                    for url, response in zip(chunk, responses)
+                }
+            except Exception as e:
+                print(f"批量添加下载任务失败: {e}")
+                chunk_results = {url: (None, str(e)) for url in chunk}
+            
+            done += len(chunk)
+            yield done, total, chunk_results
+    
+    @classmethod
+    def _prepare_urls(cls, urls: Iterable[str]) -> Tuple[List[str], List[str]]:
+        """去除空白和重复URL，并拆分为 (有效URL, 无效URL)"""
+        valid_urls: List[str] = []
+        invalid_urls: List[str] = []
+        seen = set()
+        for url in urls:
+            url = url.strip()
+            if not url or url in seen:
+                continue
+            seen.add(url)
+            (valid_urls if cls._is_valid_url(url) else invalid_urls).append(url)
+        return valid_urls, invalid_urls
+    
+    def get_downloads(self) -> List[TaskRecord]:
         """获取所有下载任务"""
         if not self.connected or not self.api:
             return []
         
         try:
-            downloads = []
-            
             # 获取所有任务
-            all_tasks = self.api.get_downloads()
-            
-            # 按状态分类并格式化
-            for download in all_tasks:
-                status = download.status
-                if status == "active":
-                    label = "下载中"
-                elif status == "waiting":
-                    label = "等待中"
-                elif status == "paused":
-                    label = "已暂停"
-                elif status == "complete":
-                    label = "已完成"
-                elif status == "error":
-                    label = "错误"
-                elif status == "removed":
-                    label = "已删除"
-                else:
-                    label = status
-                
-                downloads.append(self._format_download_info(download, label))
+            if self.multicall_polling:
+                structs = self._poll_tasks()
+            else:
+                structs = [download._struct for download in self.api.get_downloads()]
             
-            return downloads
+            self._record_success()
+            return self._parse_tasks(structs)
             
         except Exception as e:
             print(f"获取下载任务失败: {e}")
+            self._record_failure(e)
             return []
     
-    def _format_download_info(self, download: Download, status: str) -> Dict:
-        """格式化下载信息"""
+    def get_downloads_page(self, offset: int = 0, num: int = PAGE_SIZE) -> Dict:
+        """分页获取下载任务
+        
+        活动任务始终全部返回；等待队列和已停止队列视为一个连续列表
+        （等待在前），只获取其中 [offset, offset + num) 的窗口。
+        返回 {"downloads", "num_active", "num_waiting", "num_stopped"}，
+        数量来自同一次multicall中的getGlobalStat。
+        """
+        page = {"downloads": [], "num_active": 0, "num_waiting": 0, "num_stopped": 0}
+        if not self.connected or not self.api:
+            return page
+        
         try:
-            # 获取URL和文件名
-            url = "未知"
-            filename = "未知文件"
-            
-            if download.files and download.files[0]:
-                file_info = download.files[0]
-                
-                # 首先获取URL
-                if hasattr(file_info, 'uris') and file_info.uris:
-                    uri_info = file_info.uris[0]
-                    if isinstance(uri_info, dict):
-                        url = uri_info.get('uri', '未知')
-                    else:
-                        url = getattr(uri_info, 'uri', '未知')
-                
-                # 然后获取文件名
-                if hasattr(file_info, 'path') and file_info.path and str(file_info.path) != '.' and len(str(file_info.path)) > 1:
-                    filename = os.path.basename(str(file_info.path))
-                elif url and url != '未知':
-                    # 从URL中提取文件名
-                    filename = self._extract_filename_from_url(url)
-                else:
-                    # 如果都没有，尝试从download对象获取更多信息
-                    if hasattr(download, 'name') and download.name:
-                        filename = download.name
-                    elif hasattr(download, 'gid'):
-                        filename = f"下载_{download.gid[:8]}"
-            
-            # 获取文件大小和进度
-            total_length = download.total_length or 0
-            completed_length = download.completed_length or 0
+            # 用上次的全局状态计算窗口，首次调用时先获取一次
+            if not self.global_stat:
+                self.global_stat = self.api.client.get_global_stat()
+            waiting, stopped = self.page_windows(offset, num, int(self.global_stat.get("numWaiting", 0)))
             
-            if total_length > 0:
-                # 显示已下载/总大小
-                completed_str = self._format_size(completed_length)
-                total_str = self._format_size(total_length)
-                size_str = f"{completed_str}/{total_str}"
-                progress = f"{int(completed_length * 100 / total_length)}%"
-            else:
-                size_str = "未知"
-                progress = "0%"
-            
-            # 获取下载速度
-            download_speed = download.download_speed or 0
-            speed_str = self._format_speed(download_speed)
-            
-            # 计算剩余时间
-            if download_speed > 0 and total_length > completed_length:
-                remaining_bytes = total_length - completed_length
-                remaining_time = remaining_bytes // download_speed
-                time_str = self._format_time(remaining_time)
-            else:
-                time_str = "未知"
-            
-            
-            return {
-                "gid": download.gid,
-                "status": status,
-                "filename": filename,
-                "url": url,
-                "size": size_str,
-                "progress": progress,
-                "speed": speed_str,
-                "time": time_str
-            }
+            structs = self._poll_tasks(waiting, stopped)
+            page["downloads"] = self._parse_tasks(structs)
+            page["num_active"] = int(self.global_stat.get("numActive", 0))
+            page["num_waiting"] = int(self.global_stat.get("numWaiting", 0))
+            page["num_stopped"] = int(self.global_stat.get("numStopped", 0))
+            self._record_success()
+            return page
             
         except Exception as e:
-            print(f"格式化下载信息时出错: {e}")
-            return {
-                "gid": download.gid,
-                "status": status,
-                "filename": "未知文件",
-                "url": "未知",
-                "size": "未知",
-                "progress": "0%",
-                "speed": "0 B/s",
-                "time": "未知"
-            }
+            print(f"分页获取下载任务失败: {e}")
+            self._record_failure(e)
+            return page
     
-    def pause_downloads(self, gids: List[str]) -> bool:
-        """暂停下载任务"""
-        if not self.connected or not self.api:
-            return False
+    @staticmethod
+    def page_windows(offset: int, num: int, num_waiting: int) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+        """把等待+已停止列表上的窗口拆分为tellWaiting和tellStopped的 (offset, num)"""
+        waiting_num = max(0, min(num, num_waiting - offset))
+        waiting = (min(offset, num_waiting), waiting_num)
+        stopped = (max(0, offset - num_waiting), num - waiting_num)
+        return waiting, stopped
+    
+    def get_downloads_by_gids(self, gids: List[str]) -> Dict[str, Optional[TaskRecord]]:
+        """按GID获取任务，aria2中已不存在的任务对应None"""
+        if not self.connected or not self.api or not gids:
+            return {}
         
         try:
-            # 获取所有任务
-            all_tasks = self.api.get_downloads()
+            results = self.api.client.multicall2([
+                (Client.TELL_STATUS, [gid, TASK_KEYS]) for gid in gids
+            ])
             
-            # 找到对应的任务
-            tasks_to_pause = []
-            for gid in gids:
-                for task in all_tasks:
-                    if task.gid == gid:
-                        tasks_to_pause.append(task)
-                        break
+            downloads: Dict[str, Optional[TaskRecord]] = {}
+            for gid, result in zip(gids, results):
+                if isinstance(result, dict):
+                    # GID不存在（例如结果已被移除）
+                    downloads[gid] = None
+                    continue
+                downloads[gid] = self._parse_task(result[0])
+            self._record_success()
+            return downloads
             
-            # 暂停任务
-            if tasks_to_pause:
-                self.api.pause(tasks_to_pause)
-                return True
-            return False
         except Exception as e:
-            print(f"暂停任务失败: {e}")
-            return False
+            print(f"获取任务状态失败: {e}")
+            self._record_failure(e)
+            return {}
     
-    def resume_downloads(self, gids: List[str]) -> bool:
-        """继续下载任务"""
+    def get_active_downloads(self) -> List[TaskRecord]:
+        """仅获取活动任务（用于刷新速度和进度），同时更新全局状态"""
         if not self.connected or not self.api:
-            return False
+            return []
         
         try:
-            # 获取所有任务
-            all_tasks = self.api.get_downloads()
+            results = self.api.client.multicall2([
+                (Client.TELL_ACTIVE, [TASK_KEYS]),
+                (Client.GET_GLOBAL_STAT, []),
+            ])
+            for result in results:
+                if isinstance(result, dict):
+                    raise ClientException(result.get("faultCode", -1), result.get("faultString", ""))
             
-            # 找到对应的任务
-            tasks_to_resume = []
-            for gid in gids:
-                for task in all_tasks:
-                    if task.gid == gid:
-                        tasks_to_resume.append(task)
-                        break
+            self.global_stat = results[1][0]
+            self._record_success()
+            return self._parse_tasks(results[0][0])
             
-            # 恢复任务
-            if tasks_to_resume:
-                self.api.resume(tasks_to_resume)
-                return True
-            return False
         except Exception as e:
-            print(f"恢复任务失败: {e}")
-            return False
+            print(f"获取活动任务失败: {e}")
+            self._record_failure(e)
+            return []
     
-    def remove_downloads(self, gids: List[str]) -> bool:
-        """删除下载任务"""
+    def get_stopped_gids(self) -> List[str]:
+        """获取所有已停止任务的GID（只请求gid字段，用于增量导入历史）"""
         if not self.connected or not self.api:
-            return False
+            return []
         
         try:
-            # 获取所有任务
-            all_tasks = self.api.get_downloads()
+            gids: List[str] = []
+            while True:
+                structs = self.api.client.tell_stopped(len(gids), QUEUE_FETCH_LIMIT, ["gid"])
+                gids.extend(struct["gid"] for struct in structs)
+                if len(structs) < QUEUE_FETCH_LIMIT:
+                    break
+            self._record_success()
+            return gids
             
-            # 找到对应的任务
-            tasks_to_remove = []
-            for gid in gids:
-                for task in all_tasks:
-                    if task.gid == gid:
-                        tasks_to_remove.append(task)
-                        break
+        except Exception as e:
+            print(f"获取已停止任务失败: {e}")
+            self._record_failure(e)
+            return []
+    
+    def get_stopped_gid_groups(self) -> List[List[str]]:
+        """按实例分组获取已停止任务的GID，每组按时间从旧到新排列（单实例只有一组）"""
+        return [self.get_stopped_gids()]
+    
+    def _poll_tasks(
+        self,
+        waiting: Tuple[int, int] = (0, QUEUE_FETCH_LIMIT),
+        stopped: Tuple[int, int] = (0, QUEUE_FETCH_LIMIT)
+    ) -> List[Dict]:
+        """通过一次system.multicall获取任务（仅TASK_KEYS字段）和全局状态"""
+        return self._parse_poll_results(self.api.client.multicall2(self._poll_calls(waiting, stopped)))
+    
+    @staticmethod
+    def _poll_calls(
+        waiting: Tuple[int, int] = (0, QUEUE_FETCH_LIMIT),
+        stopped: Tuple[int, int] = (0, QUEUE_FETCH_LIMIT)
+    ) -> List[tuple]:
+        """轮询任务和全局状态的multicall调用列表，waiting/stopped为 (offset, num) 窗口"""
+        return [
+            (Client.TELL_ACTIVE, [TASK_KEYS]),
+            (Client.TELL_WAITING, [*waiting, TASK_KEYS]),
+            (Client.TELL_STOPPED, [*stopped, TASK_KEYS]),
+            (Client.GET_GLOBAL_STAT, []),
+        ]
+    
+    def _parse_poll_results(self, results: List) -> List[Dict]:
+        """解析_poll_calls的multicall结果，返回任务结构并更新全局状态"""
+        # 每个子调用的结果为单元素列表，失败时为 {faultCode, faultString}
+        for result in results:
+            if isinstance(result, dict):
+                raise ClientException(result.get("faultCode", -1), result.get("faultString", ""))
+        
+        structs = []
+        for result in results[:3]:
+            structs.extend(result[0])
+        self.global_stat = results[3][0]
+        return structs
+    
+    def _parse_tasks(self, structs: Iterable[Dict]) -> List[TaskRecord]:
+        """把aria2返回的任务结构转换为任务记录"""
+        with metrics.stage("format"):
+            return [self._parse_task(struct) for struct in structs]
+    
+    def _parse_task(self, struct: Dict) -> TaskRecord:
+        """转换单个任务结构，只解析数值和文件名，显示文本由TaskRecord按需生成"""
+        gid = struct.get("gid", "")
+        status = struct.get("status", "")
+        try:
+            filename, url = self._resolve_filename(gid, status, struct)
+            return TaskRecord(
+                gid,
+                status,
+                int(struct.get("totalLength") or 0),
+                int(struct.get("completedLength") or 0),
+                int(struct.get("downloadSpeed") or 0),
+                filename,
+                url
+            )
             
-            # 删除任务
-            if tasks_to_remove:
-                # 尝试删除任务，如果失败则强制删除
-                try:
-                    self.api.remove(tasks_to_remove)
-                except Exception as e:
-                    print(f"正常删除失败，尝试强制删除: {e}")
-                    # 强制删除，不删除文件
-                    self.api.remove(tasks_to_remove, files=False)
-                return True
-            return False
         except Exception as e:
-            print(f"删除任务失败: {e}")
-            # 如果还是失败，尝试使用GID直接删除
+            print(f"解析下载信息时出错: {e}")
+            return TaskRecord(gid, status)
+    
+    def _resolve_filename(self, gid: str, status: str, struct: Dict) -> Tuple[str, str]:
+        """获取任务的文件名和主URL，按GID缓存
+        
+        已停止的任务直接使用缓存；其它任务在aria2报告的files[0].path变化时重新解析。
+        """
+        cached = self._filename_cache.get(gid)
+        if cached is not None and status in STOPPED_STATUSES:
+            return cached[1], cached[2]
+        
+        files = struct.get("files")
+        file_info = files[0] if files and files[0] else None
+        path = file_info.get("path") if file_info else None
+        if cached is not None and cached[0] == path:
+            return cached[1], cached[2]
+        
+        # 获取URL和文件名
+        url = "未知"
+        filename = "未知文件"
+        
+        # BT任务（包括已取得元数据的磁力链接）显示种子名，多文件种子的files[0]只是其中一个文件
+        bt_name = (struct.get("bittorrent") or {}).get("info", {}).get("name")
+        
+        if file_info:
+            # 首先获取URL
+            uris = file_info.get("uris")
+            if uris:
+                url = uris[0].get("uri", "未知")
+            
+            # 然后获取文件名
+            if bt_name:
+                filename = bt_name
+            elif path and path != "." and len(path) > 1:
+                filename = os.path.basename(path)
+            elif url and url != "未知":
+                # 从URL中提取文件名
+                filename = self._extract_filename_from_url(url)
+            else:
+                filename = f"下载_{gid[:8]}"
+        elif bt_name:
+            filename = bt_name
+        
+        self._filename_cache.put(gid, (path, filename, url))
+        return filename, url
+    
+    def bulk_action(self, action: str, gids: List[str], chunk_size: int = MULTICALL_CHUNK_SIZE) -> Dict[str, Optional[str]]:
+        """按GID批量执行任务操作
+        
+        action取值见BULK_ACTIONS，请求按chunk_size分块通过system.multicall发送。
+        返回 {gid: None(成功) 或 错误信息}，失败的GID不会重试。
+        """
+        if not self.connected or not self.api:
+            return {gid: "未连接" for gid in gids}
+        
+        method = BULK_ACTIONS[action]
+        results: Dict[str, Optional[str]] = {}
+        
+        for start in range(0, len(gids), chunk_size):
+            chunk = gids[start:start + chunk_size]
             try:
-                for gid in gids:
-                    self.api.remove([gid], files=False)
-                return True
-            except Exception as e2:
-                print(f"强制删除也失败: {e2}")
-                return False
+                responses = self.api.client.multicall2([(method, [gid]) for gid in chunk])
+            except Exception as e:
+                # 整块请求失败，记录后继续处理下一块
+                print(f"批量操作 {action} 失败: {e}")
+                results.update((gid, str(e)) for gid in chunk)
+                continue
+            
+            for gid, response in zip(chunk, responses):
+                results[gid] = response.get("faultString", "未知错误") if isinstance(response, dict) else None
+        
+        return results
+    
+    def pause_downloads(self, gids: List[str]) -> bool:
+        """暂停下载任务"""
+        results = self.bulk_action("pause", gids)
+        return any(error is None for error in results.values())
+    
+    def resume_downloads(self, gids: List[str]) -> bool:
+        """继续下载任务"""
+        results = self.bulk_action("unpause", gids)
+        return any(error is None for error in results.values())
+    
+    def remove_downloads(self, gids: List[str], force: bool = False) -> bool:
+        """删除下载任务"""
+        results = self.remove_downloads_detailed(gids, force)
+        failed = {gid: error for gid, error in results.items() if error is not None}
+        if failed:
+            print(f"删除任务失败: {failed}")
+        return len(failed) < len(gids)
+    
+    def remove_downloads_detailed(self, gids: List[str], force: bool = False) -> Dict[str, Optional[str]]:
+        """删除下载任务，返回每个GID的结果（格式同bulk_action）
+        
+        活动/等待/暂停的任务先remove（或forceRemove）再清除结果，
+        已停止的任务remove会失败，直接清除其下载结果。
+        """
+        results = self.bulk_action("force_remove" if force else "remove", gids)
+        removed = [gid for gid, error in results.items() if error is None]
+        stopped = [gid for gid, error in results.items() if error is not None]
+        
+        # 已停止的任务只尝试一次清除结果
+        if stopped:
+            results.update(self.bulk_action("remove_result", stopped))
+        
+        # 清除刚移除任务的下载结果（失败不影响删除结果）
+        if removed:
+            self.bulk_action("remove_result", removed)
+        
+        return results
     
     def _extract_filename_from_url(self, url: str) -> str:
-        """从URL中提取文件名"""
+        """从URL中提取文件名（按URL缓存）"""
         if not url:
             return "未知文件"
         
+        filename = self._url_filename_cache.get(url)
+        if filename is None:
+            filename = self._parse_filename_from_url(url)
+            self._url_filename_cache.put(url, filename)
+        return filename
+    
+    def _parse_filename_from_url(self, url: str) -> str:
+        """解析URL中的文件名"""
         try:
-            from urllib.parse import urlparse, unquote, parse_qs
-            
             # 解析URL
             parsed = urlparse(url)
             
@@ -536,29 +1049,3 @@ class Aria2:
         except Exception as e:
             print(f"URL解析错误: {e}")
             return "未知文件"
-    
-    def _format_size(self, size_bytes: int) -> str:
-        """格式化文件大小"""
-        if size_bytes == 0:
-            return "0 B"
-        
-        for unit in ["B", "KB", "MB", "GB", "TB"]:
-            if size_bytes < 1024:
-                return f"{size_bytes:.1f} {unit}"
-            size_bytes /= 1024.0
-        return f"{size_bytes:.1f} TB"
-    
-    def _format_speed(self, speed_bytes: int) -> str:
-        """格式化下载速度"""
-        return f"{self._format_size(speed_bytes)}/s" if speed_bytes > 0 else "0 B/s"
-    
-    def _format_time(self, seconds: int) -> str:
-        """格式化时间"""
-        if seconds < 60:
-            return f"{seconds}秒"
-        elif seconds < 3600:
-            return f"{seconds // 60}分{seconds % 60}秒"
-        else:
-            hours = seconds // 3600
-            minutes = (seconds % 3600) // 60
-            return f"{hours}小时{minutes}分钟"
@@ -0,0 +1,552 @@
+import math
+import threading
+import time
+from functools import partial
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from .aria2 import Aria2, MULTICALL_CHUNK_SIZE, PAGE_SIZE
+from .session import REPORT_SAMPLE_SIZE
+from .snapshot import TaskSnapshot
+from .task_record import TaskRecord
+
+
+# 并发轮询时等待各实例返回的期限（秒），超时的实例沿用上一次的结果
+POLL_DEADLINE = 0.5
+
+# 并发连接时等待各实例的期限（秒），超时的实例先按未连接报告，由其健康探测继续重连
+CONNECT_DEADLINE = 3.0
+
+
+class Aria2Pool:
+    """多个aria2实例组成的实例池
+    
+    本地模式（local）下实例i监听 端口+i，下载到 下载目录/aria2-i；远程模式
+    （remote）下每个实例对应配置中的一个节点。每个实例有自己的工作线程，轮询
+    并发执行，慢节点不会阻塞其它节点。新任务按getGlobalStat的numActive+
+    numWaiting分配到负载最低的实例，任务操作按GID路由到所属实例。
+    对外接口与Aria2一致，任务记录的instance字段为所属实例（实例序号或节点名）。
+    """
+    
+    def __init__(self, services: List[Aria2], labels: List[Any], managed: bool = True, poll_deadline: float = POLL_DEADLINE):
+        self.instances = services
+        self.labels = labels
+        # 本地模式下由实例池启动和停止aria2c进程
+        self.managed = managed
+        self.poll_deadline = poll_deadline
+        
+        # 每个实例一个工作线程
+        self._workers = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"aria2-{label}") for label in labels
+        ]
+        # 进行中的轮询和上一次的轮询结果，键为 (轮询类型, 窗口, 实例序号)
+        self._polls: Dict[Tuple[str, Tuple, int], Future] = {}
+        self._poll_cache: Dict[Tuple[str, Tuple, int], Any] = {}
+        # 各实例最近一次轮询的耗时（秒）和错误
+        self.latency: Dict[int, float] = {}
+        self.errors: Dict[int, Optional[str]] = {}
+        
+        # GID到所属实例序号（轮询到任务时记录，任务离开快照或结果被移除时删除）
+        self._owners: Dict[str, int] = {}
+        self._owners_lock = threading.Lock()
+        
+        # 汇总后的全局状态和合并的任务快照
+        self.global_stat: Dict = {}
+        self.snapshot = TaskSnapshot()
+        self.snapshot.subscribe(self._on_snapshot_delta)
+        
+        # 回调函数
+        self.on_status_change: Optional[Callable] = None
+        self.on_connection_change: Optional[Callable] = None
+        # 统一连接/断开期间忽略各实例自己的连接回调
+        self._suppress_member_events = False
+    
+    @classmethod
+    def local(cls, size: int, config_file: Optional[str] = None) -> "Aria2Pool":
+        """创建本地多守护进程实例池"""
+        return cls([Aria2(config_file, instance=i) for i in range(size)], list(range(size)))
+    
+    @classmethod
+    def remote(cls, endpoints: List[Dict], config_file: Optional[str] = None) -> "Aria2Pool":
+        """根据配置中的endpoints创建远程节点实例池
+        
+        每个节点为 {"name", "host", "port", "secret", ...}，未列出的项使用配置文件中的值。
+        """
+        services = []
+        labels = []
+        for endpoint in endpoints:
+            endpoint = dict(endpoint)
+            name = endpoint.pop("name", None) or f"{endpoint.get('host', 'localhost')}:{endpoint.get('port', 6800)}"
+            services.append(Aria2(config_file, endpoint=endpoint))
+            labels.append(name)
+        return cls(services, labels, managed=False)
+    
+    @property
+    def config_path(self):
+        """配置文件路径（各实例共用）"""
+        return self.instances[0].config_path
+    
+    @property
+    def connected(self) -> bool:
+        """是否至少连接了一个实例"""
+        return any(instance.connected for instance in self.instances)
+    
+    @property
+    def notifications_active(self) -> bool:
+        """所有已连接实例的通知通道是否都可用"""
+        connected = self._connected().values()
+        return bool(connected) and all(instance.notifications_active for instance in connected)
+    
+    def set_callbacks(
+        self,
+        on_status_change: Optional[Callable] = None,
+        on_connection_change: Optional[Callable] = None,
+        on_task_event: Optional[Callable[[str, str], None]] = None
+    ) -> None:
+        """设置回调函数，连接状态由实例池汇总后回调"""
+        self.on_status_change = on_status_change
+        self.on_connection_change = on_connection_change
+        for index, instance in enumerate(self.instances):
+            instance.set_callbacks(on_status_change, partial(self._on_member_connection_change, index), on_task_event)
+    
+    def _on_member_connection_change(self, index: int, connected: bool, message: str) -> None:
+        """单个实例的连接状态变化（如中断和自动重连）"""
+        if self._suppress_member_events or not self.on_connection_change:
+            return
+        self.on_connection_change(self.connected, f"实例 {self.labels[index]} {message}")
+    
+    def load_config(self) -> Dict:
+        """加载配置文件"""
+        return self.instances[0].load_config()
+    
+    def save_config(self, config: Dict) -> None:
+        """保存配置文件"""
+        self.instances[0].save_config(config)
+    
+    def get_config(self) -> Dict:
+        """获取基础配置（各实例的配置见Aria2.get_config）"""
+        return self.load_config()
+    
+    def is_running(self) -> bool:
+        """本地模式下所有实例是否都在运行；远程模式下是否有节点已连接"""
+        if not self.managed:
+            return self.connected
+        return all(instance.is_running() for instance in self.instances)
+    
+    def start_service(self) -> bool:
+        """启动所有实例（远程模式下为连接所有节点）"""
+        if not self.managed:
+            return self.connect()
+        return all([instance.start_service() for instance in self.instances])
+    
+    def stop_service(self) -> bool:
+        """停止所有实例（远程模式下为断开所有节点）"""
+        if not self.managed:
+            self.disconnect()
+            return True
+        return all([instance.stop_service() for instance in self.instances])
+    
+    def get_status(self) -> Dict:
+        """获取服务状态，进程信息取第一个运行中的实例"""
+        statuses = [instance.get_status() for instance in self.instances]
+        status = dict(statuses[0])
+        status["running"] = self.is_running()
+        status["instances"] = statuses
+        status["recovery"] = self.recovery
+        for item in statuses:
+            if "pid" in item:
+                status["pid"] = item["pid"]
+                status["start_time"] = item["start_time"]
+                break
+        return status
+    
+    @property
+    def recovery(self) -> Optional[Dict]:
+        """汇总各实例最近一次启动时的会话恢复报告"""
+        reports = [instance.recovery for instance in self.instances if instance.recovery]
+        if not reports:
+            return None
+        return {
+            "session": ", ".join(report["session"] for report in reports),
+            "entries": sum(report["entries"] for report in reports),
+            "paused": sum(report["paused"] for report in reports),
+            "names": [name for report in reports for name in report["names"]][:REPORT_SAMPLE_SIZE],
+            "parse_ms": sum(report["parse_ms"] for report in reports),
+            "time": max(report["time"] for report in reports),
+        }
+    
+    def get_logs(self, lines: int = 50) -> List[str]:
+        """获取所有实例的日志"""
+        logs: List[str] = []
+        for label, instance in zip(self.labels, self.instances):
+            logs.append(f"===== 实例 {label} =====")
+            logs.extend(instance.get_logs(lines))
+        return logs
+    
+    def get_endpoint_status(self) -> List[Dict]:
+        """各实例的连接状态、最近一次轮询耗时（毫秒）和错误"""
+        return [
+            {
+                "label": label,
+                "connected": instance.connected,
+                "latency_ms": round(self.latency[index] * 1000) if index in self.latency else None,
+                "error": self.errors.get(index),
+            }
+            for index, (label, instance) in enumerate(zip(self.labels, self.instances))
+        ]
+    
+    def connect(self, host: Optional[str] = None, port: Optional[int] = None, secret: Optional[str] = None) -> bool:
+        """并发连接所有实例
+        
+        本地模式下port为第一个实例的端口；远程模式下忽略参数，使用各节点的配置。
+        """
+        if self.managed:
+            base_port = int(port or self.load_config().get('port', 6800))
+            calls = {
+                index: (lambda instance=instance, index=index: instance.connect(host, base_port + index, secret))
+                for index, instance in enumerate(self.instances)
+            }
+        else:
+            calls = {index: instance.connect for index, instance in enumerate(self.instances)}
+        
+        self._suppress_member_events = True
+        try:
+            results = self._fan_out(calls, CONNECT_DEADLINE)
+        finally:
+            self._suppress_member_events = False
+        count = sum(1 for connected in results.values() if connected)
+        slow = [self.labels[index] for index in calls if index not in results]
+        for index in calls:
+            if index not in results:
+                self.errors[index] = "连接超时"
+        
+        if self.on_connection_change:
+            suffix = f"（{', '.join(map(str, slow))} 连接超时，稍后自动重试）" if slow else ""
+            if count:
+                self.on_connection_change(True, f"已连接 {count}/{len(self.instances)} 个实例{suffix}")
+            else:
+                self.on_connection_change(False, f"连接失败: 没有可用的实例{suffix}")
+        return count > 0
+    
+    def disconnect(self) -> None:
+        """断开所有实例"""
+        self._suppress_member_events = True
+        try:
+            for instance in self.instances:
+                instance.disconnect()
+        finally:
+            self._suppress_member_events = False
+        if self.on_connection_change:
+            self.on_connection_change(False, "已断开")
+    
+    def _connected(self) -> Dict[int, Aria2]:
+        """已连接的实例（按序号）"""
+        return {index: instance for index, instance in enumerate(self.instances) if instance.connected}
+    
+    def _fan_out(self, calls: Dict[int, Callable[[], Any]], deadline: Optional[float] = None) -> Dict[int, Any]:
+        """在各实例自己的工作线程中并发执行调用，返回期限内成功完成的结果"""
+        futures = {index: self._workers[index].submit(call) for index, call in calls.items()}
+        wait(futures.values(), timeout=deadline)
+        
+        results: Dict[int, Any] = {}
+        for index, future in futures.items():
+            if not future.done():
+                print(f"实例 {self.labels[index]} 响应超时")
+                continue
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                print(f"实例 {self.labels[index]} 调用失败: {e}")
+        return results
+    
+    def _poll(self, kind: str, call: Callable[[Aria2], Any], window: Tuple = ()) -> Dict[int, Any]:
+        """并发轮询所有已连接实例
+        
+        每个实例同一类型、同一窗口（如分页的 (offset, num)）的轮询最多只有一个在进行中；
+        期限内未返回的实例使用同一窗口上一次的结果，因此单个慢节点不会拖慢整体刷新，
+        翻页后也不会返回上一页的任务。
+        """
+        connected = self._connected()
+        for index, instance in connected.items():
+            key = (kind, window, index)
+            pending = self._polls.get(key)
+            if pending is None or pending.done():
+                # 同类型其它窗口的轮询结果不再需要
+                for stale in [k for k in self._polls if k[0] == kind and k[2] == index and k != key]:
+                    del self._polls[stale]
+                    self._poll_cache.pop(stale, None)
+                self._polls[key] = self._workers[index].submit(self._timed, index, call, instance)
+        wait([self._polls[(kind, window, index)] for index in connected], timeout=self.poll_deadline)
+        
+        results: Dict[int, Any] = {}
+        for index in connected:
+            key = (kind, window, index)
+            future = self._polls[key]
+            if future.done():
+                try:
+                    self._poll_cache[key] = future.result()
+                except Exception as e:
+                    # 失败的实例不再显示旧结果
+                    print(f"轮询实例 {self.labels[index]} 失败: {e}")
+                    self._poll_cache.pop(key, None)
+            if key in self._poll_cache:
+                results[index] = self._poll_cache[key]
+        return results
+    
+    def _timed(self, index: int, call: Callable[[Aria2], Any], instance: Aria2) -> Any:
+        """执行轮询并记录耗时和错误（在实例的工作线程中调用）"""
+        started = time.monotonic()
+        try:
+            result = call(instance)
+            self.errors[index] = None
+            return result
+        except Exception as e:
+            self.errors[index] = str(e)
+            raise
+        finally:
+            self.latency[index] = time.monotonic() - started
+    
+    def _instance_loads(self) -> Dict[int, int]:
+        """获取已连接实例的负载（numActive + numWaiting），超时的实例不参与分配"""
+        calls = {index: instance.api.client.get_global_stat for index, instance in self._connected().items()}
+        loads: Dict[int, int] = {}
+        for index, stat in self._fan_out(calls, self.poll_deadline).items():
+            self.instances[index].global_stat = stat
+            loads[index] = int(stat.get("numActive", 0)) + int(stat.get("numWaiting", 0))
+        return loads
+    
+    def _instance_dir(self, index: int, download_dir: Optional[str]) -> Optional[str]:
+        """未指定目录或使用基础下载目录时改用实例自己的下载目录"""
+        if download_dir is None or download_dir == self.load_config().get('download_dir'):
+            return self.instances[index].get_config().get('download_dir')
+        return download_dir
+    
+    def _set_owners(self, gids: Iterable[str], index: int) -> None:
+        """记录GID所属实例"""
+        with self._owners_lock:
+            for gid in gids:
+                self._owners[gid] = index
+    
+    def _drop_owners(self, gids: Iterable[str]) -> None:
+        """删除GID的所属实例记录"""
+        with self._owners_lock:
+            for gid in gids:
+                self._owners.pop(gid, None)
+    
+    def _on_snapshot_delta(self, delta: Dict) -> None:
+        """任务离开快照时删除所属记录，避免被aria2清除的结果一直留在表中
+        
+        翻页离开的任务再次轮询到时会重新记录；按GID查询时未知所属的GID会在所有实例中查找。
+        """
+        if delta["removed"]:
+            self._drop_owners(delta["removed"])
+    
+    def _tag(self, tasks: Iterable[TaskRecord], index: int) -> List[TaskRecord]:
+        """设置任务的所属实例并记录"""
+        tagged = list(tasks)
+        for task in tagged:
+            task.instance = self.labels[index]
+        self._set_owners((task.gid for task in tagged), index)
+        return tagged
+    
+    def _group_by_owner(self, gids: Iterable[str]) -> Tuple[Dict[int, List[str]], List[str]]:
+        """按所属实例分组GID，返回 ({实例序号: [gid]}, 未知GID)"""
+        groups: Dict[int, List[str]] = {}
+        unknown: List[str] = []
+        with self._owners_lock:
+            for gid in gids:
+                index = self._owners.get(gid)
+                if index is None:
+                    unknown.append(gid)
+                else:
+                    groups.setdefault(index, []).append(gid)
+        return groups, unknown
+    
+    def get_service(self, gid: str) -> Optional[Aria2]:
+        """获取GID所属的实例"""
+        with self._owners_lock:
+            index = self._owners.get(gid)
+        return self.instances[index] if index is not None else None
+    
+    def add_download(self, url: str, download_dir: Optional[str] = None, **options) -> Optional[str]:
+        """添加下载任务到负载最低的实例"""
+        loads = self._instance_loads()
+        if not loads:
+            return None
+        
+        index = min(loads, key=loads.get)
+        gid = self.instances[index].add_download(url, self._instance_dir(index, download_dir), **options)
+        if gid:
+            self._set_owners([gid], index)
+        return gid
+    
+    def add_batch_downloads(self, urls: List[str], download_dir: Optional[str] = None, **options) -> List[str]:
+        """批量添加下载任务"""
+        results = self.add_downloads_bulk(urls, download_dir, **options)
+        return [gid for gid, error in results.values() if gid]
+    
+    def add_downloads_bulk(
+        self,
+        urls: List[str],
+        download_dir: Optional[str] = None,
+        chunk_size: int = MULTICALL_CHUNK_SIZE,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        **options
+    ) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        """批量添加下载任务，每个URL依次分配给当前负载最低的实例，各实例并发提交"""
+        valid_urls, invalid_urls = Aria2._prepare_urls(urls)
+        results: Dict[str, Tuple[Optional[str], Optional[str]]] = {url: (None, "无效的URL") for url in invalid_urls}
+        total = len(valid_urls) + len(invalid_urls)
+        
+        loads = self._instance_loads()
+        if not loads:
+            results.update((url, (None, "未连接")) for url in valid_urls)
+            return results
+        
+        assignments: Dict[int, List[str]] = {}
+        for url in valid_urls:
+            index = min(loads, key=loads.get)
+            assignments.setdefault(index, []).append(url)
+            loads[index] += 1
+        
+        lock = threading.Lock()
+        
+        def submit(index: int, assigned: List[str]) -> None:
+            for _, _, chunk_results in self.instances[index].iter_add_downloads(
+                assigned, self._instance_dir(index, download_dir), chunk_size, **options
+            ):
+                self._set_owners((gid for gid, error in chunk_results.values() if gid), index)
+                with lock:
+                    results.update(chunk_results)
+                    done = len(results)
+                if on_progress:
+                    on_progress(done, total)
+        
+        self._fan_out({
+            index: (lambda index=index, assigned=assigned: submit(index, assigned))
+            for index, assigned in assignments.items()
+        })
+        for url in valid_urls:
+            results.setdefault(url, (None, "提交失败"))
+        return results
+    
+    def get_downloads(self) -> List[TaskRecord]:
+        """获取所有实例的下载任务"""
+        downloads: List[TaskRecord] = []
+        for index, tasks in self._poll("all", Aria2.get_downloads).items():
+            downloads.extend(self._tag(tasks, index))
+        self._update_global_stat()
+        return downloads
+    
+    def get_downloads_page(self, offset: int = 0, num: int = PAGE_SIZE) -> Dict:
+        """分页获取所有实例的下载任务
+        
+        每页由各实例各取 ceil(num / 实例数) 个等待/已停止任务组成，
+        数量为各实例之和；"num_pages"为页数，由任务最多的实例决定。
+        """
+        page = {"downloads": [], "num_active": 0, "num_waiting": 0, "num_stopped": 0, "num_pages": 0}
+        share = math.ceil(num / len(self.instances))
+        window = (offset // num * share, share)
+        pages = 0
+        
+        for index, part in self._poll("page", lambda instance: instance.get_downloads_page(*window), window).items():
+            page["downloads"].extend(self._tag(part["downloads"], index))
+            for key in ("num_active", "num_waiting", "num_stopped"):
+                page[key] += part[key]
+            pages = max(pages, math.ceil((part["num_waiting"] + part["num_stopped"]) / share))
+        
+        page["num_pages"] = pages
+        self._update_global_stat()
+        return page
+    
+    def get_downloads_by_gids(self, gids: List[str]) -> Dict[str, Optional[TaskRecord]]:
+        """按GID获取任务，未知所属实例的GID在所有实例中查找；超时的实例不返回结果"""
+        groups, unknown = self._group_by_owner(gids)
+        calls = {}
+        for index, instance in self._connected().items():
+            wanted = groups.get(index, []) + unknown
+            if wanted:
+                calls[index] = (lambda instance=instance, wanted=wanted: instance.get_downloads_by_gids(wanted))
+        
+        downloads: Dict[str, Optional[TaskRecord]] = {}
+        for index, tasks in self._fan_out(calls, self.poll_deadline).items():
+            for gid, task in tasks.items():
+                if task:
+                    downloads[gid] = self._tag([task], index)[0]
+                else:
+                    downloads.setdefault(gid, None)
+        return downloads
+    
+    def get_active_downloads(self) -> List[TaskRecord]:
+        """获取所有实例的活动任务"""
+        downloads: List[TaskRecord] = []
+        for index, tasks in self._poll("active", Aria2.get_active_downloads).items():
+            downloads.extend(self._tag(tasks, index))
+        self._update_global_stat()
+        return downloads
+    
+    def get_stopped_gids(self) -> List[str]:
+        """获取所有实例已停止任务的GID，并记录所属实例（各实例依次排列，整体不按时间排序）"""
+        gids: List[str] = []
+        for group in self.get_stopped_gid_groups():
+            gids.extend(group)
+        return gids
+    
+    def get_stopped_gid_groups(self) -> List[List[str]]:
+        """按实例分组获取已停止任务的GID，每组按时间从旧到新排列，并记录所属实例"""
+        calls = {index: instance.get_stopped_gids for index, instance in self._connected().items()}
+        groups: List[List[str]] = []
+        for index, instance_gids in sorted(self._fan_out(calls).items()):
+            self._set_owners(instance_gids, index)
+            groups.append(instance_gids)
+        return groups
+    
+    def _update_global_stat(self) -> None:
+        """汇总各实例的全局状态"""
+        stat: Dict[str, int] = {}
+        for instance in self._connected().values():
+            for key, value in instance.global_stat.items():
+                try:
+                    stat[key] = stat.get(key, 0) + int(value)
+                except (TypeError, ValueError):
+                    continue
+        self.global_stat = stat
+    
+    def _route(self, gids: List[str], call: Callable[[Aria2, List[str]], Dict[str, Optional[str]]]) -> Dict[str, Optional[str]]:
+        """按所属实例分组GID，并在各实例的工作线程中并发执行"""
+        groups, unknown = self._group_by_owner(gids)
+        results: Dict[str, Optional[str]] = {gid: "未知任务" for gid in unknown}
+        completed = self._fan_out({
+            index: (lambda index=index, owned=owned: call(self.instances[index], owned))
+            for index, owned in groups.items()
+        })
+        for index, owned in groups.items():
+            results.update(completed.get(index) or {gid: f"实例 {self.labels[index]} 调用失败" for gid in owned})
+        return results
+    
+    def bulk_action(self, action: str, gids: List[str], chunk_size: int = MULTICALL_CHUNK_SIZE) -> Dict[str, Optional[str]]:
+        """按GID所属实例分组执行批量操作，移除结果成功的GID不再记录所属实例"""
+        results = self._route(gids, lambda instance, owned: instance.bulk_action(action, owned, chunk_size))
+        if action == "remove_result":
+            self._drop_owners(gid for gid, error in results.items() if error is None)
+        return results
+    
+    def pause_downloads(self, gids: List[str]) -> bool:
+        """暂停下载任务"""
+        results = self.bulk_action("pause", gids)
+        return any(error is None for error in results.values())
+    
+    def resume_downloads(self, gids: List[str]) -> bool:
+        """继续下载任务"""
+        results = self.bulk_action("unpause", gids)
+        return any(error is None for error in results.values())
+    
+    def remove_downloads(self, gids: List[str], force: bool = False) -> bool:
+        """删除下载任务"""
+        results = self.remove_downloads_detailed(gids, force)
+        return any(error is None for error in results.values())
+    
+    def remove_downloads_detailed(self, gids: List[str], force: bool = False) -> Dict[str, Optional[str]]:
+        """删除下载任务，返回每个GID的结果"""
+        results = self._route(gids, lambda instance, owned: instance.remove_downloads_detailed(owned, force))
+        self._drop_owners(gid for gid, error in results.items() if error is None)
+        return results
@@ -0,0 +1,310 @@
+import asyncio
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from aria2p import Client, ClientException
+from .aria2 import Aria2, BULK_ACTIONS, MULTICALL_CHUNK_SIZE
+from .metrics import metrics, rpc_label
+from .task_record import TaskRecord
+from .transport import DEFAULT_POOL_SIZE, DEFAULT_TIMEOUT
+
+
+class AsyncRpcClient:
+    """基于asyncio流的aria2 JSON-RPC客户端（HTTP/1.1 keep-alive连接池）"""
+    
+    def __init__(self, host: str, port: int, secret: str = "", timeout: float = DEFAULT_TIMEOUT, pool_size: int = DEFAULT_POOL_SIZE):
+        parsed = urlparse(host)
+        self.hostname = parsed.hostname or "localhost"
+        self.port = port
+        self.ssl = parsed.scheme == "https"
+        self.secret = secret
+        self.timeout = timeout
+        
+        # 空闲连接和并发上限
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._semaphore = asyncio.Semaphore(pool_size)
+        self._ids = itertools.count(1)
+    
+    async def call(self, method: str, params: Optional[List] = None) -> Any:
+        """调用单个RPC方法"""
+        params = list(params or [])
+        if self.secret and method.startswith("aria2."):
+            params.insert(0, f"token:{self.secret}")
+        return await self._request(method, params)
+    
+    async def multicall(self, calls: List[Tuple[str, List]]) -> List:
+        """通过system.multicall调用多个方法，结果格式同aria2p的multicall2"""
+        methods = []
+        for method, params in calls:
+            params = list(params)
+            if self.secret and method.startswith("aria2."):
+                params.insert(0, f"token:{self.secret}")
+            methods.append({"methodName": method, "params": params})
+        return await self._request(Client.MULTICALL, [methods])
+    
+    async def _request(self, method: str, params: List) -> Any:
+        """发送请求并返回result，错误时抛出ClientException"""
+        body = json.dumps({"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params}).encode("utf-8")
+        if not metrics.enabled:
+            response = json.loads(await asyncio.wait_for(self._post(body), self.timeout))
+        else:
+            label = rpc_label(method, params)
+            started = time.perf_counter()
+            try:
+                raw = await asyncio.wait_for(self._post(body), self.timeout)
+                sent = time.perf_counter()
+                response = json.loads(raw)
+            except Exception:
+                metrics.record(label, time.perf_counter() - started, len(body), error=True)
+                raise
+            metrics.record(
+                label, sent - started, len(body), len(raw),
+                error="error" in response, decode_seconds=time.perf_counter() - sent
+            )
+        
+        if "error" in response:
+            raise ClientException(response["error"]["code"], response["error"]["message"])
+        return response["result"]
+    
+    async def _post(self, body: bytes) -> bytes:
+        """通过连接池发送POST请求，返回原始响应体"""
+        async with self._semaphore:
+            reused = bool(self._idle)
+            reader, writer = self._idle.pop() if reused else await self._open()
+            try:
+                response, keep_alive = await self._roundtrip(reader, writer, body)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                writer.close()
+                if not reused:
+                    raise
+                # 复用的连接可能已被服务端关闭，换新连接重试一次
+                reader, writer = await self._open()
+                try:
+                    response, keep_alive = await self._roundtrip(reader, writer, body)
+                except BaseException:
+                    writer.close()
+                    raise
+            except BaseException:
+                # 包括取消：半途中断的连接不能复用
+                writer.close()
+                raise
+            
+            if keep_alive:
+                self._idle.append((reader, writer))
+            else:
+                writer.close()
+            return response
+    
+    async def _open(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        """建立新连接"""
+        return await asyncio.open_connection(self.hostname, self.port, ssl=self.ssl or None)
+    
+    async def _roundtrip(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, body: bytes) -> Tuple[bytes, bool]:
+        """发送一次请求并读取响应，返回 (响应体, 连接是否可复用)"""
+        header = (
+            f"POST /jsonrpc HTTP/1.1\r\n"
+            f"Host: {self.hostname}:{self.port}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: keep-alive\r\n\r\n"
+        )
+        writer.write(header.encode("ascii") + body)
+        await writer.drain()
+        
+        status_line = await reader.readuntil(b"\r\n")
+        headers: Dict[str, str] = {}
+        while (line := await reader.readuntil(b"\r\n")) != b"\r\n":
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        
+        keep_alive = headers.get("connection", "").lower() != "close"
+        if "content-length" in headers:
+            data = await reader.readexactly(int(headers["content-length"]))
+        elif "chunked" in headers.get("transfer-encoding", "").lower():
+            # 反向代理常以分块编码转发响应
+            data = await self._read_chunked(reader)
+        elif not keep_alive:
+            # 既无长度也未分块时以关闭连接结束响应体
+            data = await reader.read()
+        else:
+            raise ConnectionError(f"不支持的响应: {status_line.decode('latin-1').strip()}")
+        return data, keep_alive
+    
+    @staticmethod
+    async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+        """读取分块编码的响应体"""
+        chunks = []
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";", 1)[0].strip(), 16)
+            if size == 0:
+                # 跳过尾部首部直到空行
+                while await reader.readuntil(b"\r\n") != b"\r\n":
+                    pass
+                return b"".join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+    
+    async def close(self) -> None:
+        """关闭所有空闲连接"""
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+
+class AsyncAria2:
+    """Aria2的异步客户端，支持并发请求和取消
+    
+    配置读取和任务格式化复用同步的Aria2服务类。
+    """
+    
+    def __init__(self, service: Optional[Aria2] = None):
+        self.service = service or Aria2()
+        self.client: Optional[AsyncRpcClient] = None
+        self.connected = False
+    
+    async def connect(self, host: Optional[str] = None, port: Optional[int] = None, secret: Optional[str] = None) -> bool:
+        """连接到aria2服务"""
+        config = self.service.get_config()
+        await self.disconnect()
+        self.client = AsyncRpcClient(
+            self.service._normalize_host(host or config.get('host', 'localhost')),
+            port or config.get('port', 6800),
+            secret or config.get('secret', ''),
+            timeout=config.get('timeout', DEFAULT_TIMEOUT),
+            pool_size=config.get('pool_size', DEFAULT_POOL_SIZE)
+        )
+        try:
+            await self.client.call(Client.GET_VERSION)
+            self.connected = True
+        except Exception as e:
+            print(f"异步连接失败: {e}")
+            self.connected = False
+        return self.connected
+    
+    async def disconnect(self) -> None:
+        """断开连接"""
+        self.connected = False
+        if self.client:
+            await self.client.close()
+            self.client = None
+    
+    async def get_downloads(self) -> List[TaskRecord]:
+        """获取所有下载任务"""
+        if not self.connected or not self.client:
+            return []
+        
+        structs = self.service._parse_poll_results(await self.client.multicall(self.service._poll_calls()))
+        return self.service._parse_tasks(structs)
+    
+    async def add_downloads(
+        self,
+        urls: List[str],
+        download_dir: Optional[str] = None,
+        chunk_size: int = MULTICALL_CHUNK_SIZE,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        **options
+    ) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        """批量添加下载任务，各块并发发送，结果格式同Aria2.add_downloads_bulk"""
+        valid_urls, invalid_urls = self.service._prepare_urls(urls)
+        results: Dict[str, Tuple[Optional[str], Optional[str]]] = {url: (None, "无效的URL") for url in invalid_urls}
+        if not self.connected or not self.client:
+            results.update((url, (None, "未连接")) for url in valid_urls)
+            return results
+        
+        download_options = self.service._build_download_options(download_dir, **options)
+        chunks = [valid_urls[i:i + chunk_size] for i in range(0, len(valid_urls), chunk_size)]
+        total = len(valid_urls) + len(invalid_urls)
+        
+        async def send(chunk: List[str]) -> None:
+            try:
+                responses = await self.client.multicall([(Client.ADD_URI, [[url], download_options]) for url in chunk])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                results.update((url, (None, str(e))) for url in chunk)
+            else:
+                for url, response in zip(chunk, responses):
+                    results[url] = (None, response.get("faultString", "未知错误")) if isinstance(response, dict) else (response[0], None)
+            if on_progress:
+                on_progress(len(results), total)
+        
+        await asyncio.gather(*(send(chunk) for chunk in chunks))
+        return results
+    
+    async def bulk_action(self, action: str, gids: List[str], chunk_size: int = MULTICALL_CHUNK_SIZE) -> Dict[str, Optional[str]]:
+        """按GID批量执行任务操作，语义同Aria2.bulk_action，各块并发发送"""
+        if not self.connected or not self.client:
+            return {gid: "未连接" for gid in gids}
+        
+        method = BULK_ACTIONS[action]
+        results: Dict[str, Optional[str]] = {}
+        
+        async def send(chunk: List[str]) -> None:
+            try:
+                responses = await self.client.multicall([(method, [gid]) for gid in chunk])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                results.update((gid, str(e)) for gid in chunk)
+                return
+            for gid, response in zip(chunk, responses):
+                results[gid] = response.get("faultString", "未知错误") if isinstance(response, dict) else None
+        
+        await asyncio.gather(*(send(gids[i:i + chunk_size]) for i in range(0, len(gids), chunk_size)))
+        return results
+    
+    async def remove_downloads(self, gids: List[str], force: bool = False) -> Dict[str, Optional[str]]:
+        """删除下载任务，语义同Aria2.remove_downloads，返回每个GID的结果"""
+        results = await self.bulk_action("force_remove" if force else "remove", gids)
+        removed = [gid for gid, error in results.items() if error is None]
+        stopped = [gid for gid, error in results.items() if error is not None]
+        
+        # 已停止的任务只尝试一次清除结果；同时清除刚移除任务的下载结果
+        cleared, _ = await asyncio.gather(
+            self.bulk_action("remove_result", stopped),
+            self.bulk_action("remove_result", removed)
+        )
+        results.update(cleared)
+        return results
+
+
+class TkAsyncBridge:
+    """在一个后台线程中运行asyncio事件循环，并把协程结果投递回Tk主线程"""
+    
+    def __init__(self, root: Any):
+        self.root = root
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+    
+    def submit(
+        self,
+        coro: Awaitable,
+        on_done: Optional[Callable[[Any], None]] = None,
+        on_error: Optional[Callable[[BaseException], None]] = None
+    ) -> Future:
+        """提交协程，完成后在Tk主线程中调用回调；返回的Future可用于取消"""
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        
+        def done(f: Future) -> None:
+            if f.cancelled():
+                return
+            error = f.exception()
+            if error is not None:
+                if on_error:
+                    self.root.after(0, on_error, error)
+                else:
+                    print(f"异步任务失败: {error}")
+            elif on_done:
+                self.root.after(0, on_done, f.result())
+        
+        future.add_done_callback(done)
+        return future
+    
+    def stop(self) -> None:
+        """停止事件循环"""
+        self.loop.call_soon_threadsafe(self.loop.stop)
@@ -0,0 +1,109 @@
+from array import array
+from typing import Dict, List, Sequence
+
+from .task_record import TaskRecord
+
+
+# 剩余时间未知（无速度或已完成）时的取值
+UNKNOWN_ETA = -1
+
+# NumPy为可选依赖，导入较慢，首次创建TaskColumns时才导入；未安装时使用纯Python实现
+np = None
+_numpy_checked = False
+
+
+def load_numpy():
+    """导入NumPy（只尝试一次），未安装时返回None"""
+    global np, _numpy_checked
+    if not _numpy_checked:
+        _numpy_checked = True
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            np = None
+    return np
+
+
+class TaskColumns:
+    """任务数值的列式存储：总大小、已完成、速度和估算速度各为一列
+    
+    估算速度优先取EWMA平滑速度（与TaskRecord.eta一致），剩余时间都按它计算。
+    安装了NumPy时各列为int64数组，进度、剩余字节、剩余时间和汇总都以向量化方式计算；
+    否则退化为array模块加逐行计算，结果相同。
+    """
+    
+    def __init__(self, tasks: Sequence[TaskRecord]):
+        self.gids: List[str] = [task.gid for task in tasks]
+        count = len(tasks)
+        if load_numpy() is not None:
+            self.total = np.fromiter((task.total for task in tasks), dtype=np.int64, count=count)
+            self.completed = np.fromiter((task.completed for task in tasks), dtype=np.int64, count=count)
+            self.speed = np.fromiter((task.speed for task in tasks), dtype=np.int64, count=count)
+            self.rate = np.fromiter((task.avg_speed or task.speed for task in tasks), dtype=np.int64, count=count)
+        else:
+            self.total = array("q", (task.total for task in tasks))
+            self.completed = array("q", (task.completed for task in tasks))
+            self.speed = array("q", (task.speed for task in tasks))
+            self.rate = array("q", (task.avg_speed or task.speed for task in tasks))
+    
+    def __len__(self) -> int:
+        return len(self.gids)
+    
+    def remaining(self):
+        """各任务的剩余字节数"""
+        if np is not None:
+            return np.maximum(self.total - self.completed, 0)
+        return array("q", (max(0, total - completed) for total, completed in zip(self.total, self.completed)))
+    
+    def progress(self):
+        """各任务的进度百分比（0-100的整数，总大小未知时为0）"""
+        if np is not None:
+            return np.where(self.total > 0, self.completed * 100 // np.maximum(self.total, 1), 0)
+        return array("q", (
+            completed * 100 // total if total > 0 else 0
+            for total, completed in zip(self.total, self.completed)
+        ))
+    
+    def eta(self):
+        """各任务的剩余时间（秒，按估算速度），未知时为UNKNOWN_ETA"""
+        remaining = self.remaining()
+        if np is not None:
+            return np.where((self.rate > 0) & (remaining > 0), remaining // np.maximum(self.rate, 1), UNKNOWN_ETA)
+        return array("q", (
+            left // rate if rate > 0 and left > 0 else UNKNOWN_ETA
+            for left, rate in zip(remaining, self.rate)
+        ))
+    
+    def summary(self) -> Dict[str, int]:
+        """汇总：任务数、总大小、已完成、剩余字节、总速度，以及按总估算速度计算的全部剩余时间"""
+        if np is not None:
+            total = int(self.total.sum())
+            completed = int(self.completed.sum())
+            remaining = int(self.remaining().sum())
+            speed = int(self.speed.sum())
+            rate = int(self.rate.sum())
+        else:
+            total = sum(self.total)
+            completed = sum(self.completed)
+            remaining = sum(self.remaining())
+            speed = sum(self.speed)
+            rate = sum(self.rate)
+        return {
+            "count": len(self.gids),
+            "total": total,
+            "completed": completed,
+            "remaining": remaining,
+            "speed": speed,
+            "eta": remaining // rate if rate > 0 and remaining > 0 else UNKNOWN_ETA,
+        }
+    
+    def by_gid(self, values) -> Dict[str, int]:
+        """把按列计算的结果转换为 {gid: 值}"""
+        return dict(zip(self.gids, values.tolist()))
+    
+    def computed(self) -> Dict[str, Dict[str, int]]:
+        """各任务按列计算的进度和剩余时间: {gid: {"progress": 百分比, "eta": 秒}}，供TaskRecord.display使用"""
+        progress = self.progress().tolist()
+        eta = self.eta().tolist()
+        return {gid: {"progress": progress[i], "eta": eta[i]} for i, gid in enumerate(self.gids)}
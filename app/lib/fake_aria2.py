@@ -0,0 +1,532 @@
+"""模拟的aria2 JSON-RPC服务器（HTTP和WebSocket），用于离线的大规模任务测试
+
+用法（在app目录下）:
+    python -m lib.fake_aria2 --port 6800 --tasks 10000 --active 100 --secret test
+"""
+import argparse
+import base64
+import hashlib
+import itertools
+import json
+import random
+import socket
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+# WebSocket握手使用的GUID（RFC 6455）
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# 状态变化对应的通知方法
+NOTIFICATION_METHODS = {
+    "start": "aria2.onDownloadStart",
+    "pause": "aria2.onDownloadPause",
+    "stop": "aria2.onDownloadStop",
+    "complete": "aria2.onDownloadComplete",
+    "error": "aria2.onDownloadError",
+}
+
+
+class RpcError(Exception):
+    """RPC调用错误"""
+    
+    def __init__(self, message: str, code: int = 1):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class FakeAria2:
+    """模拟的aria2任务队列和RPC方法
+    
+    任务分为活动、等待（含暂停）和已停止三个队列，tick()按模拟速度推进
+    活动任务的进度，完成后从等待队列补充，状态变化通过监听器发出通知。
+    """
+    
+    def __init__(
+        self,
+        tasks: int = 1000,
+        active: int = 50,
+        stopped_ratio: float = 0.3,
+        secret: str = "",
+        download_dir: str = "/tmp/fake-aria2",
+        seed: Optional[int] = None
+    ):
+        self.secret = secret
+        self.download_dir = download_dir
+        self.max_concurrent = active
+        self.random = random.Random(seed)
+        self.lock = threading.RLock()
+        
+        # 按队列保存任务（dict保持插入顺序），GID到任务的索引
+        self.active: Dict[str, Dict] = {}
+        self.waiting: Dict[str, Dict] = {}
+        self.stopped: Dict[str, Dict] = {}
+        self._ids = itertools.count(1)
+        # 各活动任务的基准速度（字节/秒）
+        self._base_speed: Dict[str, int] = {}
+        
+        # 通知监听器 listener(method, gid)
+        self.listeners: List[Callable[[str, str], None]] = []
+        
+        stopped = int(tasks * stopped_ratio)
+        for index in range(tasks):
+            if index < stopped:
+                self._create(f"http://example.com/files/done-{index}.bin", "complete" if index % 10 else "error")
+            elif len(self.active) < active:
+                self._create(f"http://example.com/files/file-{index}.bin", "active")
+            else:
+                self._create(f"http://example.com/files/file-{index}.bin", "paused" if index % 7 == 0 else "waiting")
+    
+    def _create(self, uri: str, status: str, options: Optional[Dict] = None) -> Dict:
+        """创建任务并放入对应队列"""
+        gid = f"{next(self._ids):016x}"
+        total = self.random.randint(1, 4096) * 1024 * 1024
+        completed = total if status == "complete" else self.random.randint(0, total // 2)
+        directory = (options or {}).get("dir", self.download_dir)
+        task = {
+            "gid": gid,
+            "status": status,
+            "totalLength": str(total),
+            "completedLength": str(completed),
+            "uploadLength": "0",
+            "downloadSpeed": "0",
+            "uploadSpeed": "0",
+            "connections": "0",
+            "numPieces": str(max(1, total // (1024 * 1024))),
+            "pieceLength": "1048576",
+            "dir": directory,
+            "errorCode": "1" if status == "error" else "0",
+            "files": [{
+                "index": "1",
+                # 与aria2一致，排队中的HTTP任务在开始下载前没有文件路径
+                "path": "" if status in ("waiting", "paused") else self._file_path(directory, uri),
+                "length": str(total),
+                "completedLength": str(completed),
+                "selected": "true",
+                "uris": [{"uri": uri, "status": "used"}],
+            }],
+        }
+        self._queue_for(status)[gid] = task
+        if status == "active":
+            self._base_speed[gid] = self.random.randint(100, 5000) * 1024
+        return task
+    
+    @staticmethod
+    def _file_path(directory: str, uri: str) -> str:
+        """按URI确定下载文件路径"""
+        return f"{directory}/{uri.rstrip('/').rsplit('/', 1)[-1] or 'index.html'}"
+    
+    def _queue_for(self, status: str) -> Dict[str, Dict]:
+        """状态对应的队列"""
+        if status == "active":
+            return self.active
+        if status in ("waiting", "paused"):
+            return self.waiting
+        return self.stopped
+    
+    def _find(self, gid: str) -> Dict:
+        """按GID查找任务"""
+        for queue in (self.active, self.waiting, self.stopped):
+            if gid in queue:
+                return queue[gid]
+        raise RpcError(f"GID {gid} is not found")
+    
+    def _move(self, task: Dict, status: str, event: Optional[str] = None) -> None:
+        """修改任务状态并移动到对应队列"""
+        self._queue_for(task["status"]).pop(task["gid"], None)
+        task["status"] = status
+        self._queue_for(status)[task["gid"]] = task
+        if status == "active":
+            self._base_speed[task["gid"]] = self.random.randint(100, 5000) * 1024
+            file_info = task["files"][0]
+            if not file_info["path"]:
+                file_info["path"] = self._file_path(task["dir"], file_info["uris"][0]["uri"])
+        else:
+            self._base_speed.pop(task["gid"], None)
+            task["downloadSpeed"] = "0"
+            task["connections"] = "0"
+        if event:
+            self._notify(event, task["gid"])
+    
+    def _notify(self, event: str, gid: str) -> None:
+        """发出任务通知"""
+        for listener in list(self.listeners):
+            try:
+                listener(NOTIFICATION_METHODS[event], gid)
+            except Exception as e:
+                print(f"发送通知失败: {e}")
+    
+    def _fill_active(self) -> None:
+        """从等待队列补充活动任务"""
+        for task in list(self.waiting.values()):
+            if len(self.active) >= self.max_concurrent:
+                break
+            if task["status"] == "waiting":
+                self._move(task, "active", "start")
+    
+    def tick(self, seconds: float = 1.0) -> None:
+        """按模拟速度推进活动任务的进度"""
+        with self.lock:
+            for gid, task in list(self.active.items()):
+                speed = int(self._base_speed[gid] * self.random.uniform(0.5, 1.5))
+                total = int(task["totalLength"])
+                completed = min(total, int(task["completedLength"]) + int(speed * seconds))
+                task["completedLength"] = str(completed)
+                task["files"][0]["completedLength"] = str(completed)
+                task["downloadSpeed"] = str(speed)
+                task["connections"] = str(self.random.randint(1, 16))
+                if completed >= total:
+                    self._move(task, "complete", "complete")
+            self._fill_active()
+    
+    @staticmethod
+    def _project(task: Dict, keys: Optional[Iterable[str]]) -> Dict:
+        """按keys投影任务字段"""
+        if not keys:
+            return dict(task)
+        return {key: task[key] for key in keys if key in task}
+    
+    def _check_token(self, params: List) -> List:
+        """校验并去掉token参数"""
+        if params and isinstance(params[0], str) and params[0].startswith("token:"):
+            token, params = params[0][len("token:"):], params[1:]
+        else:
+            token = ""
+        if self.secret and token != self.secret:
+            raise RpcError("Unauthorized")
+        return params
+    
+    def dispatch(self, method: str, params: Optional[List] = None) -> Any:
+        """执行一个RPC方法"""
+        params = list(params or [])
+        if method == "system.multicall":
+            results = []
+            for call in params[0]:
+                try:
+                    results.append([self.dispatch(call["methodName"], call.get("params", []))])
+                except RpcError as e:
+                    results.append({"faultCode": e.code, "faultString": e.message})
+            return results
+        if method == "system.listMethods":
+            return [name for name in dir(self) if name.startswith("rpc_")]
+        
+        handler = getattr(self, "rpc_" + method.replace("aria2.", "").replace(".", "_"), None)
+        if handler is None:
+            raise RpcError(f"No such method: {method}")
+        params = self._check_token(params)
+        with self.lock:
+            return handler(*params)
+    
+    def rpc_getVersion(self) -> Dict:
+        return {"version": "1.37.0-fake", "enabledFeatures": ["Async DNS", "HTTPS", "Message Digest"]}
+    
+    def rpc_getGlobalStat(self) -> Dict:
+        speed = sum(int(task["downloadSpeed"]) for task in self.active.values())
+        return {
+            "downloadSpeed": str(speed),
+            "uploadSpeed": "0",
+            "numActive": str(len(self.active)),
+            "numWaiting": str(len(self.waiting)),
+            "numStopped": str(len(self.stopped)),
+            "numStoppedTotal": str(len(self.stopped)),
+        }
+    
+    def rpc_getGlobalOption(self) -> Dict:
+        return {"dir": self.download_dir, "max-concurrent-downloads": str(self.max_concurrent)}
+    
+    def rpc_changeGlobalOption(self, options: Dict) -> str:
+        if "max-concurrent-downloads" in options:
+            self.max_concurrent = int(options["max-concurrent-downloads"])
+            self._fill_active()
+        return "OK"
+    
+    def rpc_getOption(self, gid: str) -> Dict:
+        return {"dir": self._find(gid)["dir"]}
+    
+    def rpc_changeOption(self, gid: str, options: Dict) -> str:
+        self._find(gid)
+        return "OK"
+    
+    def rpc_addUri(self, uris: List[str], options: Optional[Dict] = None, position: Optional[int] = None) -> str:
+        if not uris:
+            raise RpcError("No URI to download.")
+        task = self._create(uris[0], "waiting", options)
+        self._fill_active()
+        return task["gid"]
+    
+    def rpc_tellActive(self, keys: Optional[List[str]] = None) -> List[Dict]:
+        return [self._project(task, keys) for task in self.active.values()]
+    
+    def rpc_tellWaiting(self, offset: int, num: int, keys: Optional[List[str]] = None) -> List[Dict]:
+        return [self._project(task, keys) for task in itertools.islice(self.waiting.values(), offset, offset + num)]
+    
+    def rpc_tellStopped(self, offset: int, num: int, keys: Optional[List[str]] = None) -> List[Dict]:
+        return [self._project(task, keys) for task in itertools.islice(self.stopped.values(), offset, offset + num)]
+    
+    def rpc_tellStatus(self, gid: str, keys: Optional[List[str]] = None) -> Dict:
+        return self._project(self._find(gid), keys)
+    
+    def rpc_getFiles(self, gid: str) -> List[Dict]:
+        return self._find(gid)["files"]
+    
+    def rpc_getUris(self, gid: str) -> List[Dict]:
+        return self._find(gid)["files"][0]["uris"]
+    
+    def rpc_pause(self, gid: str) -> str:
+        task = self._find(gid)
+        if task["status"] not in ("active", "waiting"):
+            raise RpcError(f"GID#{gid} cannot be paused now")
+        self._move(task, "paused", "pause")
+        self._fill_active()
+        return gid
+    
+    rpc_forcePause = rpc_pause
+    
+    def rpc_pauseAll(self) -> str:
+        for task in list(self.active.values()) + list(self.waiting.values()):
+            self._move(task, "paused", "pause")
+        return "OK"
+    
+    def rpc_unpause(self, gid: str) -> str:
+        task = self._find(gid)
+        if task["status"] != "paused":
+            raise RpcError(f"GID#{gid} cannot be unpaused now")
+        self._move(task, "waiting")
+        self._fill_active()
+        return gid
+    
+    def rpc_unpauseAll(self) -> str:
+        for task in list(self.waiting.values()):
+            if task["status"] == "paused":
+                self._move(task, "waiting")
+        self._fill_active()
+        return "OK"
+    
+    def rpc_remove(self, gid: str) -> str:
+        task = self._find(gid)
+        if task["status"] not in ("active", "waiting", "paused"):
+            raise RpcError(f"Active Download not found for GID#{gid}")
+        self._move(task, "removed", "stop")
+        self._fill_active()
+        return gid
+    
+    rpc_forceRemove = rpc_remove
+    
+    def rpc_removeDownloadResult(self, gid: str) -> str:
+        if gid not in self.stopped:
+            raise RpcError(f"Could not remove download result of GID#{gid}")
+        del self.stopped[gid]
+        return "OK"
+    
+    def rpc_purgeDownloadResult(self) -> str:
+        self.stopped.clear()
+        return "OK"
+    
+    def rpc_saveSession(self) -> str:
+        return "OK"
+
+
+class _WebSocket:
+    """服务端WebSocket连接（只处理文本帧、ping和close）"""
+    
+    def __init__(self, connection: socket.socket):
+        self.connection = connection
+        self.reader = connection.makefile("rb")
+        self._send_lock = threading.Lock()
+    
+    def receive(self) -> Optional[str]:
+        """读取一条文本消息，连接关闭时返回None"""
+        while True:
+            header = self.reader.read(2)
+            if len(header) < 2:
+                return None
+            opcode = header[0] & 0x0F
+            masked = header[1] & 0x80
+            length = header[1] & 0x7F
+            if length == 126:
+                length = struct.unpack("!H", self.reader.read(2))[0]
+            elif length == 127:
+                length = struct.unpack("!Q", self.reader.read(8))[0]
+            mask = self.reader.read(4) if masked else b"\x00\x00\x00\x00"
+            payload = bytearray(self.reader.read(length))
+            for index in range(len(payload)):
+                payload[index] ^= mask[index % 4]
+            
+            if opcode == 0x8:
+                return None
+            if opcode == 0x9:
+                self._send_frame(0xA, bytes(payload))
+                continue
+            if opcode == 0x1:
+                return payload.decode("utf-8")
+    
+    def send(self, text: str) -> None:
+        """发送一条文本消息"""
+        self._send_frame(0x1, text.encode("utf-8"))
+    
+    def _send_frame(self, opcode: int, payload: bytes) -> None:
+        """发送一帧（服务端不加掩码）"""
+        length = len(payload)
+        if length < 126:
+            header = struct.pack("!BB", 0x80 | opcode, length)
+        elif length < 1 << 16:
+            header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+        with self._send_lock:
+            self.connection.sendall(header + payload)
+
+
+class FakeAria2Server:
+    """在同一端口上提供HTTP（POST /jsonrpc）和WebSocket（GET /jsonrpc）的模拟aria2服务"""
+    
+    def __init__(self, aria2: FakeAria2, host: str = "127.0.0.1", port: int = 6800, tick_interval: float = 1.0):
+        self.aria2 = aria2
+        self.tick_interval = tick_interval
+        self._stop = threading.Event()
+        self._sockets: List[_WebSocket] = []
+        self._sockets_lock = threading.Lock()
+        self.aria2.listeners.append(self._broadcast)
+        
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+            
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                data = server.handle(body.decode("utf-8")).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json-rpc")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def do_GET(self) -> None:
+                key = self.headers.get("Sec-WebSocket-Key")
+                if self.headers.get("Upgrade", "").lower() != "websocket" or not key:
+                    self.send_error(400)
+                    return
+                accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode("ascii")).digest()).decode("ascii")
+                self.send_response(101)
+                self.send_header("Upgrade", "websocket")
+                self.send_header("Connection", "Upgrade")
+                self.send_header("Sec-WebSocket-Accept", accept)
+                self.end_headers()
+                self.wfile.flush()
+                server.serve_websocket(self.connection)
+                self.close_connection = True
+        
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+    
+    def handle(self, payload: str) -> str:
+        """处理一条JSON-RPC请求（支持批量请求）"""
+        try:
+            request = json.loads(payload)
+        except ValueError:
+            return json.dumps({"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "Parse error."}})
+        if isinstance(request, list):
+            return json.dumps([self._call(item) for item in request])
+        return json.dumps(self._call(request))
+    
+    def _call(self, request: Dict) -> Dict:
+        """执行单个请求"""
+        response = {"jsonrpc": "2.0", "id": request.get("id")}
+        try:
+            response["result"] = self.aria2.dispatch(request.get("method", ""), request.get("params"))
+        except RpcError as e:
+            response["error"] = {"code": e.code, "message": e.message}
+        except (TypeError, KeyError, IndexError, ValueError) as e:
+            response["error"] = {"code": 1, "message": f"Invalid params: {e}"}
+        return response
+    
+    def serve_websocket(self, connection: socket.socket) -> None:
+        """处理一个WebSocket连接直到关闭"""
+        ws = _WebSocket(connection)
+        with self._sockets_lock:
+            self._sockets.append(ws)
+        try:
+            while (message := ws.receive()) is not None:
+                ws.send(self.handle(message))
+        except OSError:
+            pass
+        finally:
+            with self._sockets_lock:
+                self._sockets.remove(ws)
+    
+    def close_websockets(self) -> int:
+        """断开所有WebSocket连接（HTTP不受影响），用于模拟通知通道断开，返回断开的连接数"""
+        with self._sockets_lock:
+            sockets = list(self._sockets)
+        for ws in sockets:
+            try:
+                ws.connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        return len(sockets)
+    
+    def _broadcast(self, method: str, gid: str) -> None:
+        """向所有WebSocket连接推送通知"""
+        message = json.dumps({"jsonrpc": "2.0", "method": method, "params": [{"gid": gid}]})
+        with self._sockets_lock:
+            sockets = list(self._sockets)
+        for ws in sockets:
+            try:
+                ws.send(message)
+            except OSError:
+                pass
+    
+    def _simulate(self) -> None:
+        """定时推进模拟进度"""
+        last = time.monotonic()
+        while not self._stop.wait(self.tick_interval):
+            now = time.monotonic()
+            self.aria2.tick(now - last)
+            last = now
+    
+    def start(self) -> "FakeAria2Server":
+        """在后台线程中启动服务和模拟"""
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        if self.tick_interval > 0:
+            threading.Thread(target=self._simulate, daemon=True).start()
+        return self
+    
+    def stop(self) -> None:
+        """停止服务"""
+        self._stop.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="模拟的aria2 JSON-RPC服务器")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=6800, help="监听端口")
+    parser.add_argument("--secret", default="", help="RPC密钥")
+    parser.add_argument("--tasks", type=int, default=1000, help="初始任务数")
+    parser.add_argument("--active", type=int, default=50, help="同时活动的任务数")
+    parser.add_argument("--stopped-ratio", type=float, default=0.3, help="初始已停止任务的比例")
+    parser.add_argument("--tick", type=float, default=1.0, help="进度模拟间隔（秒），0表示不模拟")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子")
+    args = parser.parse_args()
+    
+    aria2 = FakeAria2(args.tasks, args.active, args.stopped_ratio, args.secret, seed=args.seed)
+    server = FakeAria2Server(aria2, args.host, args.port, args.tick).start()
+    print(f"模拟aria2已启动: http://{args.host}:{server.port}/jsonrpc ，任务数 {args.tasks}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import random
+import threading
+from typing import Optional
+
+
+# 连接状态
+DISCONNECTED = "disconnected"
+CONNECTING = "connecting"
+CONNECTED = "connected"
+DEGRADED = "degraded"
+DOWN = "down"
+
+
+class ConnectionHealth:
+    """连接健康状态机
+    
+    connected 出现失败后进入 degraded，连续失败达到阈值后进入 down（熔断：Aria2.connected 置为 False，停止轮询和普通请求）；
+    connecting/down 状态下按带抖动的指数退避探测，任意一次成功即回到 connected。
+    """
+    
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        degraded_interval: float = 1.0,
+        heartbeat_interval: float = 15.0
+    ):
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.degraded_interval = degraded_interval
+        self.heartbeat_interval = heartbeat_interval
+        
+        self.state = DISCONNECTED
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+    
+    def start(self) -> None:
+        """开始连接"""
+        with self._lock:
+            self.state = CONNECTING
+            self.failures = 0
+            self.last_error = None
+    
+    def stop(self) -> None:
+        """主动断开，不再探测"""
+        with self._lock:
+            self.state = DISCONNECTED
+            self.failures = 0
+    
+    def record_success(self) -> bool:
+        """记录一次成功的请求，返回状态是否变化"""
+        with self._lock:
+            self.failures = 0
+            self.last_error = None
+            if self.state in (CONNECTED, DISCONNECTED):
+                return False
+            self.state = CONNECTED
+            return True
+    
+    def record_failure(self, error: Exception) -> bool:
+        """记录一次失败的请求，返回状态是否变化"""
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)
+            previous = self.state
+            if self.state == CONNECTED:
+                self.state = DEGRADED
+            if self.state in (DEGRADED, CONNECTING) and self.failures >= self.failure_threshold:
+                self.state = DOWN
+            return self.state != previous
+    
+    def retry_delay(self) -> float:
+        """距离下一次探测的时间（秒）"""
+        if self.state in (CONNECTING, DOWN):
+            # 指数退避，取上限的一半到上限之间的随机值，避免多个客户端同时重连
+            delay = min(self.max_delay, self.base_delay * 2 ** max(0, self.failures - 1))
+            return random.uniform(delay / 2, delay)
+        if self.state == DEGRADED:
+            return self.degraded_interval
+        return self.heartbeat_interval
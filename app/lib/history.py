@@ -0,0 +1,274 @@
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+from .path_manager import path_manager
+from .task_record import TaskRecord, STOPPED_STATUSES
+
+
+# 历史窗口每页显示的条数
+HISTORY_PAGE_SIZE = 100
+
+# 单条SQL中GID参数的最大数量（低于SQLite的变量数上限）
+QUERY_CHUNK_SIZE = 500
+
+# 三元组索引能匹配的最短关键字，更短的关键字退化为LIKE
+TRIGRAM_MIN_LENGTH = 3
+
+# 历史表的列（除自增id外），也是record_rows的行格式
+HISTORY_COLUMNS = ("gid", "status", "filename", "url", "host", "total", "completed", "instance", "finished_at")
+
+# 历史表和索引：按结束时间倒序分页，按状态、主机筛选，按文件名前缀查找
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    gid TEXT NOT NULL UNIQUE,
+    status TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    url TEXT NOT NULL,
+    host TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    completed INTEGER NOT NULL,
+    instance TEXT NOT NULL,
+    finished_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_history_finished ON history (finished_at);
+CREATE INDEX IF NOT EXISTS idx_history_status ON history (status, finished_at);
+CREATE INDEX IF NOT EXISTS idx_history_host ON history (host, finished_at);
+CREATE INDEX IF NOT EXISTS idx_history_filename ON history (filename COLLATE NOCASE);
+"""
+
+# 文件名和URL的全文索引（SQLite 3.34+ 的trigram分词，支持任意子串匹配），由触发器与历史表同步
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+    filename, url, content='history', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS history_fts_insert AFTER INSERT ON history BEGIN
+    INSERT INTO history_fts (rowid, filename, url) VALUES (new.id, new.filename, new.url);
+END;
+CREATE TRIGGER IF NOT EXISTS history_fts_delete AFTER DELETE ON history BEGIN
+    INSERT INTO history_fts (history_fts, rowid, filename, url) VALUES ('delete', old.id, old.filename, old.url);
+END;
+CREATE TRIGGER IF NOT EXISTS history_fts_update AFTER UPDATE OF filename, url ON history BEGIN
+    INSERT INTO history_fts (history_fts, rowid, filename, url) VALUES ('delete', old.id, old.filename, old.url);
+    INSERT INTO history_fts (rowid, filename, url) VALUES (new.id, new.filename, new.url);
+END;
+"""
+
+# 写入或更新一条历史，结束时间保留首次记录的值
+UPSERT_SQL = """
+INSERT INTO history (gid, status, filename, url, host, total, completed, instance, finished_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (gid) DO UPDATE SET
+    status = excluded.status,
+    filename = excluded.filename,
+    url = excluded.url,
+    host = excluded.host,
+    total = excluded.total,
+    completed = excluded.completed,
+    instance = excluded.instance
+WHERE history.status != excluded.status
+    OR history.completed != excluded.completed
+    OR history.filename != excluded.filename
+"""
+
+
+class DownloadHistory:
+    """已结束任务（完成、错误、已删除）的本地历史，保存在SQLite中
+    
+    任务按GID增量导入：已记录的GID不再获取完整信息，因此aria2的已停止列表
+    可以被清除而不丢失记录。数据库在首次使用时打开，连接在线程间共享并加锁。
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.fts = False
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+    
+    def _connection(self) -> sqlite3.Connection:
+        """打开数据库并创建表和索引（调用方持有锁）"""
+        if self._conn is None:
+            if self.path != ":memory:":
+                path_manager.ensure_parent(self.path)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            try:
+                conn.executescript(FTS_SCHEMA)
+                self.fts = True
+            except sqlite3.OperationalError as e:
+                # 旧版SQLite没有FTS5或trigram分词，搜索退化为LIKE
+                print(f"全文索引不可用: {e}")
+            self._conn = conn
+        return self._conn
+    
+    def close(self) -> None:
+        """关闭数据库"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+    
+    @staticmethod
+    def to_row(task: TaskRecord, finished_at: float) -> Tuple:
+        """任务记录转换为表中的一行（列顺序见HISTORY_COLUMNS）"""
+        url = task.url if task.url != "未知" else ""
+        return (
+            task.gid,
+            task.status,
+            task.filename,
+            url,
+            urlparse(url).hostname or "",
+            task.total,
+            task.completed,
+            task.instance,
+            finished_at,
+        )
+    
+    def record(self, tasks: Iterable[TaskRecord], finished_at: Optional[float] = None) -> int:
+        """写入已结束的任务（其它状态的任务忽略），返回新增或变化的条数
+        
+        aria2不提供任务的结束时间，finished_at默认为写入时间，即最早观察到任务停止的时间；
+        已有记录再次写入时保留原来的finished_at（见UPSERT_SQL）。
+        """
+        finished_at = time.time() if finished_at is None else finished_at
+        return self.record_rows([self.to_row(task, finished_at) for task in tasks if task.status in STOPPED_STATUSES])
+    
+    def record_rows(self, rows: List[Tuple]) -> int:
+        """写入表格式的行，返回新增或变化的条数"""
+        if not rows:
+            return 0
+        
+        try:
+            with self._lock:
+                conn = self._connection()
+                with conn:
+                    # rowcount不包含全文索引触发器的写入，未变化的已有记录不计数
+                    return conn.executemany(UPSERT_SQL, rows).rowcount
+        except Exception as e:
+            print(f"写入下载历史失败: {e}")
+            return 0
+    
+    def known(self, gids: List[str]) -> Set[str]:
+        """已记录的GID"""
+        found: Set[str] = set()
+        try:
+            with self._lock:
+                conn = self._connection()
+                for start in range(0, len(gids), QUERY_CHUNK_SIZE):
+                    chunk = gids[start:start + QUERY_CHUNK_SIZE]
+                    placeholders = ",".join("?" * len(chunk))
+                    found.update(row[0] for row in conn.execute(
+                        f"SELECT gid FROM history WHERE gid IN ({placeholders})", chunk
+                    ))
+        except Exception as e:
+            print(f"查询下载历史失败: {e}")
+        return found
+    
+    def finished_times(self, gids: List[str]) -> Dict[str, float]:
+        """已记录任务的结束时间"""
+        times: Dict[str, float] = {}
+        try:
+            with self._lock:
+                conn = self._connection()
+                for start in range(0, len(gids), QUERY_CHUNK_SIZE):
+                    chunk = gids[start:start + QUERY_CHUNK_SIZE]
+                    placeholders = ",".join("?" * len(chunk))
+                    times.update(conn.execute(
+                        f"SELECT gid, finished_at FROM history WHERE gid IN ({placeholders})", chunk
+                    ).fetchall())
+        except Exception as e:
+            print(f"查询下载历史失败: {e}")
+        return times
+    
+    def sync(self, service, chunk_size: int = QUERY_CHUNK_SIZE) -> int:
+        """从aria2的已停止列表导入新结束的任务
+        
+        先只获取已停止任务的GID，再按GID获取尚未记录的任务，
+        已导入的任务不会被重复下载。service为Aria2或Aria2Pool。
+        程序未运行期间结束的任务以导入时间作为结束时间，按时长归档时会多保留至多一个保留时长。
+        """
+        gids = service.get_stopped_gids()
+        known = self.known(gids)
+        missing = [gid for gid in gids if gid not in known]
+        
+        recorded = 0
+        for start in range(0, len(missing), chunk_size):
+            downloads = service.get_downloads_by_gids(missing[start:start + chunk_size])
+            recorded += self.record(task for task in downloads.values() if task)
+        return recorded
+    
+    def _where(self, text: str, status: Optional[str], host: Optional[str]) -> Tuple[str, List]:
+        """构造搜索条件"""
+        clauses: List[str] = []
+        params: List = []
+        text = text.strip()
+        if text:
+            if self.fts and len(text) >= TRIGRAM_MIN_LENGTH:
+                # 作为短语匹配，避免关键字中的FTS语法字符
+                clauses.append("id IN (SELECT rowid FROM history_fts WHERE history_fts MATCH ?)")
+                params.append('"' + text.replace('"', '""') + '"')
+            else:
+                pattern = "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                clauses.append("(filename LIKE ? ESCAPE '\\' OR url LIKE ? ESCAPE '\\')")
+                params.extend((pattern, pattern))
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if host:
+            clauses.append("host = ?")
+            params.append(host)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+    
+    def search(
+        self,
+        text: str = "",
+        status: Optional[str] = None,
+        host: Optional[str] = None,
+        offset: int = 0,
+        limit: int = HISTORY_PAGE_SIZE
+    ) -> Tuple[List[Dict], int]:
+        """按文件名/URL关键字、状态和主机搜索，按结束时间倒序分页，返回 (当前页, 总条数)"""
+        try:
+            with self._lock:
+                conn = self._connection()
+                where, params = self._where(text, status, host)
+                total = conn.execute(f"SELECT COUNT(*) FROM history{where}", params).fetchone()[0]
+                rows = conn.execute(
+                    f"SELECT {', '.join(HISTORY_COLUMNS)} FROM history{where} ORDER BY finished_at DESC, id DESC LIMIT ? OFFSET ?",
+                    params + [limit, offset]
+                ).fetchall()
+            return [dict(row) for row in rows], total
+        except Exception as e:
+            print(f"搜索下载历史失败: {e}")
+            return [], 0
+    
+    def delete(self, gids: List[str]) -> int:
+        """删除指定的历史记录"""
+        deleted = 0
+        try:
+            with self._lock:
+                conn = self._connection()
+                with conn:
+                    for start in range(0, len(gids), QUERY_CHUNK_SIZE):
+                        chunk = gids[start:start + QUERY_CHUNK_SIZE]
+                        placeholders = ",".join("?" * len(chunk))
+                        deleted += conn.execute(f"DELETE FROM history WHERE gid IN ({placeholders})", chunk).rowcount
+        except Exception as e:
+            print(f"删除下载历史失败: {e}")
+        return deleted
+    
+    def clear(self) -> None:
+        """清空历史"""
+        try:
+            with self._lock:
+                conn = self._connection()
+                with conn:
+                    conn.execute("DELETE FROM history")
+        except Exception as e:
+            print(f"清空下载历史失败: {e}")
@@ -0,0 +1,134 @@
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterator, List, Optional
+
+
+# 耗时直方图的桶上限（毫秒），最后一个桶收集超出上限的样本
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+# 统计关闭时stage()返回的空上下文
+_NULL_CONTEXT = nullcontext()
+
+
+def rpc_label(method: str, params: Optional[List] = None) -> str:
+    """RPC方法的统计名称，system.multicall附带其中的方法名"""
+    if method == "system.multicall" and params:
+        names = dict.fromkeys(call.get("methodName", "?") for call in params[0])
+        return f"system.multicall[{','.join(names)}]"
+    return method
+
+
+class MethodStats:
+    """单个方法（或处理阶段）的统计：次数、错误数、字节数和耗时直方图"""
+    
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.decode_seconds = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+    
+    def add(self, seconds: float, sent: int = 0, received: int = 0, error: bool = False, decode_seconds: float = 0.0) -> None:
+        """记录一次调用"""
+        self.count += 1
+        self.errors += error
+        self.bytes_sent += sent
+        self.bytes_received += received
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.decode_seconds += decode_seconds
+        
+        milliseconds = seconds * 1000
+        for index, bound in enumerate(LATENCY_BUCKETS_MS):
+            if milliseconds <= bound:
+                self.buckets[index] += 1
+                return
+        self.buckets[-1] += 1
+    
+    def percentile(self, fraction: float) -> float:
+        """按直方图估算耗时分位数（毫秒，取所在桶的上限）"""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for index, bound in enumerate(LATENCY_BUCKETS_MS):
+            seen += self.buckets[index]
+            if seen >= target:
+                return float(min(bound, self.max_seconds * 1000))
+        return self.max_seconds * 1000
+    
+    def to_dict(self) -> Dict:
+        """导出为字典"""
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "avg_ms": self.total_seconds * 1000 / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": self.max_seconds * 1000,
+            "decode_ms": self.decode_seconds * 1000,
+        }
+
+
+class Metrics:
+    """RPC和处理阶段的轻量统计
+    
+    关闭时（默认）各记录入口只做一次enabled判断。
+    RPC按方法名记录（见rpc_label），处理阶段用stage()按名称记录，
+    如 "format"（aria2p对象构建和格式化）、"ui.apply_delta"（Tk渲染）。
+    """
+    
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._stats: Dict[str, MethodStats] = {}
+        self._lock = threading.Lock()
+    
+    def record(self, name: str, seconds: float, sent: int = 0, received: int = 0, error: bool = False, decode_seconds: float = 0.0) -> None:
+        """记录一次调用"""
+        if not self.enabled:
+            return
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = MethodStats()
+            stats.add(seconds, sent, received, error, decode_seconds)
+    
+    def stage(self, name: str):
+        """统计一个处理阶段的耗时，用法: with metrics.stage("format"): ..."""
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return self._timed_stage(name)
+    
+    @contextmanager
+    def _timed_stage(self, name: str) -> Iterator[None]:
+        """记录阶段耗时，异常计为错误"""
+        started = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.record(name, time.perf_counter() - started, error=error)
+    
+    def snapshot(self) -> Dict[str, Dict]:
+        """获取所有统计，按名称排序"""
+        with self._lock:
+            return {name: self._stats[name].to_dict() for name in sorted(self._stats)}
+    
+    def reset(self) -> None:
+        """清空统计"""
+        with self._lock:
+            self._stats.clear()
+
+
+# 全局统计实例
+metrics = Metrics()
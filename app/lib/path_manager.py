@@ -1,41 +1,79 @@
+import os
 import platform
+import threading
+from functools import cached_property
 from pathlib import Path
-from typing import Dict, Any
-import platformdirs
+from typing import Dict, Any, Optional, Set
 
 
+# 覆盖数据根目录的环境变量（其下使用config、data、downloads三个子目录，用于测试和基准隔离）
+ROOT_DIR_ENV = "ARIA2GUI_HOME"
+
 
 class PathManager:
-    """跨平台路径管理器"""
+    """跨平台路径管理器
+    
+    创建实例不访问文件系统：各目录在首次使用时才解析并缓存，
+    目录在首次写入前通过ensure_parent创建，每个目录只创建一次。
+    """
     
-    def __init__(self):
+    def __init__(self, root_dir: Optional[str] = None):
         self.system = platform.system().lower()
-        self._setup_paths()
-    
-    def _setup_paths(self):
-        """设置跨平台路径"""
-        # 使用系统标准函数获取路径
-        self.app_data_dir = self._get_app_data_dir()
-        self.downloads_dir = self._get_downloads_dir()
-        self.config_dir = self._get_config_dir()
-        
-        # 确保目录存在
-        self.app_data_dir.mkdir(parents=True, exist_ok=True)
-        self.config_dir.mkdir(parents=True, exist_ok=True)
-        self.downloads_dir.mkdir(parents=True, exist_ok=True)
-    
-    def _get_app_data_dir(self) -> Path:
-        """获取应用数据目录"""
+        self._root_dir = root_dir
+        # 已确认存在的目录
+        self._created: Set[str] = set()
+        self._lock = threading.Lock()
+    
+    def set_root_dir(self, root_dir: Optional[str]) -> None:
+        """设置数据根目录（须在使用任何路径之前调用），None表示使用系统标准目录"""
+        self._root_dir = root_dir
+        for name in ("root_dir", "app_data_dir", "config_dir", "downloads_dir"):
+            self.__dict__.pop(name, None)
+    
+    @cached_property
+    def root_dir(self) -> Optional[Path]:
+        """数据根目录：参数优先，其次环境变量，都未设置时为None"""
+        root_dir = self._root_dir or os.environ.get(ROOT_DIR_ENV)
+        return Path(root_dir).expanduser().absolute() if root_dir else None
+    
+    @cached_property
+    def app_data_dir(self) -> Path:
+        """应用数据目录"""
+        if self.root_dir:
+            return self.root_dir / "data"
+        import platformdirs
         return Path(platformdirs.user_data_dir("Aria2GUI", "Aria2GUI"))
     
-    def _get_config_dir(self) -> Path:
-        """获取配置目录"""
+    @cached_property
+    def config_dir(self) -> Path:
+        """配置目录"""
+        if self.root_dir:
+            return self.root_dir / "config"
+        import platformdirs
         return Path(platformdirs.user_config_dir("Aria2GUI", "Aria2GUI"))
     
-    def _get_downloads_dir(self) -> Path:
-        """获取下载目录"""
+    @cached_property
+    def downloads_dir(self) -> Path:
+        """下载目录"""
+        if self.root_dir:
+            return self.root_dir / "downloads"
+        import platformdirs
         return Path(platformdirs.user_downloads_dir())
     
+    def ensure_dir(self, path: str) -> str:
+        """确保目录存在（每个目录只创建一次），返回目录路径"""
+        path = str(path)
+        if path not in self._created:
+            with self._lock:
+                Path(path).mkdir(parents=True, exist_ok=True)
+                self._created.add(path)
+        return path
+    
+    def ensure_parent(self, path: str) -> str:
+        """写文件前确保其所在目录存在，返回文件路径"""
+        self.ensure_dir(os.path.dirname(os.path.abspath(path)))
+        return path
+    
     
     def get_config_path(self) -> str:
         """获取配置文件路径"""
@@ -43,22 +81,34 @@ class PathManager:
     
     def get_pid_path(self) -> str:
         """获取PID文件路径"""
-        pid_path = self.config_dir / "aria2.pid"
         # PID文件会在服务启动时自动创建，这里不需要预先创建
-        return str(pid_path)
+        return str(self.config_dir / "aria2.pid")
     
     def get_log_path(self) -> str:
         """获取日志文件路径"""
-        log_path = self.config_dir / "aria2.log"
-        # 确保日志文件存在
-        if not log_path.exists():
-            log_path.touch()
-        return str(log_path)
+        # 日志文件由aria2c创建，读取方需处理文件不存在的情况
+        return str(self.config_dir / "aria2.log")
+    
+    def get_session_path(self) -> str:
+        """获取aria2会话文件路径"""
+        return str(self.config_dir / "aria2.session")
     
     def get_downloads_path(self) -> str:
         """获取下载目录路径"""
         return str(self.downloads_dir)
     
+    def get_throughput_path(self) -> str:
+        """获取吞吐量历史文件路径"""
+        return str(self.app_data_dir / "throughput.bin")
+    
+    def get_history_path(self) -> str:
+        """获取下载历史数据库路径"""
+        return str(self.app_data_dir / "history.db")
+    
+    def get_archive_journal_path(self) -> str:
+        """获取归档日志文件路径"""
+        return str(self.app_data_dir / "archive.journal")
+    
     
     def create_default_config(self) -> Dict[str, Any]:
         """创建默认配置"""
@@ -66,14 +116,23 @@ class PathManager:
             "host": "localhost",
             "port": 6800,
             "secret": "",
+            "transport": "http",
+            "pool_size": 4,
+            "timeout": 10,
+            "instances": 1,
+            "endpoints": [],
+            "metrics": False,
             "download_dir": self.get_downloads_path(),
             "max_connections": 16,
             "max_downloads": 10,
             "all_proxy": "",
-            "log_level": "info"
+            "log_level": "info",
+            "save_session_interval": 30,
+            "archive_max_results": 1000,
+            "archive_max_age_hours": 24
         }
     
 
 
-# 全局路径管理器实例
+# 全局路径管理器实例（不访问文件系统，路径在首次使用时解析）
 path_manager = PathManager()
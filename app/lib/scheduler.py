@@ -0,0 +1,40 @@
+class AdaptiveScheduler:
+    """自适应刷新间隔计算
+    
+    有活动时使用最小间隔，空闲时按倍数指数退避到最大间隔；
+    窗口不可见时固定为心跳间隔。调用reset()可立即恢复最小间隔。
+    """
+    
+    def __init__(
+        self,
+        min_interval: float = 1.0,
+        max_interval: float = 30.0,
+        heartbeat_interval: float = 60.0,
+        backoff: float = 2.0
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.backoff = backoff
+        self.interval = min_interval
+    
+    def next_interval(self, busy: bool, visible: bool = True) -> float:
+        """根据是否有活动和窗口是否可见计算下一次间隔（秒）"""
+        if busy:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+        
+        if not visible:
+            return max(self.interval, self.heartbeat_interval)
+        return self.interval
+    
+    def reset(self) -> bool:
+        """恢复最小间隔，返回之前是否处于退避状态"""
+        backed_off = self.interval > self.min_interval
+        self.interval = self.min_interval
+        return backed_off
+    
+    def interval_ms(self, busy: bool, visible: bool = True) -> int:
+        """next_interval的毫秒版本，便于root.after使用"""
+        return int(self.next_interval(busy, visible) * 1000)
@@ -0,0 +1,90 @@
+import os
+import shutil
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+# 默认的会话自动保存间隔（秒，0表示不保存会话）
+DEFAULT_SESSION_INTERVAL = 30
+
+# 启动时从会话文件复制出的恢复文件后缀（作为--input-file）
+RESTORE_SUFFIX = ".restore"
+
+# 恢复报告中列出的任务名数量
+REPORT_SAMPLE_SIZE = 10
+
+
+def parse_session(path: str) -> List[Dict]:
+    """解析aria2会话文件（--input-file格式）
+    
+    每个任务为一行以TAB分隔的URI，后面跟若干以空白开头的 "键=值" 选项行，
+    返回 [{"uris": [...], "options": {...}}]。
+    """
+    entries: List[Dict] = []
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            if line[0] in " \t":
+                if entries:
+                    key, _, value = line.strip().partition("=")
+                    entries[-1]["options"][key] = value
+                continue
+            entries.append({"uris": line.rstrip("\r\n").split("\t"), "options": {}})
+    return entries
+
+
+def _entry_name(entry: Dict) -> str:
+    """任务的显示名：out选项，否则取第一个URI的最后一段"""
+    name = entry["options"].get("out")
+    if name:
+        return name
+    uri = entry["uris"][0] if entry["uris"] else ""
+    return uri.rstrip("/").rsplit("/", 1)[-1] or uri
+
+
+def _atomic_copy(source: str, target: str) -> None:
+    """复制文件（先写临时文件并fsync，再原子替换）"""
+    temp_path = f"{target}.tmp"
+    with open(source, "rb") as src, open(temp_path, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+        dst.flush()
+        os.fsync(dst.fileno())
+    os.replace(temp_path, target)
+
+
+def prepare_session(session_path: str) -> Tuple[Optional[str], Dict]:
+    """启动aria2c前准备恢复用的输入文件并生成恢复报告
+    
+    会话文件被原子复制为恢复文件后再交给--input-file，aria2运行期间按间隔改写
+    会话文件不会影响正在读取的输入；没有会话文件时返回 (None, 报告)。
+    报告为 {"session", "entries", "paused", "names", "parse_ms", "time"}。
+    """
+    report = {"session": session_path, "entries": 0, "paused": 0, "names": [], "parse_ms": 0.0, "time": time.time()}
+    if not os.path.exists(session_path) or os.path.getsize(session_path) == 0:
+        return None, report
+    
+    try:
+        restore_path = session_path + RESTORE_SUFFIX
+        _atomic_copy(session_path, restore_path)
+        
+        started = time.perf_counter()
+        entries = parse_session(restore_path)
+        report["parse_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        report["entries"] = len(entries)
+        report["paused"] = sum(1 for entry in entries if entry["options"].get("pause") == "true")
+        report["names"] = [_entry_name(entry) for entry in entries[:REPORT_SAMPLE_SIZE]]
+        return restore_path, report
+    except Exception as e:
+        print(f"准备会话恢复失败: {e}")
+        return None, report
+
+
+def format_report(report: Optional[Dict]) -> str:
+    """恢复报告的摘要文本"""
+    if not report or not report["entries"]:
+        return ""
+    text = f"已从会话恢复 {report['entries']} 个任务"
+    if report["paused"]:
+        text += f"（{report['paused']} 个暂停）"
+    return text
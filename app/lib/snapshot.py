@@ -0,0 +1,95 @@
+from typing import Callable, Dict, Iterable, List
+from .speed_history import SpeedHistory
+from .task_record import TaskRecord
+
+
+def empty_delta() -> Dict:
+    """创建空增量"""
+    return {"added": {}, "removed": [], "changed": {}}
+
+
+def is_empty_delta(delta: Dict) -> bool:
+    """增量是否为空"""
+    return not (delta["added"] or delta["removed"] or delta["changed"])
+
+
+class TaskSnapshot:
+    """按GID保存上一次的任务快照，并在每次轮询后发布增量
+    
+    增量格式: {"added": {gid: 任务记录}, "removed": [gid], "changed": {gid: {字段: 新值}}}
+    每个GID只保留一个TaskRecord，变化的字段原地更新，订阅者可以直接持有记录。
+    活动任务的速度样本记录在history中，平滑速度作为avg_speed字段参与比较。
+    """
+    
+    def __init__(self):
+        self.tasks: Dict[str, TaskRecord] = {}
+        self.history = SpeedHistory()
+        self._subscribers: List[Callable[[Dict], None]] = []
+    
+    def subscribe(self, callback: Callable[[Dict], None]) -> None:
+        """订阅增量，只在增量非空时回调"""
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+    
+    def unsubscribe(self, callback: Callable[[Dict], None]) -> None:
+        """取消订阅"""
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+    
+    def replace(self, downloads: Iterable[TaskRecord]) -> Dict:
+        """用完整结果替换快照，不在结果中的GID视为已移除"""
+        delta = empty_delta()
+        seen = set()
+        for task in downloads:
+            seen.add(task.gid)
+            self._diff_task(task, delta)
+        
+        delta["removed"] = [gid for gid in self.tasks if gid not in seen]
+        for gid in delta["removed"]:
+            del self.tasks[gid]
+            self.history.discard(gid)
+        return self._publish(delta)
+    
+    def merge(self, downloads: Iterable[TaskRecord]) -> Dict:
+        """合并部分结果（如仅活动任务），不移除其它任务"""
+        delta = empty_delta()
+        for task in downloads:
+            self._diff_task(task, delta)
+        return self._publish(delta)
+    
+    def remove(self, gids: Iterable[str]) -> Dict:
+        """从快照中移除任务"""
+        delta = empty_delta()
+        delta["removed"] = [gid for gid in gids if self.tasks.pop(gid, None) is not None]
+        for gid in delta["removed"]:
+            self.history.discard(gid)
+        return self._publish(delta)
+    
+    def clear(self) -> Dict:
+        """清空快照"""
+        return self.remove(list(self.tasks))
+    
+    def _diff_task(self, task: TaskRecord, delta: Dict) -> None:
+        """比较单个任务并记录到增量中"""
+        gid = task.gid
+        self.history.observe(task)
+        previous = self.tasks.get(gid)
+        if previous is None:
+            delta["added"][gid] = task
+            self.tasks[gid] = task
+        elif previous is not task:
+            changed = task.diff(previous)
+            previous.history = task.history
+            if changed:
+                previous.update(changed)
+                delta["changed"][gid] = changed
+    
+    def _publish(self, delta: Dict) -> Dict:
+        """通知订阅者"""
+        if not is_empty_delta(delta):
+            for callback in list(self._subscribers):
+                try:
+                    callback(delta)
+                except Exception as e:
+                    print(f"处理任务增量失败: {e}")
+        return delta
@@ -0,0 +1,96 @@
+import time
+from array import array
+from typing import Dict, List
+
+from .task_record import TaskRecord
+
+
+# 每个活动任务保留的速度样本数
+HISTORY_SIZE = 16
+
+# 速度EWMA的平滑系数，越大越跟随最新速度
+EWMA_ALPHA = 0.3
+
+# 同一任务两次采样的最小间隔（秒），避免分页刷新和活动刷新重复采样
+MIN_SAMPLE_INTERVAL = 0.5
+
+# 速度曲线使用的字符，从低到高
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+
+class SpeedRing:
+    """单个任务的速度环形缓冲区和EWMA平滑速度"""
+    
+    __slots__ = ("samples", "index", "count", "ewma", "updated")
+    
+    def __init__(self, size: int = HISTORY_SIZE):
+        self.samples = array("q", bytes(8 * size))
+        self.index = 0
+        self.count = 0
+        self.ewma = 0.0
+        self.updated = float("-inf")
+    
+    def add(self, speed: int, alpha: float = EWMA_ALPHA, now: float = 0.0) -> None:
+        """写入一个速度样本"""
+        self.samples[self.index] = speed
+        self.index = (self.index + 1) % len(self.samples)
+        self.count = min(self.count + 1, len(self.samples))
+        self.ewma = speed if self.count == 1 else alpha * speed + (1 - alpha) * self.ewma
+        self.updated = now
+    
+    def values(self) -> List[int]:
+        """按时间顺序（从旧到新）的样本"""
+        if self.count < len(self.samples):
+            return self.samples[:self.count].tolist()
+        return (self.samples[self.index:] + self.samples[:self.index]).tolist()
+    
+    def sparkline(self) -> str:
+        """速度曲线，按缓冲区内的最大速度归一化"""
+        values = self.values()
+        peak = max(values, default=0)
+        if peak <= 0:
+            return SPARK_CHARS[0] * len(values)
+        top = len(SPARK_CHARS) - 1
+        return "".join(SPARK_CHARS[value * top // peak] for value in values)
+
+
+class SpeedHistory:
+    """活动任务的速度历史
+    
+    每个活动GID一个定长SpeedRing，任务离开活动状态或从快照移除时立即释放，
+    内存只与活动任务数成正比。
+    """
+    
+    def __init__(self, size: int = HISTORY_SIZE, alpha: float = EWMA_ALPHA, min_interval: float = MIN_SAMPLE_INTERVAL):
+        self.size = size
+        self.alpha = alpha
+        self.min_interval = min_interval
+        self._rings: Dict[str, SpeedRing] = {}
+    
+    def __len__(self) -> int:
+        return len(self._rings)
+    
+    def observe(self, task: TaskRecord) -> None:
+        """记录活动任务的速度样本，并把平滑速度和缓冲区写入任务记录"""
+        if task.status != "active":
+            self.discard(task.gid)
+            task.avg_speed = 0
+            task.history = None
+            return
+        
+        ring = self._rings.get(task.gid)
+        if ring is None:
+            ring = self._rings[task.gid] = SpeedRing(self.size)
+        now = time.monotonic()
+        if now - ring.updated >= self.min_interval:
+            ring.add(task.speed, self.alpha, now)
+        task.avg_speed = int(ring.ewma)
+        task.history = ring
+    
+    def discard(self, gid: str) -> None:
+        """释放任务的缓冲区"""
+        self._rings.pop(gid, None)
+    
+    def clear(self) -> None:
+        """释放所有缓冲区"""
+        self._rings.clear()
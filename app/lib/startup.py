@@ -0,0 +1,38 @@
+import sys
+import time
+from typing import List, Tuple
+
+
+class StartupProfiler:
+    """启动耗时统计（--profile-startup）
+    
+    按顺序打标记，每个标记记录与上一个标记之间的耗时和新导入的模块数；
+    计时从本模块首次导入时开始，不含解释器自身的启动时间。
+    """
+    
+    def __init__(self):
+        self.enabled = False
+        self.started = time.perf_counter()
+        self._last = self.started
+        self._modules = len(sys.modules)
+        self.records: List[Tuple[str, float, int]] = []
+    
+    def mark(self, name: str) -> None:
+        """结束一个阶段"""
+        now = time.perf_counter()
+        modules = len(sys.modules)
+        self.records.append((name, now - self._last, modules - self._modules))
+        self._last = now
+        self._modules = modules
+    
+    def report(self) -> str:
+        """各阶段耗时的文本报告"""
+        lines = ["启动耗时:"]
+        for name, elapsed, modules in self.records:
+            lines.append(f"  {name:<12} {elapsed * 1000:8.1f} ms  导入 {modules} 个模块")
+        lines.append(f"  {'合计':<12} {(self._last - self.started) * 1000:8.1f} ms  共 {len(sys.modules)} 个模块")
+        return "\n".join(lines)
+
+
+# 全局启动统计实例
+profiler = StartupProfiler()
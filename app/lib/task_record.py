@@ -0,0 +1,206 @@
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+
+# aria2状态到界面标签的映射
+STATUS_LABELS = {
+    "active": "下载中",
+    "waiting": "等待中",
+    "paused": "已暂停",
+    "complete": "已完成",
+    "error": "错误",
+    "removed": "已删除",
+}
+
+# 已停止的任务状态，文件信息不再变化
+STOPPED_STATUSES = ("complete", "error", "removed")
+
+# 显示字段，顺序与任务列表的列一致
+DISPLAY_FIELDS = ("status", "filename", "size", "progress", "speed", "time", "trend", "instance")
+
+# 原始字段变化时需要重新格式化的显示字段
+DISPLAY_DEPENDENCIES = {
+    "status": ("status", "time", "trend"),
+    "filename": ("filename",),
+    "total": ("size", "progress", "time"),
+    "completed": ("size", "progress", "time"),
+    "speed": ("speed", "time"),
+    "avg_speed": ("time", "trend"),
+    "instance": ("instance",),
+}
+
+
+def format_size(size_bytes: int) -> str:
+    """格式化文件大小"""
+    if size_bytes == 0:
+        return "0 B"
+    
+    for unit in ["B", "KB", "MB", "GB", "TB"]:
+        if size_bytes < 1024:
+            return f"{size_bytes:.1f} {unit}"
+        size_bytes /= 1024.0
+    return f"{size_bytes:.1f} TB"
+
+
+# 总大小的格式化缓存：总大小不随刷新变化，列表中的任务每次渲染都会命中
+_format_total = lru_cache(maxsize=1024)(format_size)
+
+
+def format_speed(speed_bytes: int) -> str:
+    """格式化下载速度"""
+    return f"{format_size(speed_bytes)}/s" if speed_bytes > 0 else "0 B/s"
+
+
+def format_time(seconds: int) -> str:
+    """格式化时间"""
+    if seconds < 60:
+        return f"{seconds}秒"
+    elif seconds < 3600:
+        return f"{seconds // 60}分{seconds % 60}秒"
+    else:
+        hours = seconds // 3600
+        minutes = (seconds % 3600) // 60
+        return f"{hours}小时{minutes}分钟"
+
+
+class TaskRecord:
+    """紧凑的任务记录
+    
+    只保存原始数值（字节数、速度）和aria2状态码，显示文本在渲染时按需格式化，
+    未显示的任务不产生任何字符串。
+    """
+    
+    # 参与快照比较的字段
+    FIELDS = ("gid", "status", "total", "completed", "speed", "avg_speed", "filename", "url", "instance")
+    
+    __slots__ = FIELDS + ("history",)
+    
+    def __init__(
+        self,
+        gid: str,
+        status: str,
+        total: int = 0,
+        completed: int = 0,
+        speed: int = 0,
+        filename: str = "未知文件",
+        url: str = "未知",
+        instance: Any = "",
+        avg_speed: int = 0
+    ):
+        self.gid = gid
+        self.status = status
+        self.total = total
+        self.completed = completed
+        self.speed = speed
+        self.filename = filename
+        self.url = url
+        # 多实例模式下所属实例的标签
+        self.instance = instance
+        # EWMA平滑后的速度和速度历史（SpeedRing），仅活动任务有，由快照填写
+        self.avg_speed = avg_speed
+        self.history = None
+    
+    def __repr__(self) -> str:
+        return f"TaskRecord({self.gid}, {self.status}, {self.completed}/{self.total}, {self.speed} B/s)"
+    
+    @property
+    def status_label(self) -> str:
+        """状态的显示名称"""
+        return STATUS_LABELS.get(self.status, self.status)
+    
+    @property
+    def remaining(self) -> int:
+        """剩余字节数"""
+        return max(0, self.total - self.completed)
+    
+    @property
+    def eta(self) -> Optional[int]:
+        """剩余时间（秒），优先按平滑速度计算，无速度或已完成时为None"""
+        speed = self.avg_speed or self.speed
+        if speed > 0 and self.total > self.completed:
+            return (self.total - self.completed) // speed
+        return None
+    
+    @property
+    def size_text(self) -> str:
+        """已下载/总大小"""
+        if self.total > 0:
+            return f"{format_size(self.completed)}/{_format_total(self.total)}"
+        return "未知"
+    
+    @property
+    def progress_text(self) -> str:
+        """进度百分比"""
+        if self.total > 0:
+            return f"{self.completed * 100 // self.total}%"
+        return "0%"
+    
+    @property
+    def speed_text(self) -> str:
+        """下载速度"""
+        return format_speed(self.speed)
+    
+    @property
+    def time_text(self) -> str:
+        """剩余时间"""
+        eta = self.eta
+        return format_time(eta) if eta is not None else "未知"
+    
+    @property
+    def trend_text(self) -> str:
+        """速度曲线"""
+        return self.history.sparkline() if self.history is not None else ""
+    
+    def display(self, field: str, computed: Optional[Dict[str, int]] = None) -> str:
+        """单个显示字段的文本，field取值见DISPLAY_FIELDS
+        
+        computed为TaskColumns.computed()中本任务的进度和剩余时间，提供时不再逐行计算。
+        """
+        if field == "status":
+            return self.status_label
+        if field == "size":
+            return self.size_text
+        if field == "progress":
+            if computed is not None:
+                return f"{computed['progress']}%"
+            return self.progress_text
+        if field == "speed":
+            return self.speed_text
+        if field == "time":
+            if computed is not None:
+                # 负值为未知（columns.UNKNOWN_ETA）
+                return format_time(computed["eta"]) if computed["eta"] >= 0 else "未知"
+            return self.time_text
+        if field == "trend":
+            return self.trend_text
+        return str(getattr(self, field))
+    
+    def display_values(self, computed: Optional[Dict[str, int]] = None) -> Tuple[str, ...]:
+        """按DISPLAY_FIELDS顺序的显示文本"""
+        return tuple(self.display(field, computed) for field in DISPLAY_FIELDS)
+    
+    def diff(self, previous: "TaskRecord") -> Dict[str, Any]:
+        """与上一次的记录比较，返回 {字段: 新值}"""
+        return {
+            field: getattr(self, field)
+            for field in self.FIELDS
+            if getattr(self, field) != getattr(previous, field)
+        }
+    
+    def update(self, changed: Dict[str, Any]) -> None:
+        """原地更新字段"""
+        for field, value in changed.items():
+            setattr(self, field, value)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为格式化后的字典（界面之外的调用方使用）"""
+        return {
+            "gid": self.gid,
+            "status": self.status_label,
+            "filename": self.filename,
+            "url": self.url,
+            "size": self.size_text,
+            "progress": self.progress_text,
+            "speed": self.speed_text,
+            "time": self.time_text,
+        }
@@ -0,0 +1,187 @@
+import os
+import struct
+import sys
+import threading
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .path_manager import path_manager
+
+
+# 各层的 (分辨率秒, 容量)：1秒粒度保留1小时，1分钟粒度保留1天
+DEFAULT_TIERS = ((1, 3600), (60, 1440))
+
+# 采样字段及其在getGlobalStat中的键
+SERIES_FIELDS = (
+    ("download", "downloadSpeed"),
+    ("upload", "uploadSpeed"),
+    ("active", "numActive"),
+    ("waiting", "numWaiting"),
+)
+
+# 持久化文件格式：文件头（魔数、版本、层数），每层的参数，然后是时间戳和各字段的int64小端数组
+FILE_MAGIC = b"A2TS"
+FILE_VERSION = 1
+_HEADER = struct.Struct("<4sHH")
+_TIER_HEADER = struct.Struct("<IIIII")
+
+
+def _to_le(data: array) -> bytes:
+    """数组转换为小端字节"""
+    if sys.byteorder == "little":
+        return data.tobytes()
+    swapped = array(data.typecode, data)
+    swapped.byteswap()
+    return swapped.tobytes()
+
+
+def _from_le(typecode: str, raw: bytes) -> array:
+    """从小端字节还原数组"""
+    data = array(typecode)
+    data.frombytes(raw)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data
+
+
+class SeriesTier:
+    """单个分辨率层：时间戳和各字段的定长环形数组
+    
+    同一时间桶内的多个样本取平均值（保存最新桶的和，四舍五入后写入），
+    最新的桶在原地更新，因此可以实时显示。
+    """
+    
+    def __init__(self, resolution: int, capacity: int):
+        self.resolution = resolution
+        self.capacity = capacity
+        self.times = array("q", bytes(8 * capacity))
+        self.values = [array("q", bytes(8 * capacity)) for _ in SERIES_FIELDS]
+        # 下一个写入位置、已有点数、最新桶内的样本数和各字段样本之和
+        self.index = 0
+        self.count = 0
+        self.samples = 0
+        self.sums = [0] * len(SERIES_FIELDS)
+    
+    @property
+    def last(self) -> int:
+        """最新点的位置"""
+        return (self.index - 1) % self.capacity
+    
+    @property
+    def latest_time(self) -> Optional[int]:
+        """最新点的时间戳"""
+        return self.times[self.last] if self.count else None
+    
+    def add(self, timestamp: float, values: Sequence[int]) -> None:
+        """写入一个样本"""
+        bucket = int(timestamp) // self.resolution * self.resolution
+        if self.count and self.times[self.last] == bucket:
+            # 同一桶内取平均，四舍五入（整数运算，不累积误差）
+            self.samples += 1
+            for i, (column, value) in enumerate(zip(self.values, values)):
+                self.sums[i] += value
+                column[self.last] = (2 * self.sums[i] + self.samples) // (2 * self.samples)
+            return
+        
+        if self.count and bucket < self.times[self.last]:
+            # 时钟回拨，丢弃样本
+            return
+        
+        self.times[self.index] = bucket
+        for column, value in zip(self.values, values):
+            column[self.index] = value
+        self.index = (self.index + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self.samples = 1
+        self.sums = list(values)
+    
+    def points(self, since: Optional[int] = None) -> List[Tuple[int, Tuple[int, ...]]]:
+        """按时间顺序返回 [(时间戳, (各字段值))]，指定since时只返回时间戳不早于since的点"""
+        result = []
+        for offset in range(self.count):
+            position = (self.index - 1 - offset) % self.capacity
+            timestamp = self.times[position]
+            if since is not None and timestamp < since:
+                break
+            result.append((timestamp, tuple(column[position] for column in self.values)))
+        result.reverse()
+        return result
+
+
+class ThroughputStore:
+    """全局吞吐量时间序列：每个样本同时写入所有分辨率层，各层环形覆盖，内存固定"""
+    
+    def __init__(self, tiers: Sequence[Tuple[int, int]] = DEFAULT_TIERS):
+        self.tiers = [SeriesTier(resolution, capacity) for resolution, capacity in tiers]
+        self._lock = threading.Lock()
+    
+    def add(self, timestamp: float, stat: Dict) -> None:
+        """记录一次getGlobalStat结果"""
+        values = [int(stat.get(key, 0) or 0) for _, key in SERIES_FIELDS]
+        with self._lock:
+            for tier in self.tiers:
+                tier.add(timestamp, values)
+    
+    def points(self, tier: int = 0, since: Optional[int] = None) -> List[Tuple[int, Tuple[int, ...]]]:
+        """读取某一层的点"""
+        with self._lock:
+            return self.tiers[tier].points(since)
+    
+    def save(self, path: str) -> None:
+        """保存到文件（先写临时文件再替换）"""
+        try:
+            with self._lock:
+                chunks = [_HEADER.pack(FILE_MAGIC, FILE_VERSION, len(self.tiers))]
+                for tier in self.tiers:
+                    chunks.append(_TIER_HEADER.pack(tier.resolution, tier.capacity, tier.index, tier.count, tier.samples))
+                    chunks.append(_to_le(tier.times))
+                    chunks.extend(_to_le(column) for column in tier.values)
+            
+            temp_path = f"{path}.tmp"
+            path_manager.ensure_parent(path)
+            with open(temp_path, "wb") as f:
+                f.write(b"".join(chunks))
+            os.replace(temp_path, path)
+        except Exception as e:
+            print(f"保存吞吐量历史失败: {e}")
+    
+    def load(self, path: str) -> bool:
+        """从文件加载，层配置不一致或文件损坏时保持为空"""
+        if not os.path.exists(path):
+            return False
+        
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            magic, version, tier_count = _HEADER.unpack_from(data, 0)
+            if magic != FILE_MAGIC or version != FILE_VERSION or tier_count != len(self.tiers):
+                return False
+            
+            offset = _HEADER.size
+            loaded = []
+            for tier in self.tiers:
+                resolution, capacity, index, count, samples = _TIER_HEADER.unpack_from(data, offset)
+                offset += _TIER_HEADER.size
+                if (resolution, capacity) != (tier.resolution, tier.capacity):
+                    return False
+                size = 8 * capacity
+                columns = []
+                for _ in range(len(SERIES_FIELDS) + 1):
+                    raw = data[offset:offset + size]
+                    if len(raw) != size:
+                        return False
+                    columns.append(_from_le("q", raw))
+                    offset += size
+                loaded.append((index, count, samples, columns))
+            
+            with self._lock:
+                for tier, (index, count, samples, columns) in zip(self.tiers, loaded):
+                    tier.index, tier.count, tier.samples = index, count, samples
+                    tier.times = columns[0]
+                    tier.values = columns[1:]
+                    # 文件只保存最新桶的平均值，按样本数还原和
+                    tier.sums = [column[tier.last] * samples for column in tier.values] if count else [0] * len(SERIES_FIELDS)
+            return True
+        except Exception as e:
+            print(f"加载吞吐量历史失败: {e}")
+            return False
@@ -0,0 +1,154 @@
+import json
+import threading
+from abc import ABC, abstractmethod
+import time
+from typing import Optional
+import requests
+import websocket
+from requests.adapters import HTTPAdapter
+from aria2p import Client
+from .metrics import metrics, rpc_label
+
+
+# 默认连接池大小（刷新线程、状态线程和用户操作会并发调用）
+DEFAULT_POOL_SIZE = 4
+
+# 默认单次RPC超时时间（秒）
+DEFAULT_TIMEOUT = 10
+
+
+class InstrumentedClient(Client, ABC):
+    """记录每次RPC的方法名、耗时和字节数的aria2p客户端基类（统计见metrics）
+    
+    子类只需实现_send；get_payload保持aria2p的静态方法，方法名在统计开启时从请求体中取得。
+    """
+    
+    def post(self, payload: str) -> dict:
+        """发送请求，统计开启时记录耗时、字节数和错误"""
+        if not metrics.enabled:
+            return json.loads(self._send(payload))
+        
+        method = self._payload_label(payload)
+        started = time.perf_counter()
+        try:
+            raw = self._send(payload)
+            sent = time.perf_counter()
+            response = json.loads(raw)
+        except Exception:
+            metrics.record(method, time.perf_counter() - started, len(payload), error=True)
+            raise
+        decoded = time.perf_counter()
+        metrics.record(
+            method, sent - started, len(payload), len(raw),
+            error=isinstance(response, dict) and "error" in response,
+            decode_seconds=decoded - sent
+        )
+        return response
+    
+    @staticmethod
+    def _payload_label(payload: str) -> str:
+        """请求体对应的统计名称，批量请求（JSON数组）记为batch[方法名]"""
+        try:
+            request = json.loads(payload)
+        except ValueError:
+            return "unknown"
+        if isinstance(request, list):
+            names = dict.fromkeys(call.get("method", "?") for call in request)
+            return f"batch[{','.join(names)}]"
+        return rpc_label(request.get("method", "unknown"), request.get("params"))
+    
+    @abstractmethod
+    def _send(self, payload: str) -> bytes:
+        """发送请求并返回原始响应"""
+
+
+class PooledClient(InstrumentedClient):
+    """基于requests.Session连接池的aria2p客户端，复用keep-alive连接"""
+    
+    def __init__(self, host: str, port: int, secret: str = "", timeout: float = DEFAULT_TIMEOUT, pool_size: int = DEFAULT_POOL_SIZE):
+        super().__init__(host=host, port=port, secret=secret, timeout=timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+    
+    def _send(self, payload: str) -> bytes:
+        """通过连接池发送请求"""
+        response = self.session.post(
+            self.server,
+            data=payload,
+            headers={"Content-Type": "application/json"},
+            timeout=self.timeout
+        )
+        return response.content
+    
+    def close(self) -> None:
+        """关闭连接池"""
+        self.session.close()
+
+
+class WebSocketClient(InstrumentedClient):
+    """通过单条持久WebSocket连接发送RPC的aria2p客户端"""
+    
+    def __init__(self, host: str, port: int, secret: str = "", timeout: float = DEFAULT_TIMEOUT):
+        super().__init__(host=host, port=port, secret=secret, timeout=timeout)
+        self._socket: Optional[websocket.WebSocket] = None
+        self._lock = threading.Lock()
+    
+    def open(self) -> None:
+        """建立WebSocket连接"""
+        with self._lock:
+            if self._socket is None:
+                self._socket = websocket.create_connection(self.ws_server, timeout=self.timeout)
+    
+    def _send(self, payload: str) -> str:
+        """通过WebSocket发送请求并等待响应"""
+        with self._lock:
+            try:
+                if self._socket is None:
+                    self._socket = websocket.create_connection(self.ws_server, timeout=self.timeout)
+                self._socket.send(payload)
+                while True:
+                    raw = self._socket.recv()
+                    # 跳过同一连接上推送的通知（通知带method且没有id）
+                    if '"method"' in raw and '"id"' not in raw:
+                        continue
+                    return raw
+            except Exception:
+                # 连接异常后丢弃，下次调用时重建
+                self._close_socket()
+                raise
+    
+    def _close_socket(self) -> None:
+        """关闭底层连接"""
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            except Exception:
+                pass
+            self._socket = None
+    
+    def close(self) -> None:
+        """关闭连接"""
+        with self._lock:
+            self._close_socket()
+
+
+def create_client(
+    host: str,
+    port: int,
+    secret: str = "",
+    transport: str = "http",
+    timeout: float = DEFAULT_TIMEOUT,
+    pool_size: int = DEFAULT_POOL_SIZE
+) -> Client:
+    """创建RPC客户端，WebSocket不可用时回退到HTTP连接池"""
+    if transport == "websocket":
+        client = WebSocketClient(host, port, secret, timeout)
+        try:
+            client.open()
+            return client
+        except Exception as e:
+            print(f"WebSocket连接失败，改用HTTP: {e}")
+    
+    return PooledClient(host, port, secret, timeout, pool_size)
@@ -0,0 +1,259 @@
+"""app/lib热点路径的微基准测试
+
+用法（在项目根目录下）:
+    python benchmarks/bench_lib.py                              # 100/1k/10k/100k任务
+    python benchmarks/bench_lib.py --sizes 100,1000 --output bench.json
+    python benchmarks/bench_lib.py --compare bench.json         # 与之前的结果对比
+
+每个用例先计时（取多次运行的最小值和中位数），再单独运行一次用tracemalloc记录峰值内存。
+get_downloads的响应首次由FakeAria2生成并录制为JSON文本，之后每次回放（包含JSON解码）。
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from aria2p import API, Client
+from lib import columns
+from lib.aria2 import Aria2
+from lib.fake_aria2 import FakeAria2
+from lib.path_manager import PathManager
+from lib.task_record import format_size, format_speed, format_time
+
+
+# 默认的任务规模
+DEFAULT_SIZES = (100, 1000, 10000, 100000)
+
+# 文件名解析用例使用的URL样本（普通路径、Content-Disposition参数、文件名参数、编码路径）
+SAMPLE_URLS = (
+    "http://example.com/files/ubuntu-24.04-desktop-amd64.iso",
+    "https://cdn.example.com/get?id=42&response-content-disposition=attachment%3B%20filename%3D%22report.pdf%22",
+    "https://example.com/download/?file=archive.tar.gz&token=abc",
+    "https://example.com/%E6%96%87%E6%A1%A3/%E8%AF%B4%E6%98%8E.txt",
+    "ftp://mirror.example.org/pub/linux/kernel/v6.x/linux-6.8.tar.xz",
+)
+
+
+class ReplayClient(Client):
+    """回放录制的RPC响应：首次请求时从FakeAria2生成响应文本，之后只做JSON解码"""
+    
+    def __init__(self, aria2: FakeAria2):
+        super().__init__()
+        self.aria2 = aria2
+        self.recorded: Dict[str, str] = {}
+    
+    def post(self, payload: str) -> dict:
+        text = self.recorded.get(payload)
+        if text is None:
+            request = json.loads(payload)
+            result = self.aria2.dispatch(request["method"], request.get("params"))
+            text = self.recorded[payload] = json.dumps({"jsonrpc": "2.0", "id": request["id"], "result": result})
+        return json.loads(text)
+
+
+def fake_aria2(size: int) -> FakeAria2:
+    """生成size个任务的模拟aria2，四分之一为活动任务"""
+    return FakeAria2(tasks=size, active=max(1, size // 4), stopped_ratio=0.3, seed=size)
+
+
+def task_structs(size: int) -> List[Dict]:
+    """size个任务的aria2任务结构"""
+    aria2 = fake_aria2(size)
+    return aria2.rpc_tellActive() + aria2.rpc_tellWaiting(0, size) + aria2.rpc_tellStopped(0, size)
+
+
+def bench_format_download_info(size: int) -> Callable[[], object]:
+    # 任务结构到任务记录的转换（原_format_download_info，名称保留以便与历史结果对比）
+    service = Aria2()
+    structs = task_structs(size)
+    
+    def run() -> object:
+        # 清空文件名缓存，测量的是解析而不是缓存命中
+        service._filename_cache.clear()
+        service._url_filename_cache.clear()
+        return service._parse_tasks(structs)
+    
+    return run
+
+
+def bench_display_values(size: int) -> Callable[[], object]:
+    # 渲染时生成显示文本
+    tasks = Aria2()._parse_tasks(task_structs(size))
+    return lambda: [task.display_values() for task in tasks]
+
+
+def bench_task_columns(size: int) -> Callable[[], object]:
+    # 列式计算进度、剩余时间和汇总（安装NumPy时向量化）
+    tasks = Aria2()._parse_tasks(task_structs(size))
+    
+    def run() -> None:
+        table = columns.TaskColumns(tasks)
+        table.progress()
+        table.eta()
+        table.summary()
+    
+    return run
+
+
+def bench_extract_filename(size: int) -> Callable[[], object]:
+    service = Aria2()
+    # 片段使每个URL互不相同（不影响解析结果），否则同一轮内也会命中按URL的缓存
+    urls = [f"{SAMPLE_URLS[index % len(SAMPLE_URLS)]}#{index}" for index in range(size)]
+    
+    def run() -> object:
+        service._url_filename_cache.clear()
+        return [service._extract_filename_from_url(url) for url in urls]
+    
+    return run
+
+
+def bench_format_values(size: int) -> Callable[[], object]:
+    rng = random.Random(size)
+    sizes = [rng.randint(0, 1 << 40) for _ in range(size)]
+    speeds = [rng.randint(0, 50 << 20) for _ in range(size)]
+    seconds = [rng.randint(0, 200000) for _ in range(size)]
+    
+    def run() -> None:
+        for value in sizes:
+            format_size(value)
+        for value in speeds:
+            format_speed(value)
+        for value in seconds:
+            format_time(value)
+    
+    return run
+
+
+def bench_get_downloads(size: int) -> Callable[[], object]:
+    service = Aria2()
+    service.api = API(ReplayClient(fake_aria2(size)))
+    service.connected = True
+    # 录制响应
+    service.get_downloads()
+    return service.get_downloads
+
+
+def bench_path_manager(size: int) -> Callable[[], object]:
+    # 创建实例并解析默认配置中的路径（不创建目录）
+    return lambda: PathManager().create_default_config()
+
+
+# 用例: 名称 -> (构造函数, 是否与任务规模相关)
+CASES: Dict[str, Tuple[Callable[[int], Callable[[], object]], bool]] = {
+    "format_download_info": (bench_format_download_info, True),
+    "display_values": (bench_display_values, True),
+    "task_columns": (bench_task_columns, True),
+    "extract_filename_from_url": (bench_extract_filename, True),
+    "format_size_speed_time": (bench_format_values, True),
+    "get_downloads": (bench_get_downloads, True),
+    "path_manager_init": (bench_path_manager, False),
+}
+
+
+def measure(run: Callable[[], object], repeat: int) -> Dict:
+    """计时并记录峰值内存"""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - started)
+    
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    return {
+        "best_ms": min(times) * 1000,
+        "median_ms": statistics.median(times) * 1000,
+        "peak_kb": peak / 1024,
+    }
+
+
+def git_revision() -> Optional[str]:
+    """当前git提交，不在git仓库中时返回None"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).resolve().parent
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_benchmarks(sizes: List[int], repeat: int, names: List[str]) -> List[Dict]:
+    """运行所有用例"""
+    results = []
+    for name in names:
+        factory, scaled = CASES[name]
+        for size in (sizes if scaled else [None]):
+            run = factory(size or 1)
+            # 大规模用例减少重复次数
+            result = measure(run, max(1, repeat // 10) if size and size >= 100000 else repeat)
+            results.append({"name": name, "size": size, **result})
+            print(format_row(results[-1]), flush=True)
+    return results
+
+
+def format_row(result: Dict, baseline: Optional[Dict] = None) -> str:
+    """格式化一行结果"""
+    size = "-" if result["size"] is None else str(result["size"])
+    row = f"{result['name']:<28}{size:>8}{result['best_ms']:>12.2f}{result['median_ms']:>12.2f}{result['peak_kb']:>12.1f}"
+    if baseline:
+        row += f"{result['best_ms'] / baseline['best_ms']:>10.2f}x" if baseline["best_ms"] else f"{'-':>11}"
+    return row
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="app/lib热点路径的微基准测试")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="任务规模，逗号分隔")
+    parser.add_argument("--repeat", type=int, default=10, help="每个用例的计时次数")
+    parser.add_argument("--cases", default=",".join(CASES), help="要运行的用例，逗号分隔")
+    parser.add_argument("--output", help="结果保存路径（JSON）")
+    parser.add_argument("--compare", help="用于对比的历史结果（JSON）")
+    args = parser.parse_args()
+    
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    names = [name for name in args.cases.split(",") if name]
+    for name in names:
+        if name not in CASES:
+            parser.error(f"未知用例: {name}（可选: {', '.join(CASES)}）")
+    
+    print(f"{'用例':<26}{'任务数':>5}{'最佳(ms)':>10}{'中位(ms)':>10}{'峰值(KB)':>10}")
+    results = run_benchmarks(sizes, args.repeat, names)
+    
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+        baseline = {(item["name"], item["size"]): item for item in previous["results"]}
+        print(f"\n与 {previous.get('revision') or args.compare} 对比（最佳耗时之比，越小越快）:")
+        for result in results:
+            print(format_row(result, baseline.get((result["name"], result["size"]))))
+    
+    if args.output:
+        report = {
+            "revision": git_revision(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": columns.np.__version__ if columns.load_numpy() is not None else None,
+            "repeat": args.repeat,
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n结果已保存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
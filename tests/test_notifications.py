@@ -0,0 +1,101 @@
+"""WebSocket通知通道的回归测试
+
+用法（在项目根目录下）:
+    python -m unittest discover -s tests
+"""
+import json
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from typing import Callable
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from lib import aria2 as aria2_module
+from lib.aria2 import Aria2
+from lib.fake_aria2 import FakeAria2, FakeAria2Server
+
+
+# 等待异步状态变化的最长时间（秒）
+WAIT_TIMEOUT = 5.0
+
+
+def wait_until(condition: Callable[[], bool], timeout: float = WAIT_TIMEOUT) -> bool:
+    """轮询等待条件成立，超时返回False"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+class NotificationRestartTest(unittest.TestCase):
+    """WebSocket断开而HTTP正常时，监听线程应按退避重新订阅"""
+    
+    def setUp(self):
+        self.fake = FakeAria2(tasks=20, active=2, stopped_ratio=0, seed=1)
+        self.server = FakeAria2Server(self.fake, port=0, tick_interval=0).start()
+        self.addCleanup(self.server.stop)
+        
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        config_path = Path(temp_dir.name) / "aria2.json"
+        config_path.write_text(json.dumps({
+            "host": "127.0.0.1",
+            "port": self.server.port,
+            "secret": "",
+            "transport": "http",
+            "download_dir": temp_dir.name
+        }), encoding="utf-8")
+        
+        # 缩短退避间隔，测试不必等待默认的秒级延迟
+        patcher = mock.patch.object(aria2_module, "NOTIFICATION_RETRY_DELAY", 0.05)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        self.events = []
+        self.service = Aria2(config_file=str(config_path))
+        self.service.set_callbacks(on_task_event=lambda event, gid: self.events.append((event, gid)))
+        self.assertTrue(self.service.connect())
+        self.addCleanup(self.service.disconnect)
+        self.assertTrue(wait_until(lambda: self.service.notifications_active and len(self.server._sockets) == 1))
+    
+    def test_restarts_listener_after_websocket_drop(self):
+        self.assertEqual(self.server.close_websockets(), 1)
+        self.assertTrue(wait_until(lambda: not self.service.notifications_active))
+        
+        # HTTP仍然正常，连接状态不变，监听线程应自动恢复
+        self.assertTrue(self.service.connected)
+        self.assertTrue(wait_until(lambda: self.service.notifications_active and len(self.server._sockets) == 1))
+        
+        gid = next(iter(self.fake.active))
+        self.fake.dispatch("aria2.pause", [gid])
+        self.assertTrue(wait_until(lambda: ("pause", gid) in self.events))
+    
+    def test_backoff_grows_while_websocket_keeps_failing(self):
+        for _ in range(3):
+            self.assertEqual(self.server.close_websockets(), 1)
+            self.assertTrue(wait_until(lambda: not self.service.notifications_active))
+            self.assertTrue(wait_until(lambda: self.service.notifications_active and len(self.server._sockets) == 1))
+        self.assertEqual(self.service._notification_failures, 3)
+        
+        # 主动停止订阅时清除退避状态，且不会被自动重新订阅
+        self.service.stop_notifications()
+        self.assertEqual(self.service._notification_failures, 0)
+        time.sleep(0.3)
+        self.assertFalse(self.service.notifications_active)
+        self.assertEqual(len(self.server._sockets), 0)
+    
+    def test_disconnect_does_not_restart_listener(self):
+        self.service.disconnect()
+        time.sleep(0.3)
+        self.assertFalse(self.service.notifications_active)
+        self.assertEqual(len(self.server._sockets), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()